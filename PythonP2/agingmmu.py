@@ -0,0 +1,228 @@
+'''
+* Aging and NFU (not frequently used) replacement.
+*
+* Each frame has a reference bit, set on every access, and a counter. Every
+* `interval` events a tick folds the reference bits into the counters and
+* clears them:
+*   aging: counter = (counter >> 1) | (ref << (bits - 1))
+*   NFU:   counter = counter + ref
+* On a fault the victim is the frame with the smallest counter, counting a
+* reference since the last tick as newer (aging) or as one more use (NFU)
+* than anything already folded in. Ties go to the lowest frame index.
+*
+* The tick works on whole arrays: with NumPy it is a vectorized operation,
+* without it the counter array is packed into one integer and shifted or
+* added in a single step. Victims come from a heap of (counter, frame)
+* entries rebuilt at every tick. Between ticks a frame's priority only
+* rises, except when a page is loaded, which pushes a fresh entry; an entry
+* found below its frame's current priority is pushed back with the new
+* value, so each fault costs O(log frames).
+'''
+from array import array
+import heapq
+import sys
+
+from mmu import MMU
+
+DEFAULT_INTERVAL = 1000  # events between ticks
+DEFAULT_BITS = 8
+
+
+class AgingMMU(MMU):
+    can_snapshot = True
+    reports_faults = True
+    typecode = 'I'  # holds up to 32 counter bits
+
+    def __init__(self, frames, interval=DEFAULT_INTERVAL, bits=DEFAULT_BITS, vectorize=True):
+        if not 1 <= bits <= 32:
+            raise ValueError("Aging counters must have between 1 and 32 bits")
+        self.frames = frames
+        self.interval = interval
+        self.bits = bits
+        self.countdown = interval
+        self.frame_pages = [None] * frames  # page in each frame
+        self.page_map = {}                  # page_number -> frame index
+        self.dirty = bytearray(frames)
+        self._new_arrays([0] * frames, [0] * frames, vectorize)
+        self.disk_reads = 0
+        self.disk_writes = 0
+        self.page_faults = 0
+        self.debug = False
+
+    def _new_arrays(self, counters, refs, vectorize=True):
+        # counters and reference bits, as NumPy arrays when available
+        self.np = None
+        if vectorize:
+            try:
+                import numpy
+            except ImportError:
+                pass
+            else:
+                self.np = numpy
+                self.counters = numpy.array(counters, dtype=numpy.int64)
+                self.refs = numpy.array(refs, dtype=numpy.int64)
+                self._new_heap()
+                return
+        self.counters = array(self.typecode, counters)
+        self.refs = array(self.typecode, refs)
+        # clears the bit each lane receives from its neighbour in a packed shift
+        lane = (1 << (8 * self.counters.itemsize - 1)) - 1
+        self.lanes = int.from_bytes(array(self.typecode, [lane]) * self.frames, sys.byteorder)
+        self._new_heap()
+
+    def _new_heap(self):
+        # entries never exceed their frame's priority, which is all _victim needs
+        counters = self.counters.tolist() if self.np is not None else self.counters
+        self.heap = list(zip(counters, range(self.frames)))
+        heapq.heapify(self.heap)
+
+    def set_debug(self):
+        self.debug = True
+
+    def reset_debug(self):
+        self.debug = False
+
+    def _tick(self):
+        top = self.bits - 1
+        if self.np is not None:
+            self.counters >>= 1
+            self.counters |= self.refs << top
+            self.refs[:] = 0
+        else:
+            order = sys.byteorder
+            size = len(self.counters) * self.counters.itemsize
+            packed = (int.from_bytes(self.counters, order) >> 1 & self.lanes
+                      | int.from_bytes(self.refs, order) << top)
+            self.counters = array(self.typecode, packed.to_bytes(size, order))
+            self.refs = array(self.typecode, bytes(size))
+        self._new_heap()
+
+    def _priority(self, idx):
+        # a reference since the last tick is newer than any folded-in one
+        return self.counters[idx] | self.refs[idx] << self.bits
+
+    def _victim(self):
+        heap = self.heap
+        while True:
+            priority, idx = heap[0]
+            current = self._priority(idx)
+            if priority == current:
+                heapq.heappop(heap)
+                return idx
+            if priority < current:
+                heapq.heapreplace(heap, (current, idx))
+            else:
+                heapq.heappop(heap)  # superseded when the frame was reloaded
+
+    def _count_event(self):
+        self.countdown -= 1
+        if self.countdown == 0:
+            self._tick()
+            self.countdown = self.interval
+
+    def _load(self, page_number, is_write):
+        if len(self.page_map) < self.frames:
+            idx = len(self.page_map)
+        else:
+            idx = self._victim()
+            old_page = self.frame_pages[idx]
+            dirty = bool(self.dirty[idx])
+            if dirty:
+                self.disk_writes += 1
+            if self.debug:
+                print(f"Evict: {old_page} from frame {idx} (dirty={dirty})")
+            del self.page_map[old_page]
+            if self.evict_listener is not None:
+                self.evict_listener(old_page, dirty)
+        self.frame_pages[idx] = page_number
+        self.page_map[page_number] = idx
+        self.counters[idx] = 0
+        self.refs[idx] = 1
+        self.dirty[idx] = is_write
+        heapq.heappush(self.heap, (self._priority(idx), idx))
+
+    def read_memory(self, page_number):
+        idx = self.page_map.get(page_number)
+        if idx is not None:
+            self.refs[idx] = 1
+            if self.debug:
+                print(f"Read hit: page {page_number} in frame {idx}")
+        else:
+            self.page_faults += 1
+            self.disk_reads += 1
+            if self.debug:
+                print(f"Read miss: {page_number}")
+            self._load(page_number, False)
+        self._count_event()
+        return idx is None
+
+    def write_memory(self, page_number):
+        idx = self.page_map.get(page_number)
+        if idx is not None:
+            self.refs[idx] = 1
+            self.dirty[idx] = 1
+            if self.debug:
+                print(f"Write hit: page {page_number} in frame {idx}")
+        else:
+            self.page_faults += 1
+            self.disk_reads += 1
+            if self.debug:
+                print(f"Write miss: {page_number}")
+            self._load(page_number, True)
+        self._count_event()
+        return idx is None
+
+    def get_total_disk_reads(self):
+        return self.disk_reads
+
+    def get_total_disk_writes(self):
+        return self.disk_writes
+
+    def get_total_page_faults(self):
+        return self.page_faults
+
+    def resident_pages(self):
+        return len(self.page_map)
+
+    def snapshot(self):
+        import snapshot
+        pages = array('q', [-1 if page is None else page for page in self.frame_pages])
+        counters = self.counters.tolist() if self.np is not None else self.counters
+        refs = self.refs.tolist() if self.np is not None else self.refs
+        return snapshot.dump(type(self).__name__,
+                             [self.frames, self.interval, self.bits, self.countdown,
+                              self.disk_reads, self.disk_writes, self.page_faults],
+                             [pages, array('q', counters), array('b', refs),
+                              array('b', self.dirty)])
+
+    def restore(self, data):
+        import snapshot
+        _, ints, (pages, counters, refs, dirty) = snapshot.load(data, type(self).__name__)
+        (self.frames, self.interval, self.bits, self.countdown,
+         self.disk_reads, self.disk_writes, self.page_faults) = ints
+        self.frame_pages = [None if page == -1 else page for page in pages]
+        self.page_map = {page: idx for idx, page in enumerate(self.frame_pages) if page is not None}
+        self.dirty = bytearray(dirty.tobytes())
+        self._new_arrays(counters, refs)
+        self.debug = False
+
+
+class NfuMMU(AgingMMU):
+    # counters only grow, so the bit width does not apply
+    typecode = 'Q'
+
+    def _tick(self):
+        if self.np is not None:
+            self.counters += self.refs
+            self.refs[:] = 0
+        else:
+            # no lane carries into the next: counters grow by one per tick
+            order = sys.byteorder
+            size = len(self.counters) * self.counters.itemsize
+            packed = int.from_bytes(self.counters, order) + int.from_bytes(self.refs, order)
+            self.counters = array(self.typecode, packed.to_bytes(size, order))
+            self.refs = array(self.typecode, bytes(size))
+        self._new_heap()
+
+    def _priority(self, idx):
+        return self.counters[idx] + self.refs[idx]
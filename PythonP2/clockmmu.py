@@ -1,10 +1,17 @@
 from mmu import MMU
+from pagetable import new_page_map
 
 class ClockMMU(MMU):
-    def __init__(self, frames):
+    can_snapshot = True
+    can_resize = True
+    can_prefetch = True
+    reports_faults = True
+
+    def __init__(self, frames, compact=False):
         self.frames = frames
         self.frame_table = [None] * frames  # Each entry: {'page': int, 'ref': bool, 'dirty': bool}
-        self.page_map = {}  # page_number -> frame index
+        self.compact = compact
+        self.page_map = new_page_map(frames, compact)  # page_number -> frame index
         self.pointer = 0
         self.disk_reads = 0
         self.disk_writes = 0
@@ -30,6 +37,7 @@ class ClockMMU(MMU):
         if self.debug:
             print(f"Read miss: page {page_number} causes page fault")
         self._replace_page(page_number, is_write=False)
+        return True
 
     def write_memory(self, page_number):
         if page_number in self.page_map:
@@ -45,15 +53,26 @@ class ClockMMU(MMU):
         if self.debug:
             print(f"Write miss: page {page_number} causes page fault")
         self._replace_page(page_number, is_write=True)
+        return True
+    def prefetch(self, page_number):
+        # Load a page ahead of use: a disk read but not a page fault. The
+        # reference bit stays clear so an unused prefetch is the next victim.
+        if page_number in self.page_map:
+            return False
+        self.disk_reads += 1
+        self._replace_page(page_number, is_write=False)
+        self.frame_table[self.page_map[page_number]]['ref'] = False
+        return True
+
     def _replace_page(self, page_number, is_write):
-        # Find empty frame first
-        for i in range(self.frames):
-            if self.frame_table[i] is None:
-                self.frame_table[i] = {'page': page_number, 'ref': True, 'dirty': is_write}
-                self.page_map[page_number] = i
-                if self.debug:
-                    print(f"Loaded page {page_number} into empty frame {i}")
-                return
+        # Find empty frame first; there is none once every frame holds a page
+        if len(self.page_map) < self.frames:
+            i = self.frame_table.index(None)
+            self.frame_table[i] = {'page': page_number, 'ref': True, 'dirty': is_write}
+            self.page_map[page_number] = i
+            if self.debug:
+                print(f"Loaded page {page_number} into empty frame {i}")
+            return
         # Clock replacement
         while True:
             entry = self.frame_table[self.pointer]
@@ -68,6 +87,8 @@ class ClockMMU(MMU):
                     if self.debug:
                         print(f"Evict clean page {old_page} from frame {self.pointer}")
                 del self.page_map[old_page]
+                if self.evict_listener is not None:
+                    self.evict_listener(old_page, entry['dirty'])
                 self.frame_table[self.pointer] = {'page': page_number, 'ref': True, 'dirty': is_write}
                 self.page_map[page_number] = self.pointer
                 if self.debug:
@@ -79,6 +100,46 @@ class ClockMMU(MMU):
                 self.frame_table[self.pointer]['ref'] = False
                 self.pointer = (self.pointer + 1) % self.frames
 
+    def resize(self, frames):
+        if frames >= self.frames:
+            # growing: append empty frames behind the existing ones
+            self.frame_table.extend([None] * (frames - self.frames))
+            if self.compact:
+                self.page_map.reserve(frames)
+            self.frames = frames
+            if self.debug:
+                print(f"Resized to {frames} frames")
+            return
+        # shrinking: sweep the hand, evicting pages as a fault would
+        resident = len(self.page_map)
+        while resident > frames:
+            entry = self.frame_table[self.pointer]
+            if entry is not None:
+                if entry['ref']:
+                    entry['ref'] = False
+                else:
+                    old_page = entry['page']
+                    if entry['dirty']:
+                        self.disk_writes += 1
+                    if self.debug:
+                        print(f"Evict page {old_page} from frame {self.pointer} (dirty={entry['dirty']})")
+                    del self.page_map[old_page]
+                    if self.evict_listener is not None:
+                        self.evict_listener(old_page, entry['dirty'])
+                    self.frame_table[self.pointer] = None
+                    resident -= 1
+            self.pointer = (self.pointer + 1) % self.frames
+        # pack the survivors in hand order, starting at the hand
+        survivors = [entry for entry in self.frame_table[self.pointer:] + self.frame_table[:self.pointer]
+                     if entry is not None]
+        self.frame_table = survivors + [None] * (frames - len(survivors))
+        for i, entry in enumerate(survivors):
+            self.page_map[entry['page']] = i
+        self.pointer = 0
+        self.frames = frames
+        if self.debug:
+            print(f"Resized to {frames} frames")
+
     def get_total_disk_reads(self):
         return self.disk_reads
 
@@ -87,3 +148,37 @@ class ClockMMU(MMU):
 
     def get_total_page_faults(self):
         return self.page_faults
+
+    def resident_pages(self):
+        return len(self.page_map)
+
+    def snapshot(self):
+        from array import array
+        import snapshot
+        pages = array('q', [-1]) * self.frames
+        refs = array('b', bytes(self.frames))
+        dirty = array('b', bytes(self.frames))
+        for i, entry in enumerate(self.frame_table):
+            if entry is not None:
+                pages[i] = entry['page']
+                refs[i] = entry['ref']
+                dirty[i] = entry['dirty']
+        return snapshot.dump("ClockMMU",
+                             [self.frames, self.pointer, self.disk_reads, self.disk_writes,
+                              self.page_faults, self.compact],
+                             [pages, refs, dirty])
+
+    def restore(self, data):
+        import snapshot
+        _, ints, (pages, refs, dirty) = snapshot.load(data, "ClockMMU")
+        (self.frames, self.pointer, self.disk_reads, self.disk_writes,
+         self.page_faults, compact) = ints
+        self.frame_table = [None] * self.frames
+        self.page_map = new_page_map(self.frames, compact)
+        self.compact = bool(compact)
+        for i, page_number in enumerate(pages):
+            if page_number != -1:
+                self.frame_table[i] = {'page': page_number, 'ref': bool(refs[i]), 'dirty': bool(dirty[i])}
+                self.page_map[page_number] = i
+        self.debug = False
+
@@ -0,0 +1,132 @@
+'''
+* Lockstep comparison of several policies on one trace.
+*
+* The trace is decoded once, a chunk at a time, and each chunk is replayed
+* into every MMU in turn: policy by policy within the chunk, so the inner
+* loop is a plain replay with bound methods, not a dispatch to N MMUs per
+* event. Policies with MMU.reports_faults return True from a faulting
+* access; for others the fault counter is read after every access. Either
+* way each policy yields one fault flag byte per event. Per window of
+* `window` events the flags become one integer per policy, and for every
+* ordered pair (a, b) the events where a faulted but b hit are counted with
+* a single AND NOT and bit count.
+*
+* For every pair the report gives that count, and the event ranges where
+* it was highest, as a short list of intervals (adjacent busy windows are
+* merged).
+*
+* Usage: python compare.py inputfile frames policy,policy,... [--window N] [--top K]
+'''
+import argparse
+from array import array
+from operator import sub
+
+
+def fault_flags(mmu, pages, writes):
+    # one byte per event: 1 where the access faulted
+    read_memory = mmu.read_memory
+    write_memory = mmu.write_memory
+    if mmu.reports_faults:
+        return bytes(map(bool, [write_memory(page_number) if is_write else read_memory(page_number)
+                                for page_number, is_write in zip(pages, writes)]))
+    # otherwise from the fault counter, read after every access
+    faults = mmu.get_total_page_faults
+    counts = [faults()]
+    append = counts.append
+    for page_number, is_write in zip(pages, writes):
+        if is_write:
+            write_memory(page_number)
+        else:
+            read_memory(page_number)
+        append(faults())
+    return bytes(map(sub, counts[1:], counts[:-1]))
+
+
+def lockstep(mmus, chunks, window=1000):
+    # returns (events, {(a, b): array of per-window counts of events where
+    # policy a faulted and policy b hit})
+    pairs = [(a, b) for a in range(len(mmus)) for b in range(len(mmus)) if a != b]
+    counts = {pair: array('l') for pair in pairs}
+    pending = [bytearray() for _ in mmus]  # flags not yet in a full window
+    events = 0
+
+    def close_windows(final=False):
+        size = len(pending[0])
+        end = size if final else size - size % window
+        for start in range(0, end, window):
+            masks = [int.from_bytes(flags[start:start + window], 'little') for flags in pending]
+            for a, b in pairs:
+                counts[a, b].append((masks[a] & ~masks[b]).bit_count())
+        for flags in pending:
+            del flags[:end]
+
+    for pages, writes in chunks:
+        events += len(pages)
+        for mmu, flags in zip(mmus, pending):
+            flags += fault_flags(mmu, pages, writes)
+        close_windows()
+    close_windows(final=True)
+    return events, counts
+
+
+def top_ranges(counts, window, events, top=5):
+    # the `top` busiest windows, adjacent ones merged: [(start, end, count)]
+    busiest = sorted((i for i, count in enumerate(counts) if count),
+                     key=lambda i: -counts[i])[:top]
+    ranges = []
+    for i in sorted(busiest):
+        if ranges and ranges[-1][1] == i:
+            ranges[-1][1] = i + 1
+            ranges[-1][2] += counts[i]
+        else:
+            ranges.append([i, i + 1, counts[i]])
+    ranges.sort(key=lambda r: -r[2])
+    return [(start * window, min(end * window, events) - 1, count) for start, end, count in ranges]
+
+
+def main():
+    import registry
+    from tracefile import trace_chunks
+
+    parser = argparse.ArgumentParser(description="Run several policies in lockstep on one trace")
+    parser.add_argument("trace")
+    parser.add_argument("frames", type=int)
+    parser.add_argument("policies", help="comma-separated, e.g. lru,clock,rand")
+    parser.add_argument("--window", type=int, default=1000,
+                        help="events per divergence window (default 1000)")
+    parser.add_argument("--top", type=int, default=5,
+                        help="busiest windows reported per pair (default 5)")
+    args = parser.parse_args()
+
+    names = args.policies.split(",")
+    try:
+        mmus = [registry.create(name, args.frames) for name in names]
+    except KeyError:
+        print(registry.invalid_message())
+        return
+    try:
+        events, counts = lockstep(mmus, trace_chunks(args.trace), args.window)
+    except (OSError, ValueError) as e:
+        print(e)
+        return
+
+    print(f"total memory frames: {args.frames}")
+    print(f"events in trace: {events}")
+    print(f"{'policy':<8} {'faults':>10} {'disk reads':>12} {'disk writes':>12} {'rate':>8}")
+    for name, mmu in zip(names, mmus):
+        faults = mmu.get_total_page_faults()
+        rate = faults / events if events else 0.0
+        print(f"{name:<8} {faults:>10} {mmu.get_total_disk_reads():>12} "
+              f"{mmu.get_total_disk_writes():>12} {rate:>8.4f}")
+
+    for a, name_a in enumerate(names):
+        for b, name_b in enumerate(names):
+            if a == b:
+                continue
+            print(f"{name_a} faults, {name_b} hits: {sum(counts[a, b])} events")
+            for start, end, count in top_ranges(counts[a, b], args.window, events, args.top):
+                print(f"  events {start}-{end}: {count}")
+
+
+if __name__ == "__main__":
+    main()
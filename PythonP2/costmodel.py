@@ -0,0 +1,147 @@
+'''
+* Disk latency model and effective access time (EAT) for any MMU.
+*
+* CostModelMMU wraps an MMU and keeps a simulated clock (microseconds):
+*   - a hit costs mem_latency
+*   - a fault queues a disk read on a single FIFO disk; the access completes
+*     when the read does, plus mem_latency
+*   - a dirty eviction without the flusher is a synchronous write queued in
+*     front of the read, so it sits on the fault's critical path
+*   - the extra (consecutive) pages read by readahead during one access are
+*     queued as a single disk read that is not waited on, but still delays
+*     later I/O on the same disk
+*
+* With the background flusher enabled, dirty victims go to a write buffer
+* instead. Every flush_interval the flusher writes up to flush_batch buffered
+* pages, coalescing runs of consecutive page numbers into one disk write;
+* these writes occupy the disk but do not delay the faulting access
+* directly. If the buffer is full, the fault must first flush a batch itself.
+* A page evicted dirty again while still buffered costs no extra write.
+'''
+from array import array
+
+from mmu import MMUWrapper
+
+
+class CostModelMMU(MMUWrapper):
+    def __init__(self, mmu, mem_latency=0.1, read_latency=5000.0, write_latency=5000.0,
+                 flusher=False, flush_interval=20000.0, flush_batch=32, write_buffer=256):
+        MMUWrapper.__init__(self, mmu)
+        self.mem_latency = mem_latency
+        self.read_latency = read_latency
+        self.write_latency = write_latency
+        self.flusher = flusher
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.write_buffer = write_buffer
+
+        self.now = 0.0
+        self.disk_free_at = 0.0
+        self.next_flush = flush_interval
+        self.accesses = 0
+        self.fault_latencies = array('d')
+        self.buffered = {}            # dirty victims waiting for the flusher
+        self.evicted_dirty = 0        # dirty evictions seen during this access
+        self.sync_writebacks = 0
+        self.background_writebacks = 0
+        self.background_writes = 0    # flusher disk writes after merging runs
+        self.coalesced = 0
+        self.chain_evict_listener(self._on_evict)
+
+    def _on_evict(self, page_number, dirty):
+        if not dirty:
+            return
+        if self.flusher:
+            if page_number in self.buffered:
+                self.coalesced += 1
+            self.buffered[page_number] = True
+        else:
+            self.evicted_dirty += 1
+
+    def _disk(self, start, latency):
+        # FIFO disk: an I/O starts once the disk is free
+        begin = max(start, self.disk_free_at)
+        self.disk_free_at = begin + latency
+        return self.disk_free_at
+
+    def _flush(self, start, limit):
+        pages = sorted(self.buffered)[:limit]
+        for page_number in pages:
+            del self.buffered[page_number]
+        runs = 0
+        previous = None
+        for page_number in pages:
+            if previous is None or page_number != previous + 1:
+                runs += 1
+            previous = page_number
+        for _ in range(runs):
+            self._disk(start, self.write_latency)
+        return len(pages), runs
+
+    def _access(self, page_number, access):
+        if self.flusher and self.now >= self.next_flush:
+            while self.next_flush <= self.now:
+                if self.buffered:
+                    pages, runs = self._flush(self.next_flush, self.flush_batch)
+                    self.background_writebacks += pages
+                    self.background_writes += runs
+                self.next_flush += self.flush_interval
+
+        mmu = self.mmu
+        faults = mmu.get_total_page_faults()
+        reads = mmu.get_total_disk_reads()
+        access(page_number)
+        self.accesses += 1
+        faulted = mmu.get_total_page_faults() - faults
+        # reads beyond the fault itself are readahead
+        readahead = mmu.get_total_disk_reads() - reads - faulted
+        if not faulted:
+            if readahead:
+                self._disk(self.now, self.read_latency)
+            self.now += self.mem_latency
+            return
+
+        start = self.now
+        if self.evicted_dirty:
+            # synchronous write-back ahead of the read
+            for _ in range(self.evicted_dirty):
+                self._disk(start, self.write_latency)
+            self.sync_writebacks += self.evicted_dirty
+            self.evicted_dirty = 0
+        elif self.flusher and len(self.buffered) > self.write_buffer:
+            # buffer overflow: this fault has to flush a batch itself
+            pages, _ = self._flush(start, self.flush_batch)
+            self.sync_writebacks += pages
+        done = self._disk(start, self.read_latency) + self.mem_latency
+        if readahead:
+            self._disk(start, self.read_latency)
+        self.fault_latencies.append(done - start)
+        self.now = done
+
+    def read_memory(self, page_number):
+        self._access(page_number, self.mmu.read_memory)
+
+    def write_memory(self, page_number):
+        self._access(page_number, self.mmu.write_memory)
+
+    def effective_access_time(self):
+        return self.now / self.accesses if self.accesses else 0.0
+
+    def latency_percentiles(self, points=(50, 90, 99, 100)):
+        latencies = sorted(self.fault_latencies)
+        if not latencies:
+            return {p: 0.0 for p in points}
+        return {p: latencies[min(len(latencies) - 1, len(latencies) * p // 100)]
+                for p in points}
+
+    def report(self):
+        lines = ["effective access time: {0:.4f} us".format(self.effective_access_time())]
+        percentiles = self.latency_percentiles()
+        lines.append("fault latency p50/p90/p99/max: " +
+                     "/".join("{0:.1f}".format(percentiles[p]) for p in (50, 90, 99, 100)) + " us")
+        lines.append(f"synchronous write-backs: {self.sync_writebacks}")
+        lines.append(f"background write-backs: {self.background_writebacks} "
+                     f"({self.background_writes} disk writes, {self.coalesced} coalesced)")
+        if self.flusher:
+            lines.append(f"write-backs still buffered: {len(self.buffered)}")
+        return lines
@@ -0,0 +1,318 @@
+'''
+* Distinct page counts for traces too large for a Python set.
+*
+* PageSet is exact. Pages are kept in sorted array('Q') runs (8 bytes a
+* page), merged with their neighbours as they grow, and buckets of 2**16
+* pages that fill up past DENSE pages move to 8KB bitmaps (1 bit a page).
+* A Python set costs about 70 bytes a page.
+*
+* HyperLogLog estimates the count in 2**precision one-byte registers with
+* a relative standard error of 1.04 / sqrt(2**precision) (0.8% at the
+* default precision of 14). Pages are hashed with the splitmix64 finalizer;
+* with NumPy installed a chunk is hashed and folded into the registers in a
+* few vectorized operations, without it in one Python loop.
+*
+* Both are filled one parsed chunk at a time (deduplicated per chunk
+* first) and can be merged, so a trace is split into segments (byte ranges
+* of a text trace, block ranges of a packed one), counted in worker
+* processes and the partial results combined with union().
+'''
+from array import array
+from bisect import bisect_left, bisect_right
+import math
+import os
+
+from tracefile import is_packed, open_trace
+
+DENSE = 1024             # pages in a 2**16-page bucket that make a bitmap no larger than an array
+MERGE_BLOCK = 1 << 16    # pages per step when merging sorted runs
+SEGMENT_BYTES = 1 << 26  # text trace bytes per worker task
+SEGMENT_EVENTS = 1 << 23 # packed trace events per worker task
+READ_SIZE = 1 << 22
+DEFAULT_PRECISION = 14
+_MASK = (1 << 64) - 1
+
+
+def _merge(a, b):
+    # union of two sorted arrays of distinct pages, a block at a time so
+    # only a block's worth of Python ints exists at once
+    merged = array('Q')
+    i = j = 0
+    while i < len(a) and j < len(b):
+        cut = min(a[min(i + MERGE_BLOCK, len(a)) - 1], b[min(j + MERGE_BLOCK, len(b)) - 1])
+        next_i = bisect_right(a, cut, i)
+        next_j = bisect_right(b, cut, j)
+        # two sorted runs: timsort merges them in one pass, fromkeys drops repeats
+        merged.extend(dict.fromkeys(sorted(a[i:next_i] + b[j:next_j])))
+        i, j = next_i, next_j
+    merged.extend(a[i:])
+    merged.extend(b[j:])
+    return merged
+
+
+class PageSet:
+    def __init__(self):
+        self.runs = []     # sorted arrays of pages outside the bitmaps; runs may overlap
+        self.bitmaps = {}  # page >> 16 -> 8KB bitmap of a dense bucket
+
+    def update(self, pages):
+        self._add_run(array('Q', sorted(set(pages))))
+
+    def _add_run(self, run):
+        # keep run lengths roughly halving, so every page is merged
+        # O(log pages) times
+        run = self._strip(run)
+        if not run:
+            return
+        self.runs.append(run)
+        while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            newer = self.runs.pop()
+            self.runs.append(self._promote(_merge(self.runs.pop(), newer)))
+
+    def _strip(self, run):
+        # move the pages of bitmap buckets out of run (in place)
+        if not run:
+            return run
+        first, last = run[0] >> 16, run[-1] >> 16
+        for high, bitmap in self.bitmaps.items():
+            if not first <= high <= last:
+                continue
+            lo = bisect_left(run, high << 16)
+            hi = bisect_left(run, (high + 1) << 16, lo)
+            for page in run[lo:hi]:
+                low = page & 0xFFFF
+                bitmap[low >> 3] |= 1 << (low & 7)
+            del run[lo:hi]
+        return run
+
+    def _promote(self, run):
+        # give buckets with about DENSE pages or more a bitmap (any bucket
+        # with 2 * DENSE - 1 pages spans one of the sampled windows)
+        dense = {run[k] >> 16 for k in range(0, len(run) - DENSE + 1, DENSE)
+                 if run[k] >> 16 == run[k + DENSE - 1] >> 16}
+        if not dense:
+            return run
+        for high in dense:
+            self.bitmaps[high] = bytearray(8192)
+        for other in self.runs:
+            self._strip(other)
+        return self._strip(run)
+
+    def _compact(self):
+        while len(self.runs) > 1:
+            newer = self.runs.pop()
+            self.runs.append(self._promote(_merge(self.runs.pop(), newer)))
+
+    def union(self, other):
+        for high, bitmap in other.bitmaps.items():
+            mine = self.bitmaps.get(high)
+            if mine is None:
+                self.bitmaps[high] = bytearray(bitmap)
+            else:
+                bits = int.from_bytes(mine, 'little') | int.from_bytes(bitmap, 'little')
+                self.bitmaps[high] = bytearray(bits.to_bytes(8192, 'little'))
+        if other.bitmaps:
+            for run in self.runs:
+                self._strip(run)
+        for run in other.runs:
+            self._add_run(array('Q', run))
+
+    def __len__(self):
+        self._compact()
+        return (sum(len(run) for run in self.runs)
+                + sum(int.from_bytes(bitmap, 'little').bit_count() for bitmap in self.bitmaps.values()))
+
+    def __iter__(self):
+        # pages in increasing order
+        from heapq import merge
+        self._compact()
+        return merge(*self.runs, self._bitmap_pages())
+
+    def _bitmap_pages(self):
+        for high in sorted(self.bitmaps):
+            bits = int.from_bytes(self.bitmaps[high], 'little')
+            base = high << 16
+            for low in range(1 << 16):
+                if bits >> low & 1:
+                    yield base | low
+
+    def nbytes(self):
+        # payload size: 8 bytes per page in runs, 8KB per bitmap
+        return 8 * sum(len(run) for run in self.runs) + 8192 * len(self.bitmaps)
+
+
+class HyperLogLog:
+    def __init__(self, precision=DEFAULT_PRECISION, vectorize=True):
+        if not 4 <= precision <= 18:
+            raise ValueError("HyperLogLog precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+        self.np = None
+        if vectorize:
+            try:
+                import numpy
+            except ImportError:
+                pass
+            else:
+                self.np = numpy
+
+    def update(self, pages):
+        # pages: a set, list or array of non-negative integers below 2**64
+        if self.np is not None:
+            self._update_numpy(pages)
+            return
+        shift = 64 - self.precision
+        low_bits = (1 << shift) - 1
+        registers = self.registers
+        for page in pages:
+            z = (page + 0x9E3779B97F4A7C15) & _MASK
+            z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+            z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+            z ^= z >> 31
+            index = z >> shift
+            rank = shift - (z & low_bits).bit_length() + 1
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def _update_numpy(self, pages):
+        np = self.np
+        u64 = np.uint64
+        shift = 64 - self.precision
+        z = np.fromiter(pages, dtype=u64, count=len(pages))
+        z += u64(0x9E3779B97F4A7C15)
+        z ^= z >> u64(30)
+        z *= u64(0xBF58476D1CE4E5B9)
+        z ^= z >> u64(27)
+        z *= u64(0x94D049BB133111EB)
+        z ^= z >> u64(31)
+        index = (z >> u64(shift)).astype(np.intp)
+        rest = z & u64((1 << shift) - 1)
+        # bit length from the float exponent, per 32-bit half to stay exact
+        high = np.frexp((rest >> u64(32)).astype(np.float64))[1]
+        low = np.frexp((rest & u64(0xFFFFFFFF)).astype(np.float64))[1]
+        bit_length = np.where(high > 0, high + 32, low)
+        rank = (shift + 1 - bit_length).astype(np.uint8)
+        np.maximum.at(np.frombuffer(self.registers, dtype=np.uint8), index, rank)
+
+    def union(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def __len__(self):
+        m = len(self.registers)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        counts = [self.registers.count(rank) for rank in range(66 - self.precision)]
+        estimate = alpha * m * m / sum(count * 2.0 ** -rank for rank, count in enumerate(counts))
+        if estimate <= 2.5 * m and counts[0]:
+            estimate = m * math.log(m / counts[0])  # linear counting for small sets
+        return round(estimate)
+
+    def __getstate__(self):
+        # NumPy is looked up again where the sketch is unpickled
+        state = dict(self.__dict__)
+        state["np"] = state["np"] is not None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        vectorize, self.np = self.np, None
+        if vectorize:
+            import numpy
+            self.np = numpy
+
+
+def segments(trace_file, segment_bytes=SEGMENT_BYTES, segment_events=SEGMENT_EVENTS):
+    # (trace_file, start, stop) pieces: byte offsets of a text trace (a line
+    # belongs to the piece it starts in), event offsets of a packed trace
+    if is_packed(trace_file):
+        from tracepack import PackedTrace
+        events = len(PackedTrace(trace_file))
+        return [(trace_file, start, min(start + segment_events, events))
+                for start in range(0, events, segment_events)] or [(trace_file, 0, 0)]
+    if trace_file.endswith('.gz'):
+        os.stat(trace_file)
+        return [(trace_file, 0, None)]  # gzip streams cannot be entered midway
+    size = os.path.getsize(trace_file)
+    return [(trace_file, start, min(start + segment_bytes, size))
+            for start in range(0, size, segment_bytes)] or [(trace_file, 0, 0)]
+
+
+def _text_addresses(trace_file, start, stop):
+    # lists of addresses, one per read, from lines with at least two fields
+    with open_trace(trace_file, 'rb') as trace:
+        if start:
+            trace.seek(start - 1)
+            trace.readline()
+        while stop is None or trace.tell() < stop:
+            size = READ_SIZE if stop is None else min(READ_SIZE, stop - trace.tell())
+            data = trace.read(size)
+            if not data:
+                break
+            if not data.endswith(b'\n'):
+                data += trace.readline()
+            tokens = data.split()
+            lines = data.count(b'\n') + (not data.endswith(b'\n'))
+            flags = tokens[1::2]
+            if len(tokens) == 2 * lines and flags.count(b'R') + flags.count(b'W') == lines:
+                fields = tokens[0::2]
+            else:
+                fields = [parts[0] for parts in map(bytes.split, data.splitlines()) if len(parts) >= 2]
+            yield [int(field, 16) for field in fields]
+
+
+def count_segment(segment, page_offsets, precision=None):
+    # ({page_offset: PageSet or HyperLogLog}, events) for one segment;
+    # runs in a worker process
+    trace_file, start, stop = segment
+    sketches = {offset: PageSet() if precision is None else HyperLogLog(precision)
+                for offset in page_offsets}
+    if is_packed(trace_file):
+        from tracepack import PackedTrace
+        trace = PackedTrace(trace_file)
+        base = trace.page_offset
+        if min(page_offsets) < base:
+            raise ValueError(f"{trace_file} was packed with {1 << base}-byte pages; "
+                             f"page offsets must be at least {base}")
+        chunks = (pages for pages, _ in trace.chunks(start, stop))
+    else:
+        base = 0
+        chunks = _text_addresses(trace_file, start, stop)
+    events = 0
+    for values in chunks:
+        events += len(values)
+        for offset, sketch in sketches.items():
+            shift = offset - base
+            sketch.update({value >> shift for value in values})
+    return sketches, events
+
+
+def count_distinct(trace_files, page_offsets, precision=None, workers=None):
+    # {trace_file: ({page_offset: distinct pages}, events)}; exact unless a
+    # HyperLogLog precision is given. Segments of all traces are counted in
+    # parallel on `workers` processes (default: one per CPU).
+    from itertools import repeat
+
+    jobs = [segment for trace_file in trace_files for segment in segments(trace_file)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) == 1:
+        results = map(count_segment, jobs, repeat(page_offsets), repeat(precision))
+        return _combine(jobs, results)
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(min(workers, len(jobs))) as pool:
+        results = pool.map(count_segment, jobs, repeat(page_offsets), repeat(precision))
+        return _combine(jobs, results)
+
+
+def _combine(jobs, results):
+    merged = {}
+    for (trace_file, _, _), (sketches, events) in zip(jobs, results):
+        if trace_file not in merged:
+            merged[trace_file] = (sketches, events)
+            continue
+        totals, total_events = merged[trace_file]
+        for offset, sketch in sketches.items():
+            totals[offset].union(sketch)
+        merged[trace_file] = (totals, total_events + events)
+    return {trace_file: ({offset: len(sketch) for offset, sketch in sketches.items()}, events)
+            for trace_file, (sketches, events) in merged.items()}
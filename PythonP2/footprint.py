@@ -0,0 +1,188 @@
+'''
+* Memory footprint of simulation runs, measured with tracemalloc.
+*
+* MemoryProfile.begin() takes a snapshot before the MMU is created and
+* end() takes another after the run. What the run still holds (the MMU,
+* its wrappers and the page numbers they keep as keys) is reported
+*   - in total and per resident page (MMU.resident_pages())
+*   - per source file
+*   - per allocating line, largest first (the hot spots)
+* together with the peak of traced memory during the run. begin() imports
+* the modules the run will load lazily (policy, wrappers) first, so their
+* code is not counted as footprint. The report also gives the process's
+* peak RSS, which includes the interpreter and the trace.
+*
+* Allocation churn is sampled during the run. Every SAMPLE_EVENTS events
+* (advance() counts them between chunks) sample() compares per-line traced
+* memory with the previous sample and charges every line whose memory
+* shrank with the bytes and blocks it freed. The churn hot spots are the
+* lines that freed the most, e.g. a dict that is outgrown and reallocated
+* or entries that are dropped and recreated. Memory allocated and freed
+* between two samples (a temporary per event) is not seen. Lines that read
+* the trace are left out, as their churn is the trace itself, and what the
+* profile holds itself is taken off the peak.
+*
+* Only the allocating line is recorded: every extra traceback frame makes
+* each allocation several times dearer. Tracing still slows a run down
+* several times (more for code that allocates on every event, such as a
+* loop over a range of frame indexes), so profiled runs are for comparing
+* footprints, not timings. write() saves every run as JSON.
+'''
+import gc
+from importlib import import_module
+import json
+import os
+import sys
+import tracemalloc
+
+SAMPLE_EVENTS = 1 << 15  # events between churn samples
+# the trace readers and the threads they read with; their churn is the trace
+TRACE_INPUT = ("pipeline.py", "tracefile.py", "tracepack.py", "queue.py", "threading.py",
+               "_weakrefset.py", os.path.join("concurrent", "futures"))
+
+
+def peak_rss():
+    # bytes, or None where the resource module is missing (Windows)
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # macOS reports bytes
+
+
+class MemoryProfile:
+    def __init__(self, top=10):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.top = top
+        self.runs = []
+        self.filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                        tracemalloc.Filter(False, __file__),
+                        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>")]
+        self.sources = {}  # filename -> "profile", "trace", "import" or "run"
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(self.filters)
+
+    def _source(self, filename):
+        source = self.sources.get(filename)
+        if source is None:
+            if filename in (tracemalloc.__file__, __file__):
+                source = "profile"
+            elif any(name in filename for name in TRACE_INPUT):
+                source = "trace"
+            elif filename.startswith("<frozen importlib."):
+                source = "import"
+            else:
+                source = "run"
+            self.sources[filename] = source
+        return source
+
+    def _by_line(self):
+        # (allocating line -> (bytes, blocks) for the run's lines, bytes
+        # held by this profile); grouped before classifying, as filtering
+        # a snapshot matches every trace
+        sizes = {}
+        held = 0
+        for stat in tracemalloc.take_snapshot().statistics('lineno'):
+            frame = stat.traceback[0]
+            source = self._source(frame.filename)
+            if source == "run":
+                sizes[frame] = (stat.size, stat.count)
+            elif source == "profile":
+                held += stat.size
+        return sizes, held
+
+    def begin(self, modules=()):
+        for module in modules:
+            import_module(module)
+        self._snapshot()  # compiles the filter patterns outside the run
+        gc.collect()
+        self.baseline = self._snapshot()
+        self.churn = {}  # allocating line -> [bytes, blocks] freed between samples
+        self.previous, self.held = self._by_line()
+        self.peak = 0
+        self.unsampled = 0
+        self.base_traced = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    def advance(self, events):
+        # after each chunk of events; samples once SAMPLE_EVENTS have passed
+        self.unsampled += events
+        if self.unsampled >= SAMPLE_EVENTS:
+            self.sample()
+
+    def sample(self):
+        # charge each line what it freed since the previous sample
+        self.unsampled = 0
+        peak = tracemalloc.get_traced_memory()[1]
+        sizes, held = self._by_line()
+        # the peak less what the profile has taken since begin()
+        self.peak = max(self.peak, peak - (held - self.held))
+        for frame, (size, blocks) in self.previous.items():
+            now_size, now_blocks = sizes.get(frame, (0, 0))
+            if now_size < size:
+                churn = self.churn.setdefault(frame, [0, 0])
+                churn[0] += size - now_size
+                churn[1] += max(0, blocks - now_blocks)
+        self.previous = sizes
+        tracemalloc.reset_peak()
+
+    def end(self, mmu, **labels):
+        # labels (trace, frames, algorithm, events...) are copied into the run
+        self.sample()
+        peak = max(0, self.peak - self.base_traced)
+        self.previous = None
+        gc.collect()
+        snapshot = self._snapshot()
+        by_line = snapshot.compare_to(self.baseline, 'lineno')
+        by_file = snapshot.compare_to(self.baseline, 'filename')
+        retained = sum(stat.size_diff for stat in by_file)
+        resident = mmu.resident_pages()
+        run = dict(labels)
+        run.update({
+            "resident_pages": resident,
+            "retained_bytes": retained,
+            "bytes_per_resident_page": retained / resident if resident > 0 else None,
+            "peak_traced_bytes": peak,
+            "by_file": {os.path.basename(stat.traceback[0].filename): stat.size_diff
+                        for stat in by_file if stat.size_diff > 0},
+            "hot_spots": [{"location": f"{os.path.basename(frame.filename)}:{frame.lineno}",
+                           "bytes": stat.size_diff, "blocks": stat.count_diff}
+                          for stat in [stat for stat in by_line if stat.size_diff > 0][:self.top]
+                          for frame in stat.traceback[:1]],
+            "churn_bytes": sum(size for size, _ in self.churn.values()),
+            "churn_blocks": sum(blocks for _, blocks in self.churn.values()),
+            "churn_hot_spots": [{"location": f"{os.path.basename(frame.filename)}:{frame.lineno}",
+                                 "bytes": size, "blocks": blocks}
+                                for frame, (size, blocks) in sorted(self.churn.items(),
+                                                                    key=lambda item: -item[1][0])
+                                if size > 0][:self.top],
+        })
+        self.churn = {}
+        self.runs.append(run)
+        return run
+
+    def report(self, run, top=3):
+        per_page = run["bytes_per_resident_page"]
+        lines = [f"memory retained: {run['retained_bytes']} bytes for "
+                 f"{run['resident_pages']} resident pages"
+                 + (f" ({per_page:.1f} bytes/page)" if per_page is not None else ""),
+                 f"peak traced memory: {run['peak_traced_bytes']} bytes"]
+        rss = peak_rss()
+        if rss is not None:
+            lines.append(f"peak RSS: {rss} bytes")
+        for spot in run["hot_spots"][:top]:
+            lines.append(f"  {spot['location']}: {spot['bytes']} bytes in {spot['blocks']} blocks")
+        lines.append(f"memory churned: {run['churn_bytes']} bytes in {run['churn_blocks']} blocks freed")
+        for spot in run["churn_hot_spots"][:top]:
+            lines.append(f"  {spot['location']}: {spot['bytes']} bytes in {spot['blocks']} blocks")
+        return lines
+
+    def write(self, path):
+        with open(path, 'w') as out:
+            json.dump({"python": sys.version.split()[0], "peak_rss_bytes": peak_rss(),
+                       "runs": self.runs}, out, indent=2)
+            out.write("\n")
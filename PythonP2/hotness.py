@@ -0,0 +1,112 @@
+'''
+* Per-page hotness and fault attribution.
+*
+* PageStatsMMU wraps an MMU and gives every page it sees a dense id (in
+* order of first access). Counters live in flat arrays indexed by that id:
+*   accesses, faults, evictions, writebacks (dirty evictions)
+* so each event costs one id lookup, one array increment and one fault
+* counter comparison. memsim.py only creates it with --page-stats or
+* --region-stats, so collection is off by default.
+*
+* Tables can be written as CSV, returned as a NumPy structured array
+* (when NumPy is installed), or rolled up into address regions of
+* 2**region_bits pages.
+'''
+from array import array
+
+from mmu import MMUWrapper
+
+COLUMNS = ("accesses", "faults", "evictions", "writebacks")
+
+
+class PageStatsMMU(MMUWrapper):
+    def __init__(self, mmu):
+        MMUWrapper.__init__(self, mmu)
+        self.ids = {}               # page_number -> dense id
+        self.pages = array('q')     # dense id -> page_number
+        self.accesses = array('q')
+        self.faults = array('q')
+        self.evictions = array('q')
+        self.writebacks = array('q')
+        self.last_faults = mmu.get_total_page_faults()
+        self.chain_evict_listener(self._on_evict)
+
+    def _page_id(self, page_number):
+        page_id = self.ids.get(page_number)
+        if page_id is None:
+            page_id = self.ids[page_number] = len(self.pages)
+            self.pages.append(page_number)
+            self.accesses.append(0)
+            self.faults.append(0)
+            self.evictions.append(0)
+            self.writebacks.append(0)
+        return page_id
+
+    def _on_evict(self, page_number, dirty):
+        page_id = self._page_id(page_number)
+        self.evictions[page_id] += 1
+        if dirty:
+            self.writebacks[page_id] += 1
+
+    def _count(self, page_number):
+        page_id = self._page_id(page_number)
+        self.accesses[page_id] += 1
+        faults = self.mmu.get_total_page_faults()
+        if faults != self.last_faults:
+            self.faults[page_id] += 1
+            self.last_faults = faults
+
+    def read_memory(self, page_number):
+        self.mmu.read_memory(page_number)
+        self._count(page_number)
+
+    def write_memory(self, page_number):
+        self.mmu.write_memory(page_number)
+        self._count(page_number)
+
+    def rows(self):
+        # (page_number, accesses, faults, evictions, writebacks) by page number
+        return sorted(zip(self.pages, self.accesses, self.faults, self.evictions, self.writebacks))
+
+    def regions(self, region_bits):
+        # the same counters summed over regions of 2**region_bits pages
+        totals = {}
+        for row in self.rows():
+            region = row[0] >> region_bits
+            counts = totals.get(region)
+            if counts is None:
+                totals[region] = list(row[1:])
+            else:
+                for i, value in enumerate(row[1:]):
+                    counts[i] += value
+        return sorted((region, *counts) for region, counts in totals.items())
+
+    def to_numpy(self):
+        import numpy
+        dtype = [("page", numpy.int64)] + [(name, numpy.int64) for name in COLUMNS]
+        return numpy.array(self.rows(), dtype=dtype)
+
+    def write_csv(self, path, page_offset=12):
+        with open(path, 'w') as out:
+            out.write("page,address," + ",".join(COLUMNS) + "\n")
+            for page_number, *counts in self.rows():
+                out.write(f"{page_number},{page_number << page_offset:#x},"
+                          + ",".join(map(str, counts)) + "\n")
+
+    def write_regions_csv(self, path, region_bits, page_offset=12):
+        with open(path, 'w') as out:
+            out.write("region,start_address,end_address," + ",".join(COLUMNS) + "\n")
+            size = 1 << (region_bits + page_offset)
+            for region, *counts in self.regions(region_bits):
+                start = region * size
+                out.write(f"{region},{start:#x},{start + size - 1:#x},"
+                          + ",".join(map(str, counts)) + "\n")
+
+    def report(self, top=5):
+        lines = [f"distinct pages: {len(self.pages)}", "pages with the most faults:"]
+        hottest = sorted(range(len(self.pages)), key=lambda i: -self.faults[i])[:top]
+        for i in hottest:
+            if self.faults[i]:
+                lines.append(f"  page {self.pages[i]:#x}: {self.faults[i]} faults, "
+                             f"{self.accesses[i]} accesses, {self.writebacks[i]} write-backs")
+        return lines
@@ -0,0 +1,131 @@
+from collections import OrderedDict
+from mmu import MMU
+
+class LfuMMU(MMU):
+    '''
+    * Least frequently used. Resident pages sit in one bucket per access
+    * count (an OrderedDict, oldest first), so a hit moves a page up one
+    * bucket and a fault evicts from the lowest non-empty bucket, both in
+    * O(1). Ties within a count go to the least recently used page.
+    * Counts are forgotten when a page is evicted.
+    '''
+    can_snapshot = True
+    reports_faults = True
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.pages = {}        # page_number -> access count
+        self.buckets = {}      # access count -> OrderedDict(page_number -> dirty)
+        self.min_count = 0
+        self.disk_reads = 0
+        self.disk_writes = 0
+        self.page_faults = 0
+        self.debug = False
+
+    def set_debug(self):
+        self.debug = True
+
+    def reset_debug(self):
+        self.debug = False
+
+    def _hit(self, page_number, count, is_write):
+        bucket = self.buckets[count]
+        dirty = bucket.pop(page_number) or is_write
+        if not bucket:
+            del self.buckets[count]
+            if self.min_count == count:
+                self.min_count = count + 1
+        count += 1
+        self.pages[page_number] = count
+        if count in self.buckets:
+            self.buckets[count][page_number] = dirty
+        else:
+            self.buckets[count] = OrderedDict([(page_number, dirty)])
+
+    def _load(self, page_number, is_write):
+        if len(self.pages) >= self.frames:
+            bucket = self.buckets[self.min_count]
+            evicted_page, dirty = bucket.popitem(last=False)
+            if not bucket:
+                del self.buckets[self.min_count]
+            del self.pages[evicted_page]
+            if dirty:
+                self.disk_writes += 1
+            if self.debug:
+                print(f"Evict: {evicted_page} (count={self.min_count}, dirty={dirty})")
+            if self.evict_listener is not None:
+                self.evict_listener(evicted_page, dirty)
+        self.pages[page_number] = 1
+        if 1 in self.buckets:
+            self.buckets[1][page_number] = is_write
+        else:
+            self.buckets[1] = OrderedDict([(page_number, is_write)])
+        self.min_count = 1
+
+    def read_memory(self, page_number):
+        count = self.pages.get(page_number)
+        if count is not None:
+            self._hit(page_number, count, False)
+            if self.debug:
+                print(f"Read hit: {page_number} (count={count + 1})")
+            return
+        self.page_faults += 1
+        self.disk_reads += 1
+        if self.debug:
+            print(f"Read miss: {page_number}")
+        self._load(page_number, False)
+        return True
+
+    def write_memory(self, page_number):
+        count = self.pages.get(page_number)
+        if count is not None:
+            self._hit(page_number, count, True)
+            if self.debug:
+                print(f"Write hit: {page_number} (count={count + 1})")
+            return
+        self.page_faults += 1
+        self.disk_reads += 1
+        if self.debug:
+            print(f"Write miss: {page_number}")
+        self._load(page_number, True)
+        return True
+
+    def get_total_disk_reads(self):
+        return self.disk_reads
+
+    def get_total_disk_writes(self):
+        return self.disk_writes
+
+    def get_total_page_faults(self):
+        return self.page_faults
+
+    def resident_pages(self):
+        return len(self.pages)
+
+    def snapshot(self):
+        from array import array
+        import snapshot
+        # resident pages bucket by bucket, oldest first within each count
+        pages = array('q')
+        counts = array('q')
+        dirty = array('b')
+        for count in sorted(self.buckets):
+            for page_number, page_dirty in self.buckets[count].items():
+                pages.append(page_number)
+                counts.append(count)
+                dirty.append(page_dirty)
+        return snapshot.dump("LfuMMU",
+                             [self.frames, self.min_count, self.disk_reads, self.disk_writes,
+                              self.page_faults],
+                             [pages, counts, dirty])
+
+    def restore(self, data):
+        import snapshot
+        _, ints, (pages, counts, dirty) = snapshot.load(data, "LfuMMU")
+        self.frames, self.min_count, self.disk_reads, self.disk_writes, self.page_faults = ints
+        self.pages = {}
+        self.buckets = {}
+        for page_number, count, page_dirty in zip(pages, counts, dirty):
+            self.pages[page_number] = count
+            self.buckets.setdefault(count, OrderedDict())[page_number] = bool(page_dirty)
+        self.debug = False
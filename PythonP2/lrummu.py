@@ -2,6 +2,11 @@ from collections import OrderedDict
 from mmu import MMU
 
 class LruMMU(MMU):
+    can_snapshot = True
+    can_resize = True
+    can_prefetch = True
+    reports_faults = True
+
     #initialize some variables here
 
     def __init__(self, frames):
@@ -40,9 +45,12 @@ class LruMMU(MMU):
                     self.disk_writes += 1
                 if self.debug:
                     print(f"Evict: {evicted_page} (dirty={dirty})")
+                if self.evict_listener is not None:
+                    self.evict_listener(evicted_page, dirty)
             self.memory[page_number] = False  # clean on read
             if self.debug:
                 print(f"Read miss: {page_number}")
+            return True
 
     def write_memory(self, page_number):
         if page_number in self.memory:
@@ -61,9 +69,44 @@ class LruMMU(MMU):
                     self.disk_writes += 1
                 if self.debug:
                     print(f"Evict: {evicted_page} (dirty={dirty})")
+                if self.evict_listener is not None:
+                    self.evict_listener(evicted_page, dirty)
             self.memory[page_number] = True  # dirty on write
             if self.debug:
                 print(f"Write miss: {page_number}")
+            return True
+
+    def prefetch(self, page_number):
+        # Load a page ahead of use: a disk read but not a page fault
+        if page_number in self.memory:
+            return False
+        self.disk_reads += 1
+        if len(self.memory) >= self.frames:
+            evicted_page, dirty = self.memory.popitem(last=False)
+            if dirty:
+                self.disk_writes += 1
+            if self.debug:
+                print(f"Evict: {evicted_page} (dirty={dirty})")
+            if self.evict_listener is not None:
+                self.evict_listener(evicted_page, dirty)
+        self.memory[page_number] = False
+        if self.debug:
+            print(f"Prefetch: {page_number}")
+        return True
+
+    def resize(self, frames):
+        # Shrinking evicts from the LRU end; growing only raises the limit
+        while len(self.memory) > frames:
+            evicted_page, dirty = self.memory.popitem(last=False)
+            if dirty:
+                self.disk_writes += 1
+            if self.debug:
+                print(f"Evict: {evicted_page} (dirty={dirty})")
+            if self.evict_listener is not None:
+                self.evict_listener(evicted_page, dirty)
+        self.frames = frames
+        if self.debug:
+            print(f"Resized to {frames} frames")
 
     def get_total_disk_reads(self):
         # TODO: Implement the method to get total disk reads
@@ -76,3 +119,21 @@ class LruMMU(MMU):
     def get_total_page_faults(self):
         # TODO: Implement the method to get total page faults
         return self.page_faults
+
+    def resident_pages(self):
+        return len(self.memory)
+
+    def snapshot(self):
+        from array import array
+        import snapshot
+        # resident pages from LRU to MRU, with their dirty bits
+        return snapshot.dump("LruMMU",
+                             [self.frames, self.disk_reads, self.disk_writes, self.page_faults],
+                             [array('q', self.memory.keys()), array('b', self.memory.values())])
+
+    def restore(self, data):
+        import snapshot
+        _, ints, (pages, dirty) = snapshot.load(data, "LruMMU")
+        self.frames, self.disk_reads, self.disk_writes, self.page_faults = ints
+        self.memory = OrderedDict(zip(pages, map(bool, dirty)))
+        self.debug = False
@@ -1,7 +1,393 @@
-from clockmmu import ClockMMU
-from lrummu import LruMMU
-from randmmu import RandMMU
+import registry
+from runstats import NO_MARK, RunStats
+from itertools import islice
+from tracefile import is_packed, open_trace
+import os
 import sys
+from types import SimpleNamespace
+
+# Policies and optional layers are imported only when selected, so a quiet
+# run on a small trace starts about as fast as the interpreter itself.
+
+# event offset, frames, warm-up (events, or FILL_WARMUP), warmed up, warm-up
+# end event, then page faults, disk reads and disk writes at that event
+CHECKPOINT_FORMAT = '<QQQ?QQQQ'
+FILL_WARMUP = (1 << 64) - 1
+
+
+def parse_shifts(text):
+    return [int(shift) for shift in text.split(",")]
+
+
+def parse_page_range(text):
+    from tracepack import parse_page_range
+    return parse_page_range(text)
+
+
+def parse_resize(text):
+    # "EVENT:FRAMES,..." -> [(event, frames), ...] in event order
+    schedule = []
+    for item in text.split(","):
+        event, _, frames = item.partition(":")
+        if int(frames) < 1:
+            raise ValueError(f"frame count must be at least 1 in '{item}'")
+        schedule.append((int(event), int(frames)))
+    return sorted(schedule)
+
+
+# Optional flags accepted after the four positional arguments:
+# (flag, argparse keyword arguments)
+OPTIONS = [
+    ("--compact", dict(action="store_true",
+                       help="use the array-backed PageTable instead of dicts")),
+    ("--checkpoint", dict(metavar="FILE",
+                          help="periodically write the MMU state to FILE")),
+    ("--checkpoint-every", dict(type=int, default=1000000, metavar="N",
+                                help="events between checkpoints (default 1000000)")),
+    ("--resume", dict(metavar="FILE",
+                      help="restore the MMU from a checkpoint and continue from its event offset")),
+    ("--warmup", dict(default="0", metavar="N|fill",
+                      help="exclude the first N events, or the frame fill phase, from the results")),
+    ("--window", dict(type=int, default=0, metavar="N",
+                      help="record page faults and disk reads/writes every N events")),
+    ("--window-file", dict(default="memsim_windows.csv", metavar="FILE",
+                           help="CSV file for --window counts (default memsim_windows.csv)")),
+    ("--page-shifts", dict(type=parse_shifts, metavar="S1,S2,...",
+                           help="simulate several page sizes (address shifts, e.g. 12,13,14,21) in one pass")),
+    ("--tlb", dict(metavar="ENTRIES[:WAYS[:lru|rand]]",
+                   help="model a set-associative TLB in front of the MMU")),
+    ("--page-levels", dict(type=int, default=4, metavar="N",
+                           help="page table levels walked on a TLB miss (default 4)")),
+    ("--level-bits", dict(type=int, default=9, metavar="N",
+                          help="page number bits translated per level (default 9)")),
+    ("--walk-cache", dict(type=int, default=0, metavar="N",
+                          help="entries per level in the page-walk cache (default 0)")),
+    ("--cost", dict(action="store_true",
+                    help="report effective access time from a disk latency model")),
+    ("--mem-latency", dict(type=float, default=0.1, metavar="US",
+                           help="memory access time in microseconds (default 0.1)")),
+    ("--read-latency", dict(type=float, default=5000.0, metavar="US",
+                            help="disk read time in microseconds (default 5000)")),
+    ("--write-latency", dict(type=float, default=5000.0, metavar="US",
+                             help="disk write time in microseconds (default 5000)")),
+    ("--flusher", dict(action="store_true",
+                       help="write dirty victims back from a background flusher")),
+    ("--flush-interval", dict(type=float, default=20000.0, metavar="US",
+                              help="time between flusher runs (default 20000)")),
+    ("--flush-batch", dict(type=int, default=32, metavar="N",
+                           help="pages written per flusher run (default 32)")),
+    ("--write-buffer", dict(type=int, default=256, metavar="N",
+                            help="dirty pages buffered before faults must flush (default 256)")),
+    ("--resize", dict(type=parse_resize, metavar="EVENT:FRAMES,...",
+                      help="change the number of frames after the given event counts")),
+    ("--page-stats", dict(metavar="FILE",
+                          help="write per-page accesses, faults, evictions and write-backs to FILE")),
+    ("--region-stats", dict(metavar="FILE",
+                            help="write the same counters summed per address region to FILE")),
+    ("--region-bits", dict(type=int, default=8, metavar="N",
+                           help="pages per region as a power of two (default 8, i.e. 1MB)")),
+    ("--start", dict(type=int, default=0, metavar="N",
+                     help="packed traces: start at event N (default 0)")),
+    ("--stop", dict(type=int, metavar="N",
+                    help="packed traces: stop before event N")),
+    ("--page-range", dict(type=parse_page_range, metavar="LO:HI",
+                          help="packed traces: only simulate pages LO to HI (inclusive)")),
+    ("--profile-memory", dict(metavar="FILE",
+                              help="measure the simulator's memory footprint and allocation churn and "
+                                   "write them to FILE as JSON; text traces are then read in chunks "
+                                   "as with --pipeline")),
+    ("--profile-top", dict(type=int, default=10, metavar="N",
+                           help="allocation hot spots kept per run (default 10)")),
+    ("--pipeline", dict(action="store_true",
+                        help="read and decode the trace in background threads")),
+    ("--daemon", dict(nargs="?", const="", metavar="SOCKET",
+                      help="run on a simdaemon.py server if one is listening (see simdaemon.py)")),
+    ("--format", dict(choices=["jsonl", "csv"],
+                      help="machine-readable output; also implied by comma-separated frames/modes")),
+    ("--readahead", dict(metavar="WINDOW[:MAX]",
+                         help="sequential readahead in front of lru/clock (see prefetch.py)")),
+]
+
+
+def parse_options(args):
+    if not args:
+        # argparse is only imported when there is something to parse
+        return SimpleNamespace(**{_dest(flag): _default(spec) for flag, spec in OPTIONS})
+    import argparse
+    parser = argparse.ArgumentParser(prog="memsim.py", add_help=False)
+    for flag, spec in OPTIONS:
+        parser.add_argument(flag, **spec)
+    return parser.parse_args(args)
+
+
+def _dest(flag):
+    return flag.lstrip("-").replace("-", "_")
+
+
+def _default(spec):
+    return spec.get("default", False if spec.get("action") == "store_true" else None)
+
+
+def create_mmu(replacement_mode, frames, options):
+    try:
+        return registry.create(replacement_mode, frames, compact=options.compact)
+    except KeyError:
+        return None
+
+
+def page_size_label(shift):
+    size = 1 << shift
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size}{unit}"
+        size >>= 10
+
+
+def packed_chunks(input_file, options, page_offset=None, skip=0):
+    # (pages, writes) chunks of a packed trace, sliced as the options ask;
+    # `skip` events of the slice are dropped first
+    from tracepack import PackedTrace
+    from tracefile import skip_events
+    trace = PackedTrace(input_file)
+    if options.page_range is None:
+        return trace.chunks(options.start + skip, options.stop, None, page_offset)
+    return skip_events(trace.chunks(options.start, options.stop, options.page_range, page_offset), skip)
+
+
+def run_page_sizes(input_file, frames, replacement_mode, options, debug_mode):
+    # Decode each address once and feed one MMU per page size.
+    shifts = options.page_shifts
+    mmus = [create_mmu(replacement_mode, frames, options) for _ in shifts]
+    if debug_mode == "debug":
+        for mmu in mmus:
+            mmu.set_debug()
+    readers = [(shift, mmu.read_memory) for shift, mmu in zip(shifts, mmus)]
+    writers = [(shift, mmu.write_memory) for shift, mmu in zip(shifts, mmus)]
+
+    no_events = 0
+    if is_packed(input_file):
+        # packed pages are turned back into page-aligned addresses
+        from tracepack import PackedTrace
+        try:
+            offset = PackedTrace(input_file).page_offset
+        except ValueError as e:
+            print(e)
+            return
+        if min(shifts) < offset:
+            print(f"'{input_file}' was packed with {page_size_label(offset)} pages; "
+                  f"--page-shifts must be at least {offset}")
+            return
+        for pages, writes in packed_chunks(input_file, options):
+            for page, is_write in zip(pages, writes):
+                logical_address = page << offset
+                if is_write:
+                    for shift, write_memory in writers:
+                        write_memory(logical_address >> shift)
+                else:
+                    for shift, read_memory in readers:
+                        read_memory(logical_address >> shift)
+            no_events += len(pages)
+    else:
+        with open_trace(input_file) as trace_file:
+            for trace_line in trace_file:
+                trace_cmd = trace_line.strip().split(" ")
+                logical_address = int(trace_cmd[0], 16)
+                if trace_cmd[1] == "R":
+                    for shift, read_memory in readers:
+                        read_memory(logical_address >> shift)
+                elif trace_cmd[1] == "W":
+                    for shift, write_memory in writers:
+                        write_memory(logical_address >> shift)
+                else:
+                    print(f"Badly formatted file. Error on line {no_events + 1}")
+                    return
+                no_events += 1
+
+    for shift, mmu in zip(shifts, mmus):
+        print(f"page size: {page_size_label(shift)}")
+        print(f"total memory frames: {frames}")
+        print(f"events in trace: {no_events}")
+        print(f"total disk reads: {mmu.get_total_disk_reads()}")
+        print(f"total disk writes: {mmu.get_total_disk_writes()}")
+        print("page fault rate: ", end="")
+        print("{0:.4f}".format(mmu.get_total_page_faults() / no_events))
+
+
+# modules imported only when an option is given: (option, module)
+LAZY_MODULES = [("page_stats", "hotness"), ("region_stats", "hotness"), ("readahead", "prefetch"),
+                ("cost", "costmodel"), ("tlb", "tlb"), ("pipeline", "pipeline"),
+                ("profile_memory", "pipeline"), ("checkpoint", "struct"), ("resume", "struct")]
+
+# options that select part of a packed trace
+SLICE_OPTIONS = ["start", "stop", "page_range"]
+
+# options that only make sense for a single streamed run
+SINGLE_RUN_OPTIONS = ["checkpoint", "resume", "window", "page_shifts", "tlb", "cost", "readahead",
+                      "resize", "page_stats", "region_stats"]
+
+
+def run_configs(input_file, frame_list, mode_list, debug_mode, options):
+    # Parse the trace once, then replay it for every (frames, mode) pair and
+    # print exact counters as JSON Lines (default) or CSV.
+    import json
+    from tracefile import read_trace
+
+    for name in SINGLE_RUN_OPTIONS:
+        if getattr(options, name):
+            print(f"--{name.replace('_', '-')} needs a single frame count and replacement mode")
+            return
+    if options.warmup != "0":
+        print("--warmup needs a single frame count and replacement mode")
+        return
+    try:
+        frame_counts = [int(frames) for frames in frame_list.split(",")]
+    except ValueError:
+        print("Frame counts must be integers, e.g. 16,32,64")
+        return
+    if min(frame_counts) < 1:
+        print("Frame number must be at least 1")
+        return
+    modes = mode_list.split(",")
+    for mode in modes:
+        try:
+            registry.resolve(mode)
+        except KeyError:
+            print(registry.invalid_message())
+            return
+        if options.compact and not registry.supports_compact(mode):
+            print(registry.compact_message())
+            return
+    if debug_mode not in ("debug", "quiet"):
+        print("Invalid debug mode. Valid options are [debug, quiet]")
+        return
+
+    configs = [(frames, mode) for frames in frame_counts for mode in modes]
+    sliced = any(getattr(options, name) for name in SLICE_OPTIONS)
+    records = None
+    profile = None
+    if (options.daemon is not None and debug_mode == "quiet" and not sliced
+            and not options.profile_memory):
+        records = query_daemon(input_file, configs, options)
+    if records is None:
+        try:
+            if sliced:
+                from tracepack import PackedTrace
+                pages, writes = PackedTrace(input_file).read(
+                    options.start, options.stop, options.page_range)
+            else:
+                pages, writes = read_trace(input_file)
+        except ValueError as e:
+            print(e)
+            return
+        if options.profile_memory:
+            from footprint import MemoryProfile
+            profile = MemoryProfile(options.profile_top)
+        records = local_records(input_file, pages, writes, configs, debug_mode, options, profile)
+
+    output_format = options.format or "jsonl"
+    fields = ["trace", "frames", "algorithm", "events", "disk_reads", "disk_writes",
+              "page_faults", "page_fault_rate"]
+    if output_format == "csv":
+        print(",".join(fields))
+    for record in records:
+        if "error" in record:
+            print(record["error"])
+            return
+        if output_format == "csv":
+            print(",".join(str(record[field]) for field in fields))
+        else:
+            print(json.dumps(record))
+        sys.stdout.flush()
+    if profile is not None:
+        profile.write(options.profile_memory)
+
+
+def run_modules(input_file, replacement_mode, options):
+    # what a run will import, so memory profiles can load it beforehand
+    modules = [module for name, module in LAZY_MODULES if getattr(options, name)]
+    if is_packed(input_file):
+        modules.append("tracepack")
+    try:
+        modules.append(registry.POLICIES[registry.resolve(replacement_mode)][0])
+    except KeyError:
+        pass
+    return modules
+
+
+def local_records(input_file, pages, writes, configs, debug_mode, options, profile=None):
+    from tracefile import replay
+
+    for frames, mode in configs:
+        if profile is not None:
+            mmu = None  # the previous run's MMU is not part of this baseline
+            profile.begin(run_modules(input_file, mode, options))
+        mmu = create_mmu(mode, frames, options)
+        if debug_mode == "debug":
+            mmu.set_debug()
+        if profile is None:
+            replay(mmu, pages, writes)
+        else:
+            from footprint import SAMPLE_EVENTS
+            page_view, write_view = memoryview(pages), memoryview(writes)
+            for start in range(0, len(pages), SAMPLE_EVENTS):
+                replay(mmu, page_view[start:start + SAMPLE_EVENTS],
+                       write_view[start:start + SAMPLE_EVENTS])
+                profile.sample()
+            page_view = write_view = None
+            profile.end(mmu, trace=input_file, frames=frames, algorithm=mode, events=len(pages))
+        page_faults = mmu.get_total_page_faults()
+        yield {
+            "trace": input_file,
+            "frames": frames,
+            "algorithm": mode,
+            "events": len(pages),
+            "disk_reads": mmu.get_total_disk_reads(),
+            "disk_writes": mmu.get_total_disk_writes(),
+            "page_faults": page_faults,
+            "page_fault_rate": page_faults / len(pages) if pages else 0.0,
+        }
+
+
+def query_daemon(input_file, configs, options):
+    # Records from a running simdaemon.py, or None if none is listening
+    from simdaemon import query
+    requests = [{"trace": os.path.abspath(input_file), "frames": frames, "algorithm": mode}
+                for frames, mode in configs]
+    try:
+        records = list(query(requests, options.daemon or None))
+    except OSError:
+        return None
+    for record in records:
+        record["trace"] = input_file
+    return records
+
+
+def save_checkpoint(path, no_events, frames, warmup, stats, mmu):
+    # Write to a temporary file first so an interrupted save never leaves
+    # a truncated checkpoint behind.
+    import struct
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as checkpoint_file:
+        checkpoint_file.write(struct.pack(CHECKPOINT_FORMAT, no_events, frames, warmup, *stats.state()))
+        checkpoint_file.write(mmu.snapshot())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path, frames, warmup, mmu):
+    # (event offset, RunStats state) of the checkpoint; restores mmu
+    import struct
+    with open(path, 'rb') as checkpoint_file:
+        data = checkpoint_file.read()
+    no_events, saved_frames, saved_warmup, *stats_state = struct.unpack_from(CHECKPOINT_FORMAT, data)
+    if saved_frames != frames:
+        raise ValueError(f"Checkpoint was taken with {saved_frames} frames, not {frames}")
+    if saved_warmup != warmup:
+        def describe(value):
+            return "fill" if value == FILL_WARMUP else str(value)
+        raise ValueError(f"Checkpoint was taken with --warmup {describe(saved_warmup)}, "
+                         f"not {describe(warmup)}")
+    mmu.restore(data[struct.calcsize(CHECKPOINT_FORMAT):])
+    return no_events, stats_state
 
 
 def main():
@@ -11,21 +397,37 @@ def main():
     # Check input parameters   #
     ############################
 
+    if len(sys.argv) > 1 and sys.argv[1] == "--list":
+        for line in registry.listing():
+            print(line)
+        return
+
     if (len(sys.argv) < 5):
         print("Usage: python memsim.py inputfile numberframes replacementmode debugmode")
+        print("       python memsim.py inputfile frames,frames,... mode,mode,... debugmode [--format jsonl|csv]")
+        print("       python memsim.py --list")
         return
 
     input_file = sys.argv[1]
+    options = parse_options(sys.argv[5:])
 
     try:
-        with open(input_file, 'r') as file:
-            # Read the trace file contents
-            trace_contents = file.readlines()
+        # Only check the trace can be opened; it is streamed in the main loop
+        open(input_file, 'r').close()
     except FileNotFoundError:
         print(f"Input '{input_file}' could not be found")
         print("Usage: python memsim.py inputfile numberframes replacementmode debugmode")
         return
 
+    if (any(getattr(options, name) for name in SLICE_OPTIONS)
+            and not is_packed(input_file)):
+        print("--start, --stop and --page-range need a packed trace (see tracepack.py)")
+        return
+
+    if "," in sys.argv[2] or "," in sys.argv[3] or options.format:
+        run_configs(input_file, sys.argv[2], sys.argv[3], sys.argv[4], options)
+        return
+
     frames = int(sys.argv[2])
     if frames < 1:
        print( "Frame number must be at least 1\n")
@@ -33,17 +435,103 @@ def main():
 
     replacement_mode = sys.argv[3]
 
+    profile = None
+    if options.profile_memory and not options.page_shifts:
+        from footprint import MemoryProfile
+        profile = MemoryProfile(options.profile_top)
+        profile.begin(run_modules(input_file, replacement_mode, options))
+
     # Setup MMU based on replacement mode
-    if replacement_mode == "rand":
-        mmu = RandMMU(frames)
-    elif replacement_mode == "lru":
-        mmu = LruMMU(frames)
-    elif replacement_mode == "clock":
-        mmu = ClockMMU(frames)
-    else:
-        print("Invalid replacement mode. Valid options are [rand, lru, esc]")
+    try:
+        mmu = create_mmu(replacement_mode, frames, options)
+    except ValueError as e:
+        print(e)
+        return
+    if mmu is None:
+        print(registry.invalid_message())
+        return
+
+    if (options.daemon is not None and sys.argv[4] == "quiet" and options.warmup == "0"
+            and profile is None and not any(getattr(options, name) for name in SINGLE_RUN_OPTIONS + SLICE_OPTIONS)):
+        records = query_daemon(input_file, [(frames, replacement_mode)], options)
+        if records is not None:
+            record = records[0]
+            if "error" in record:
+                print(record["error"])
+                return
+            print(f"total memory frames: {frames}")
+            print(f"events in trace: {record['events']}")
+            print(f"total disk reads: {record['disk_reads']}")
+            print(f"total disk writes: {record['disk_writes']}")
+            print("page fault rate: ", end="")
+            print("{0:.4f}".format(record['page_fault_rate']))
+            return
+
+    if options.page_shifts:
+        if (options.resume or options.checkpoint or options.window or options.warmup != "0"
+                or options.resize or options.page_stats or options.region_stats
+                or options.profile_memory):
+            print("--page-shifts cannot be combined with checkpoints, windows, warm-up, resizing, "
+                  "page stats or memory profiling")
+            return
+        run_page_sizes(input_file, frames, replacement_mode, options, sys.argv[4])
+        return
+
+    if (options.checkpoint or options.resume) and not mmu.can_snapshot:
+        print("Checkpoints need a policy with snapshot support: [lru, clock, rand, lfu, aging, nfu]")
         return
 
+    fill = options.warmup == "fill"
+    if not fill and not options.warmup.isdigit():
+        print("Invalid warm-up. Valid options are a number of events or fill")
+        return
+    warmup = FILL_WARMUP if fill else int(options.warmup)
+
+    resume_from = 0
+    stats_state = None
+    if options.resume:
+        try:
+            resume_from, stats_state = load_checkpoint(options.resume, frames, warmup, mmu)
+        except (OSError, ValueError) as e:
+            print(f"Could not resume from '{options.resume}': {e}")
+            return
+
+    if options.resize and not mmu.can_resize:
+        print("Resizing needs a policy with resize support: [lru, clock, rand]")
+        return
+    if options.readahead and not mmu.can_prefetch:
+        print("Readahead needs a policy with prefetch support: [lru, clock]")
+        return
+
+    page_stats = None
+    if options.page_stats or options.region_stats:
+        from hotness import PageStatsMMU
+        mmu = page_stats = PageStatsMMU(mmu)
+
+    if options.readahead:
+        from prefetch import ReadaheadMMU
+        window, _, max_window = options.readahead.partition(":")
+        mmu = ReadaheadMMU(mmu, int(window), int(max_window or max(1, min(64, frames // 16))))
+        readahead = mmu
+
+    if options.cost:
+        from costmodel import CostModelMMU
+        mmu = CostModelMMU(mmu, options.mem_latency, options.read_latency, options.write_latency,
+                           options.flusher, options.flush_interval, options.flush_batch,
+                           options.write_buffer)
+        cost_model = mmu
+
+    if options.tlb:
+        from tlb import TLB, PageWalker, TranslatingMMU, parse_tlb
+        try:
+            entries, ways, policy = parse_tlb(options.tlb)
+            tlb = TLB(entries, ways, policy)
+        except ValueError as e:
+            print(f"Invalid TLB configuration '{options.tlb}': {e}")
+            return
+        mmu = TranslatingMMU(mmu, tlb, PageWalker(options.page_levels, options.level_bits,
+                                                  options.walk_cache))
+
     debug_mode  = sys.argv[4]
 
     # Set debug mode
@@ -59,34 +547,158 @@ def main():
     # Main Loop: Process the addresses from the trace file     #
     ############################################################
 
-    no_events = 0
+    no_events = resume_from
+    next_checkpoint = NO_MARK
+    if options.checkpoint:
+        next_checkpoint = (resume_from // options.checkpoint_every + 1) * options.checkpoint_every
 
+    window_file = open(options.window_file, 'w') if options.window else None
+    stats = RunStats(mmu, frames, warmup=0 if fill else warmup, fill=fill,
+                     window=options.window, window_file=window_file, start=resume_from)
+    if stats_state is not None:
+        stats.restore(stats_state)
+    if options.readahead:
+        stats.loads_per_event = 1 + readahead.max_window
 
-    with open(input_file, 'r') as trace_file:
-        for trace_line in trace_file:
-            trace_cmd = trace_line.strip().split(" ")
-            logical_address = int(trace_cmd[0], 16)
-            page_number = logical_address >>  PAGE_OFFSET
+    # resizes before a resumed checkpoint are already part of its state
+    resizes = [(event, new_frames) for event, new_frames in options.resize or []
+               if event >= resume_from]
+    for event, new_frames in options.resize or []:
+        if event < resume_from:
+            stats.frames = new_frames
+    resizes.reverse()
 
+    def apply_resizes(no_events):
+        # resizes due at this event; fill detection follows the frame count
+        while resizes and resizes[-1][0] == no_events:
+            stats.frames = resizes.pop()[1]
+            mmu.resize(stats.frames)
+        return resizes[-1][0] if resizes else NO_MARK
 
-            # Process read or write
-            if trace_cmd[1] == "R":
-                mmu.read_memory(page_number)
-            elif trace_cmd[1] == "W":
-                mmu.write_memory(page_number)
-            else:
-                print(f"Badly formatted file. Error on line {no_events + 1}")
-                return
+    next_resize = apply_resizes(no_events)
+    next_stats = stats.next_mark(no_events)
+    next_mark = min(next_checkpoint, next_stats, next_resize)
+
+    def at_mark(no_events):
+        # checkpoints, warm-up/window stats and resizes due at this event
+        nonlocal next_checkpoint, next_stats, next_resize
+        if no_events == next_checkpoint:
+            save_checkpoint(options.checkpoint, no_events, frames, warmup, stats, mmu)
+            next_checkpoint += options.checkpoint_every
+        if no_events == next_stats:
+            next_stats = stats.at(no_events)
+        if no_events == next_resize:
+            next_resize = apply_resizes(no_events)
+            next_stats = min(next_stats, stats.next_mark(no_events))
+        return min(next_checkpoint, next_stats, next_resize)
 
+    def replay_chunk(pages, writes, no_events, next_mark):
+        # Kept out of main(): tracemalloc looks up the line of every
+        # allocation by scanning the function's line table, which makes
+        # profiled loops in a function as long as main() many times slower.
+        read_memory = mmu.read_memory
+        write_memory = mmu.write_memory
+        for page_number, is_write in zip(pages, writes):
+            if is_write:
+                write_memory(page_number)
+            else:
+                read_memory(page_number)
             no_events += 1
+            if no_events == next_mark:
+                next_mark = at_mark(no_events)
+        return no_events, next_mark
+
+    if options.pipeline or is_packed(input_file) or profile is not None:
+        try:
+            if is_packed(input_file):
+                # blocks are decompressed in background threads (see tracepack.py)
+                chunks = packed_chunks(input_file, options, PAGE_OFFSET, resume_from)
+            else:
+                # reading and decoding run in background threads (see pipeline.py);
+                # profiled runs use small buffers so they barely move the peak
+                from pipeline import BUFFER_SIZE, events
+                chunks = events(input_file, resume_from, PAGE_OFFSET,
+                                BUFFER_SIZE if profile is None else 1 << 16)
+            for pages, writes in chunks:
+                no_events, next_mark = replay_chunk(pages, writes, no_events, next_mark)
+                if profile is not None:
+                    profile.advance(len(pages))
+        except (OSError, ValueError) as e:
+            print(e)
+            return
+    else:
+        with open_trace(input_file) as trace_file:
+            if resume_from:
+                # skip the events already covered by the checkpoint
+                next(islice(trace_file, resume_from, resume_from), None)
 
+            for trace_line in trace_file:
+                trace_cmd = trace_line.strip().split(" ")
+                logical_address = int(trace_cmd[0], 16)
+                page_number = logical_address >>  PAGE_OFFSET
+
+
+                # Process read or write
+                if trace_cmd[1] == "R":
+                    mmu.read_memory(page_number)
+                elif trace_cmd[1] == "W":
+                    mmu.write_memory(page_number)
+                else:
+                    print(f"Badly formatted file. Error on line {no_events + 1}")
+                    return
+
+                no_events += 1
+                if no_events == next_mark:
+                    next_mark = at_mark(no_events)
+
+    stats.finish(no_events)
+    if window_file is not None:
+        window_file.close()
+    if profile is not None:
+        chunks = pages = writes = None  # the last trace chunk is not MMU state
+        run = profile.end(mmu, trace=input_file, frames=frames, algorithm=replacement_mode,
+                          events=no_events)
+
+    if options.warmup != "0":
+        no_events, page_faults, disk_reads, disk_writes = stats.measured(no_events)
+        print(f"warm-up events excluded: {stats.warmup_events}")
+        if no_events == 0:
+            print("No events left after warm-up")
+            return
+    else:
+        page_faults = mmu.get_total_page_faults()
+        disk_reads = mmu.get_total_disk_reads()
+        disk_writes = mmu.get_total_disk_writes()
     # TODO: Print results
     print(f"total memory frames: {frames}")
+    if options.resize:
+        applied = [new_frames for event, new_frames in options.resize if event <= no_events]
+        print(f"memory resizes: {len(applied)} (final frames: {applied[-1] if applied else frames})")
     print(f"events in trace: {no_events}")
-    print(f"total disk reads: {mmu.get_total_disk_reads()}")
-    print(f"total disk writes: {mmu.get_total_disk_writes()}")
+    print(f"total disk reads: {disk_reads}")
+    print(f"total disk writes: {disk_writes}")
     print("page fault rate: ", end="")
-    print("{0:.4f}".format(mmu.get_total_page_faults() / no_events))
+    print("{0:.4f}".format(page_faults / no_events))
+    if options.tlb:
+        print("tlb hit rate: {0:.4f}".format(mmu.tlb_hit_rate()))
+        print(f"page walk memory references: {mmu.walker.memory_refs}")
+    if options.readahead:
+        for line in readahead.report():
+            print(line)
+    if options.cost:
+        for line in cost_model.report():
+            print(line)
+    if page_stats is not None:
+        for line in page_stats.report():
+            print(line)
+        if options.page_stats:
+            page_stats.write_csv(options.page_stats, PAGE_OFFSET)
+        if options.region_stats:
+            page_stats.write_regions_csv(options.region_stats, options.region_bits, PAGE_OFFSET)
+    if profile is not None:
+        for line in profile.report(run):
+            print(line)
+        profile.write(options.profile_memory)
 
 if __name__ == "__main__":
     main()
@@ -8,12 +8,35 @@
 *
 '''
 class MMU:
+    # Called as evict_listener(page_number, dirty) whenever a page leaves
+    # memory; None (the default) costs one attribute check per eviction.
+    evict_listener = None
+
+    # Optional operations; a policy that implements one sets its flag.
+    can_snapshot = False
+    can_resize = False
+    can_prefetch = False
+    reports_faults = False  # read_memory/write_memory return True on a fault
+
+    def set_evict_listener(self, listener):
+        self.evict_listener = listener
+
     def read_memory(self, page_number):
         pass
 
     def write_memory(self, page_number):
         pass
 
+    def prefetch(self, page_number):
+        # Load page_number without an access; True if a disk read was issued
+        return False
+
+    def resize(self, frames):
+        # Change the number of frames. Shrinking evicts through the policy
+        # (counting write-backs); growing adds free frames. Only policies
+        # with can_resize do anything.
+        pass
+
     def set_debug(self):
         pass
 
@@ -28,3 +51,99 @@ class MMU:
 
     def get_total_page_faults(self):
         return -1
+
+    def resident_pages(self):
+        # Pages currently loaded in frames
+        return -1
+
+    def snapshot(self):
+        # Compact binary image of the full MMU state (see snapshot.py)
+        raise NotImplementedError
+
+    def restore(self, data):
+        # Replace the whole state with one produced by snapshot()
+        raise NotImplementedError
+
+    def fork(self):
+        if not self.can_snapshot:
+            raise ValueError(f"{type(self).__name__} has no snapshot support")
+        clone = type(self).__new__(type(self))
+        clone.restore(self.snapshot())
+        return clone
+
+
+class MMUWrapper(MMU):
+    '''
+    * Base for layers that observe or extend another MMU (TLB, cost model...).
+    * Everything is forwarded to the wrapped MMU; evict listeners are always
+    * installed on the innermost MMU, so wrappers can be stacked in any order.
+    '''
+    def __init__(self, mmu):
+        self.mmu = mmu
+
+    @property
+    def can_snapshot(self):
+        return self.mmu.can_snapshot
+
+    @property
+    def can_resize(self):
+        return self.mmu.can_resize
+
+    @property
+    def can_prefetch(self):
+        return self.mmu.can_prefetch
+
+    @property
+    def evict_listener(self):
+        return self.mmu.evict_listener
+
+    def set_evict_listener(self, listener):
+        self.mmu.set_evict_listener(listener)
+
+    def chain_evict_listener(self, listener):
+        # install listener(page_number, dirty) in front of any existing one
+        previous = self.evict_listener
+        if previous is None:
+            self.set_evict_listener(listener)
+        else:
+            def chained(page_number, dirty):
+                listener(page_number, dirty)
+                previous(page_number, dirty)
+            self.set_evict_listener(chained)
+
+    def read_memory(self, page_number):
+        self.mmu.read_memory(page_number)
+
+    def write_memory(self, page_number):
+        self.mmu.write_memory(page_number)
+
+    def prefetch(self, page_number):
+        return self.mmu.prefetch(page_number)
+
+    def resize(self, frames):
+        self.mmu.resize(frames)
+
+    def set_debug(self):
+        self.mmu.set_debug()
+
+    def reset_debug(self):
+        self.mmu.reset_debug()
+
+    def get_total_disk_reads(self):
+        return self.mmu.get_total_disk_reads()
+
+    def get_total_disk_writes(self):
+        return self.mmu.get_total_disk_writes()
+
+    def get_total_page_faults(self):
+        return self.mmu.get_total_page_faults()
+
+    def resident_pages(self):
+        return self.mmu.resident_pages()
+
+    def snapshot(self):
+        # only the wrapped MMU's state is saved
+        return self.mmu.snapshot()
+
+    def restore(self, data):
+        self.mmu.restore(data)
@@ -0,0 +1,141 @@
+'''
+* One-pass LRU miss-ratio curves.
+* An access hits in an LRU memory of k frames exactly when its stack distance
+* (number of distinct pages touched since the previous access to the same
+* page, plus one) is at most k. Collecting a histogram of stack distances
+* therefore gives the LruMMU page fault count for every frame count at once.
+*
+* Usage: python mrc.py inputfile [shift,...] [frames ...]
+*   prints LRU page faults per frame count for each page size (address
+*   shift, default 12) and the number of unique pages, decoding the trace once.
+'''
+from array import array
+import sys
+
+
+class Fenwick:
+    # Binary indexed tree over event positions, used to count how many
+    # pages have their most recent access after a given position.
+    def __init__(self, size):
+        self.size = size
+        self.tree = array('l', [0]) * (size + 1)
+
+    def add(self, pos, delta):
+        pos += 1
+        tree = self.tree
+        size = self.size
+        while pos <= size:
+            tree[pos] += delta
+            pos += pos & -pos
+
+    def prefix(self, pos):
+        # sum of entries at positions [0, pos]
+        pos += 1
+        total = 0
+        tree = self.tree
+        while pos > 0:
+            total += tree[pos]
+            pos -= pos & -pos
+        return total
+
+
+class StackDistanceHistogram:
+    def __init__(self):
+        self.hist = {}   # stack distance -> number of accesses (may be scaled)
+        self.cold = 0    # first-time accesses (infinite distance)
+        self.events = 0
+
+    def add(self, distance, count=1):
+        self.hist[distance] = self.hist.get(distance, 0) + count
+
+    def merge(self, other):
+        for distance, count in other.hist.items():
+            self.add(distance, count)
+        self.cold += other.cold
+        self.events += other.events
+
+    def total(self):
+        return self.cold + sum(self.hist.values())
+
+    def faults(self, frames):
+        return self.cold + sum(c for d, c in self.hist.items() if d > frames)
+
+    def fault_curve(self, frame_counts):
+        # Faults for each frame count using a single sort of the histogram.
+        distances = sorted(self.hist, reverse=True)
+        result = {}
+        above = self.cold
+        i = 0
+        for frames in sorted(frame_counts, reverse=True):
+            while i < len(distances) and distances[i] > frames:
+                above += self.hist[distances[i]]
+                i += 1
+            result[frames] = above
+        return result
+
+    def miss_ratio_curve(self, frame_counts):
+        total = self.total()
+        if total == 0:
+            return {frames: 0.0 for frames in frame_counts}
+        return {frames: faults / total
+                for frames, faults in self.fault_curve(frame_counts).items()}
+
+
+def stack_distances(pages):
+    histogram = StackDistanceHistogram()
+    last_access = {}
+    tree = Fenwick(len(pages))
+    hist = histogram.hist
+    cold = 0
+    for t, page_number in enumerate(pages):
+        prev = last_access.get(page_number)
+        if prev is None:
+            cold += 1
+        else:
+            # pages whose latest access lies strictly between prev and t
+            distance = len(last_access) - tree.prefix(prev) + 1
+            hist[distance] = hist.get(distance, 0) + 1
+            tree.add(prev, -1)
+        tree.add(t, 1)
+        last_access[page_number] = t
+    histogram.cold = cold
+    histogram.events = len(pages)
+    return histogram
+
+
+def page_size_curves(addresses, shifts):
+    # One stack-distance histogram per page size from a single decoded trace.
+    return {shift: stack_distances(array('Q', (a >> shift for a in addresses)))
+            for shift in shifts}
+
+
+def main():
+    from tracefile import read_trace
+
+    if len(sys.argv) < 2:
+        print("Usage: python mrc.py inputfile [shift,...] [frames ...]")
+        return
+
+    input_file = sys.argv[1]
+    shifts = [12]
+    frame_args = sys.argv[2:]
+    if frame_args and "," in frame_args[0]:
+        shifts = [int(s) for s in frame_args.pop(0).split(",")]
+    frame_counts = [int(f) for f in frame_args] or [10, 25, 50, 100, 200, 400, 800]
+
+    try:
+        addresses, _ = read_trace(input_file, page_offset=0)
+    except FileNotFoundError:
+        print(f"Input '{input_file}' could not be found")
+        return
+
+    curves = page_size_curves(addresses, shifts)
+    print("frames," + ",".join(f"shift{shift}" for shift in shifts))
+    faults = {shift: curves[shift].fault_curve(frame_counts) for shift in shifts}
+    for frames in frame_counts:
+        print(f"{frames}," + ",".join(str(faults[shift][frames]) for shift in shifts))
+    print("unique," + ",".join(str(curves[shift].cold) for shift in shifts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+'''
+* Multiprogrammed workloads: several traces interleaved into one frame pool.
+*
+* Each trace is read lazily and its pages are tagged with the process id
+* (pid << PID_SHIFT | page), so processes never share pages. The merged
+* stream is produced on the fly by a scheduler, either round-robin with a
+* fixed quantum or from a recorded schedule file with one "pid count" pair
+* per line; no merged trace is ever materialized.
+*
+* global: all processes share one MMU of `frames` frames
+* local:  each process gets its own MMU with an equal share of the frames
+*
+* Thrashing indicators per process: the number of windows (of that
+* process's own events) whose fault rate exceeds the threshold, the worst
+* window fault rate, and under global replacement how many of its pages
+* were evicted by other processes' faults.
+*
+* Usage: python multiprog.py frames algorithm global|local tracefile ...
+*            [--quantum N | --schedule FILE] [--window N] [--threshold R]
+'''
+import argparse
+from itertools import islice
+
+from sweep import make_mmu
+from tracefile import PAGE_OFFSET, trace_chunks
+
+PID_SHIFT = 52
+BUFFER_SIZE = 1 << 16  # read buffer per trace; every trace is open at once
+
+
+def trace_events(input_file, page_offset=PAGE_OFFSET):
+    # (page_number, is_write) events, decoded a chunk at a time
+    try:
+        for pages, writes in trace_chunks(input_file, page_offset, BUFFER_SIZE):
+            yield from zip(pages, writes)
+    except ValueError as e:
+        raise ValueError(f"{input_file}: {e}") from None
+
+
+def round_robin(streams, quantum):
+    # streams: list of event iterators indexed by pid
+    active = list(range(len(streams)))
+    while active:
+        still_active = []
+        for pid in active:
+            count = 0
+            for page_number, is_write in islice(streams[pid], quantum):
+                count += 1
+                yield pid, page_number, is_write
+            if count == quantum:
+                still_active.append(pid)
+        active = still_active
+
+
+def scheduled(streams, schedule_file):
+    with open(schedule_file, 'r') as schedule:
+        for line_no, line in enumerate(schedule, 1):
+            fields = line.split()
+            if not fields:
+                continue
+            try:
+                pid, count = map(int, fields)
+            except ValueError:
+                raise ValueError(f"Badly formatted schedule {schedule_file}. "
+                                 f"Error on line {line_no}") from None
+            if not 0 <= pid < len(streams):
+                raise ValueError(f"Schedule {schedule_file}, line {line_no}: pid {pid} is not "
+                                 f"one of the {len(streams)} traces (0-{len(streams) - 1})")
+            for page_number, is_write in islice(streams[pid], count):
+                yield pid, page_number, is_write
+
+
+class ProcessStats:
+    def __init__(self, window, threshold):
+        self.window = window
+        self.threshold = threshold
+        self.events = 0
+        self.faults = 0
+        self.stolen = 0          # own pages evicted by other processes
+        self.window_faults = 0
+        self.thrashing_windows = 0
+        self.worst_window = 0.0
+
+    def record(self, faulted):
+        self.events += 1
+        self.faults += faulted
+        self.window_faults += faulted
+        if self.events % self.window == 0:
+            rate = self.window_faults / self.window
+            self.worst_window = max(self.worst_window, rate)
+            if rate > self.threshold:
+                self.thrashing_windows += 1
+            self.window_faults = 0
+
+
+def simulate(trace_files, frames, algorithm, replacement, schedule, window=10000, threshold=0.5):
+    streams = [trace_events(trace_file) for trace_file in trace_files]
+    events = schedule(streams)
+    stats = [ProcessStats(window, threshold) for _ in trace_files]
+
+    if replacement == "global":
+        mmu = make_mmu(algorithm, frames)
+        current = [0]
+
+        def on_evict(page_number, dirty):
+            victim = page_number >> PID_SHIFT
+            if victim != current[0]:
+                stats[victim].stolen += 1
+
+        mmu.set_evict_listener(on_evict)
+        for pid, page_number, is_write in events:
+            current[0] = pid
+            faults = mmu.get_total_page_faults()
+            tagged = (pid << PID_SHIFT) | page_number
+            if is_write:
+                mmu.write_memory(tagged)
+            else:
+                mmu.read_memory(tagged)
+            stats[pid].record(mmu.get_total_page_faults() - faults)
+        mmus = [mmu]
+    elif replacement == "local":
+        share = frames // len(trace_files)
+        if share < 1:
+            raise ValueError("Not enough frames for one per process")
+        mmus = [make_mmu(algorithm, share) for _ in trace_files]
+        for pid, page_number, is_write in events:
+            mmu = mmus[pid]
+            faults = mmu.get_total_page_faults()
+            if is_write:
+                mmu.write_memory(page_number)
+            else:
+                mmu.read_memory(page_number)
+            stats[pid].record(mmu.get_total_page_faults() - faults)
+    else:
+        raise ValueError("Replacement must be global or local")
+    return stats, mmus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Interleave several traces into one frame pool")
+    parser.add_argument("frames", type=int)
+    parser.add_argument("algorithm")
+    parser.add_argument("replacement", choices=["global", "local"])
+    parser.add_argument("traces", nargs="+")
+    parser.add_argument("--quantum", type=int, default=1000,
+                        help="events per process per round-robin turn (default 1000)")
+    parser.add_argument("--schedule", help="file of 'pid count' lines replacing round-robin")
+    parser.add_argument("--window", type=int, default=10000,
+                        help="per-process window for thrashing detection (default 10000)")
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="window fault rate counted as thrashing (default 0.5)")
+    args = parser.parse_args()
+
+    if args.schedule:
+        schedule = lambda streams: scheduled(streams, args.schedule)
+    else:
+        schedule = lambda streams: round_robin(streams, args.quantum)
+
+    try:
+        stats, mmus = simulate(args.traces, args.frames, args.algorithm, args.replacement,
+                               schedule, args.window, args.threshold)
+    except (OSError, ValueError) as e:
+        print(e)
+        return
+
+    print(f"total memory frames: {args.frames} ({args.replacement} {args.algorithm})")
+    print(f"total disk reads: {sum(m.get_total_disk_reads() for m in mmus)}")
+    print(f"total disk writes: {sum(m.get_total_disk_writes() for m in mmus)}")
+    print(f"{'pid':<4} {'trace':<24} {'events':>9} {'faults':>9} {'rate':>7} "
+          f"{'stolen':>8} {'thrash win':>10} {'worst win':>9}")
+    for pid, (trace_file, s) in enumerate(zip(args.traces, stats)):
+        rate = s.faults / s.events if s.events else 0.0
+        print(f"{pid:<4} {trace_file[-24:]:<24} {s.events:>9} {s.faults:>9} {rate:>7.4f} "
+              f"{s.stolen:>8} {s.thrashing_windows:>10} {s.worst_window:>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
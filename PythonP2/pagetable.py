@@ -0,0 +1,160 @@
+'''
+* Compact page table: an open-addressing integer hash table mapping
+* page number -> frame index.
+* Keys and values live in flat `array` storage instead of per-entry Python
+* objects. Collisions use linear probing and deletion shifts later entries
+* of the probe run back (no tombstones), so lookups never slow down as pages
+* are evicted and loaded over a long trace.
+*
+* The table supports the dict operations the MMUs use (in, [], []=, del,
+* len, get), so it can be passed in wherever a page map dict is used.
+*
+* Usage: python pagetable.py [entries]   (benchmark against dict)
+'''
+from array import array
+
+EMPTY = -1  # page numbers are never negative
+
+_HASH_MULT = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+
+class PageTable:
+    def __init__(self, max_entries):
+        capacity = 8
+        while capacity < 2 * max_entries:  # keep load factor <= 0.5
+            capacity <<= 1
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.shift = 64 - capacity.bit_length() + 1
+        self.keys = array('q', [EMPTY]) * capacity
+        self.values = array('l', [0]) * capacity
+        self.count = 0
+
+    def _slot(self, page_number):
+        return ((page_number * _HASH_MULT) & _MASK64) >> self.shift
+
+    def _find(self, page_number):
+        keys = self.keys
+        mask = self.mask
+        i = ((page_number * _HASH_MULT) & _MASK64) >> self.shift
+        while True:
+            key = keys[i]
+            if key == page_number or key == EMPTY:
+                return i
+            i = (i + 1) & mask
+
+    def __contains__(self, page_number):
+        return self.keys[self._find(page_number)] == page_number
+
+    def get(self, page_number, default=None):
+        i = self._find(page_number)
+        if self.keys[i] == page_number:
+            return self.values[i]
+        return default
+
+    def __getitem__(self, page_number):
+        i = self._find(page_number)
+        if self.keys[i] != page_number:
+            raise KeyError(page_number)
+        return self.values[i]
+
+    def __setitem__(self, page_number, frame):
+        i = self._find(page_number)
+        if self.keys[i] == EMPTY:
+            if self.count >= self.capacity // 2:
+                raise OverflowError("PageTable is full")
+            self.keys[i] = page_number
+            self.count += 1
+        self.values[i] = frame
+
+    def __delitem__(self, page_number):
+        keys = self.keys
+        values = self.values
+        mask = self.mask
+        i = self._find(page_number)
+        if keys[i] != page_number:
+            raise KeyError(page_number)
+        # Backward-shift deletion: move later entries of the run into the
+        # hole when their home slot does not lie between the hole and them.
+        j = i
+        while True:
+            j = (j + 1) & mask
+            key = keys[j]
+            if key == EMPTY:
+                break
+            home = self._slot(key)
+            if (j > i and (home <= i or home > j)) or (j < i and home <= i and home > j):
+                keys[i] = key
+                values[i] = values[j]
+                i = j
+        keys[i] = EMPTY
+        self.count -= 1
+
+    def __len__(self):
+        return self.count
+
+    def reserve(self, max_entries):
+        # grow (rehashing every entry) so max_entries keys fit
+        if max_entries <= self.capacity // 2:
+            return
+        entries = list(self.items())
+        self.__init__(max_entries)
+        for key, value in entries:
+            self[key] = value
+
+    def items(self):
+        for key, value in zip(self.keys, self.values):
+            if key != EMPTY:
+                yield key, value
+
+    def nbytes(self):
+        return (self.keys.itemsize + self.values.itemsize) * self.capacity
+
+
+def new_page_map(max_entries, compact):
+    # the page map for an MMU: a PageTable when compact, otherwise a dict
+    return PageTable(max_entries) if compact else {}
+
+
+def benchmark(entries):
+    import random
+    import time
+    import tracemalloc
+
+    rng = random.Random(1)
+    pages = [rng.getrandbits(52) for _ in range(entries)]
+    misses = [rng.getrandbits(52) for _ in range(entries)]
+
+    def build(table):
+        for frame, page_number in enumerate(pages):
+            table[page_number] = frame
+        return table
+
+    results = []
+    for label, factory in (("dict", dict), ("PageTable", lambda: PageTable(entries))):
+        tracemalloc.start()
+        table = build(factory())
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        for page_number in pages:
+            page_number in table
+        for page_number in misses:
+            page_number in table
+        elapsed = time.perf_counter() - start
+        results.append((label, size / entries, 2 * entries / elapsed))
+    return results
+
+
+def main():
+    import sys
+
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"{'table':<10} {'bytes/page':>12} {'lookups/s':>14}")
+    for label, per_page, rate in benchmark(entries):
+        print(f"{label:<10} {per_page:>12.1f} {rate:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
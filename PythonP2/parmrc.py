@@ -0,0 +1,128 @@
+'''
+* Exact LRU stack distances computed in parallel over trace chunks.
+*
+* Each worker takes one contiguous chunk and resolves every reuse whose
+* previous access lies inside the same chunk; the distinct pages between two
+* such accesses are all inside the chunk, so the local distance is exact.
+* The first access to each page within a chunk is left unresolved and
+* reported back together with the last position of every page in the chunk.
+*
+* The merge phase walks the chunks in order, keeping the latest access of
+* every page in a Fenwick tree over global positions. Only the unresolved
+* first references and the per-chunk last positions are processed, so the
+* sequential part scales with distinct pages per chunk rather than events.
+*
+* Usage: python parmrc.py inputfile [workers] [frames ...] [--verify]
+'''
+from multiprocessing import Pool
+import os
+import sys
+
+from mrc import Fenwick, StackDistanceHistogram
+from sharedtrace import SharedTrace
+
+
+def _chunk_distances(task):
+    name, events, start, end = task
+    trace = SharedTrace.attach(name, events)
+    try:
+        pages = trace.pages
+        hist = {}
+        last_pos = {}
+        first_refs = []
+        tree = Fenwick(end - start)
+        for t in range(start, end):
+            page_number = pages[t]
+            prev = last_pos.get(page_number)
+            if prev is None:
+                first_refs.append((page_number, t))
+            else:
+                distance = len(last_pos) - tree.prefix(prev - start) + 1
+                hist[distance] = hist.get(distance, 0) + 1
+                tree.add(prev - start, -1)
+            tree.add(t - start, 1)
+            last_pos[page_number] = t
+        return hist, first_refs, last_pos
+    finally:
+        trace.close()
+
+
+def _merge(events, chunk_results):
+    histogram = StackDistanceHistogram()
+    histogram.events = events
+    hist = histogram.hist
+    tree = Fenwick(events)
+    last_access = {}
+    for local_hist, first_refs, chunk_last in chunk_results:
+        for distance, count in local_hist.items():
+            hist[distance] = hist.get(distance, 0) + count
+        for page_number, t in first_refs:
+            prev = last_access.get(page_number)
+            if prev is None:
+                histogram.cold += 1
+            else:
+                # Pages already touched earlier in this chunk sit at positions
+                # after prev, so they are counted exactly once.
+                distance = len(last_access) - tree.prefix(prev) + 1
+                hist[distance] = hist.get(distance, 0) + 1
+                tree.add(prev, -1)
+            tree.add(t, 1)
+            last_access[page_number] = t
+        for page_number, t in chunk_last.items():
+            first = last_access[page_number]
+            if first != t:
+                tree.add(first, -1)
+                tree.add(t, 1)
+                last_access[page_number] = t
+    return histogram
+
+
+def parallel_stack_distances(pages, writes, workers=None, chunks=None):
+    workers = workers or os.cpu_count() or 1
+    chunks = chunks or workers
+    events = len(pages)
+    bounds = [events * i // chunks for i in range(chunks + 1)]
+    with SharedTrace.create(pages, writes) as trace:
+        name, events = trace.handle()
+        tasks = [(name, events, bounds[i], bounds[i + 1])
+                 for i in range(chunks) if bounds[i] < bounds[i + 1]]
+        with Pool(workers) as pool:
+            results = pool.map(_chunk_distances, tasks)
+    return _merge(events, results)
+
+
+def main():
+    from tracefile import read_trace
+
+    args = [a for a in sys.argv[1:] if a != "--verify"]
+    verify = "--verify" in sys.argv
+    if not args:
+        print("Usage: python parmrc.py inputfile [workers] [frames ...] [--verify]")
+        return
+
+    input_file = args[0]
+    try:
+        pages, writes = read_trace(input_file)
+    except FileNotFoundError:
+        print(f"Input '{input_file}' could not be found")
+        return
+
+    workers = int(args[1]) if len(args) > 1 else None
+    frame_counts = [int(f) for f in args[2:]] or [10, 25, 50, 100, 200, 400, 800]
+
+    histogram = parallel_stack_distances(pages, writes, workers)
+    curve = histogram.fault_curve(frame_counts)
+    for frames in frame_counts:
+        line = f"frames: {frames} page faults: {curve[frames]}"
+        if verify:
+            from lrummu import LruMMU
+            from tracefile import replay
+            mmu = LruMMU(frames)
+            replay(mmu, pages, writes)
+            match = "ok" if mmu.get_total_page_faults() == curve[frames] else "MISMATCH"
+            line += f" lru: {mmu.get_total_page_faults()} {match}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
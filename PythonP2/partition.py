@@ -0,0 +1,204 @@
+'''
+* Split a fixed frame budget across workloads to minimize total faults.
+*
+* Each workload has a fault curve: page faults as a function of frames.
+* Curves come either from experiment_results.csv (one algorithm's sampled
+* points) or from the one-pass LRU engine in mrc.py (every frame count).
+*
+* The default allocator takes the lower convex hull of every curve and
+* hands out hull segments greedily by faults saved per frame, which is
+* optimal for convex curves and runs in O(V log V) over the V hull
+* vertices; frames the hull steps cannot use are then spent on the actual
+* curve points with the best marginal gain. --exact runs a dynamic program
+* over the actual curve points instead. The chosen allocation can be
+* checked by simulating each workload with the existing MMUs.
+*
+* Usage: python partition.py budget [--csv FILE --algorithm ALG | --traces FILE ...]
+*            [--exact] [--validate]
+'''
+import argparse
+import csv
+import heapq
+
+
+def curves_from_csv(csv_file, algorithm):
+    curves = {}
+    events = {}
+    with open(csv_file, 'r', encoding='utf-8') as results:
+        for row in csv.DictReader(results):
+            if row['algorithm'] != algorithm:
+                continue
+            # disk_reads equals the exact fault count; page_faults is rounded
+            curves.setdefault(row['trace'], {})[int(row['frames'])] = int(row['disk_reads'])
+            events[row['trace']] = int(row['events'])
+    # with no frames every access faults
+    return {trace: sorted([(0, events[trace])] + list(points.items()))
+            for trace, points in curves.items()}
+
+
+def curves_from_traces(trace_files, budget):
+    from mrc import stack_distances
+    from tracefile import read_trace
+
+    curves = {}
+    for trace_file in trace_files:
+        pages, _ = read_trace(trace_file)
+        faults = stack_distances(pages).fault_curve(range(budget + 1))
+        curves[trace_file] = [(0, len(pages))] + [(f, faults[f]) for f in range(1, budget + 1)]
+    return curves
+
+
+def lower_hull(points):
+    hull = []
+    for point in points:
+        while len(hull) >= 2:
+            (x1, y1), (x2, y2) = hull[-2], hull[-1]
+            # drop the middle point if it lies on or above the chord
+            if (y2 - y1) * (point[0] - x1) >= (point[1] - y1) * (x2 - x1):
+                hull.pop()
+            else:
+                break
+        hull.append(point)
+    return hull
+
+
+def allocate_hull(curves, budget):
+    hulls = {trace: lower_hull(points) for trace, points in curves.items()}
+    position = {trace: 0 for trace in hulls}
+    used = sum(hull[0][0] for hull in hulls.values())
+    if used > budget:
+        raise ValueError("Budget is smaller than the smallest measured points")
+
+    heap = []
+
+    def push(trace):
+        i = position[trace]
+        hull = hulls[trace]
+        if i + 1 < len(hull):
+            (x1, y1), (x2, y2) = hull[i], hull[i + 1]
+            heapq.heappush(heap, (-(y1 - y2) / (x2 - x1), trace))
+
+    for trace in hulls:
+        push(trace)
+    while heap:
+        _, trace = heapq.heappop(heap)
+        i = position[trace]
+        cost = hulls[trace][i + 1][0] - hulls[trace][i][0]
+        if used + cost > budget:
+            continue  # this workload's next step does not fit; others may
+        used += cost
+        position[trace] = i + 1
+        push(trace)
+    allocation = {trace: hulls[trace][position[trace]] for trace in hulls}
+    return fill_leftover(curves, allocation, budget - used)
+
+
+def fill_leftover(curves, allocation, leftover):
+    # The hull stops short of the budget when no remaining segment fits.
+    # Spend what is left on the actual curve points, each time taking the
+    # step that saves the most faults per frame.
+    allocation = dict(allocation)
+    while leftover > 0:
+        best = None
+        for trace, (frames, faults) in allocation.items():
+            for next_frames, next_faults in curves[trace]:
+                cost = next_frames - frames
+                if cost <= 0:
+                    continue
+                if cost > leftover:
+                    break
+                gain = (faults - next_faults) / cost
+                if gain > 0 and (best is None or gain > best[0]):
+                    best = (gain, trace, (next_frames, next_faults))
+        if best is None:
+            break
+        _, trace, point = best
+        leftover -= point[0] - allocation[trace][0]
+        allocation[trace] = point
+    return allocation
+
+
+def allocate_exact(curves, budget):
+    # best[b] = (total faults, allocation) using at most b frames so far
+    best = {0: (0, {})}
+    for trace, points in curves.items():
+        step = {}
+        for used, (faults, allocation) in best.items():
+            for frames, trace_faults in points:
+                total_frames = used + frames
+                if total_frames > budget:
+                    break
+                candidate = faults + trace_faults
+                if total_frames not in step or candidate < step[total_frames][0]:
+                    step[total_frames] = (candidate, {**allocation, trace: (frames, trace_faults)})
+        best = step
+    if not best:
+        raise ValueError("Budget is smaller than the smallest measured points")
+    return min(best.values(), key=lambda entry: entry[0])[1]
+
+
+def validate(allocation, algorithm):
+    from sweep import make_mmu
+    from tracefile import read_trace, replay
+
+    simulated = {}
+    for trace_file, (frames, _) in allocation.items():
+        if frames == 0:
+            pages, _ = read_trace(trace_file)
+            simulated[trace_file] = len(pages)
+            continue
+        pages, writes = read_trace(trace_file)
+        mmu = make_mmu(algorithm, frames)
+        replay(mmu, pages, writes)
+        simulated[trace_file] = mmu.get_total_page_faults()
+    return simulated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition a frame budget across workloads")
+    parser.add_argument("budget", type=int)
+    parser.add_argument("--csv", help="curves from an experiment results CSV")
+    parser.add_argument("--algorithm", default="lru", help="algorithm rows to use (default lru)")
+    parser.add_argument("--traces", nargs="+", help="build exact LRU curves from trace files")
+    parser.add_argument("--exact", action="store_true", help="dynamic program instead of convex hull")
+    parser.add_argument("--validate", action="store_true", help="simulate the chosen allocation")
+    args = parser.parse_args()
+
+    if args.traces:
+        curves = curves_from_traces(args.traces, args.budget)
+        algorithm = "lru"
+    elif args.csv:
+        curves = curves_from_csv(args.csv, args.algorithm)
+        algorithm = args.algorithm
+    else:
+        print("Give --csv FILE or --traces FILE ...")
+        return
+    if not curves:
+        print("No curves found")
+        return
+
+    try:
+        if args.exact:
+            allocation = allocate_exact(curves, args.budget)
+        else:
+            allocation = allocate_hull(curves, args.budget)
+    except ValueError as e:
+        print(e)
+        return
+
+    simulated = validate(allocation, algorithm) if args.validate else {}
+    print(f"{'trace':<24} {'frames':>8} {'predicted':>10}" + (f" {'simulated':>10}" if simulated else ""))
+    for trace, (frames, faults) in allocation.items():
+        line = f"{trace[-24:]:<24} {frames:>8} {faults:>10}"
+        if simulated:
+            line += f" {simulated[trace]:>10}"
+        print(line)
+    total_frames = sum(frames for frames, _ in allocation.values())
+    line = f"{'total':<24} {total_frames:>8} {sum(f for _, f in allocation.values()):>10}"
+    if simulated:
+        line += f" {sum(simulated.values()):>10}"
+    print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+'''
+* Pipelined trace input: a reader thread, a decoder thread and the
+* simulator (the consuming thread) connected by bounded queues.
+*
+*   reader:  fills large byte buffers from the file (gzip traces are
+*            decompressed here; zlib releases the GIL while it works) and
+*            cuts each buffer at its last newline
+*   decoder: turns a buffer into a chunk of page numbers (array 'q') and
+*            write flags (bytearray), then hands the buffer back to the
+*            reader's free list
+*   consumer: iterates over ready chunks
+*
+* A fixed set of byte buffers circulates between reader and decoder, so
+* reading allocates nothing per buffer. The queues are bounded, so a fast
+* reader cannot run far ahead of the simulator.
+*
+* Only I/O and decompression truly overlap with simulation; decoding and
+* the MMUs are Python code and share the interpreter lock. Decoding works
+* per buffer (one split, one list comprehension) rather than per line.
+'''
+from array import array
+import queue
+import threading
+
+from tracefile import PAGE_OFFSET, open_trace, skip_events
+
+BUFFER_SIZE = 1 << 22  # bytes per read buffer
+DEPTH = 4              # chunks queued between stages
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+class TracePipeline:
+    def __init__(self, input_file, page_offset=PAGE_OFFSET, buffer_size=BUFFER_SIZE, depth=DEPTH):
+        self.input_file = input_file
+        self.page_offset = page_offset
+        self.buffer_size = buffer_size
+        self.free_buffers = queue.Queue()
+        for _ in range(depth + 2):
+            self.free_buffers.put(bytearray(buffer_size))
+        self.raw = queue.Queue(depth)
+        self.ready = queue.Queue(depth)
+        self.stopped = threading.Event()
+        self.threads = [threading.Thread(target=self._read, daemon=True),
+                        threading.Thread(target=self._decode, daemon=True)]
+
+    def _put(self, target, item):
+        # give up once the consumer has gone away
+        while not self.stopped.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, source):
+        while not self.stopped.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None
+
+    def _read(self):
+        try:
+            with open_trace(self.input_file, 'rb') as trace_file:
+                carry = b''
+                while True:
+                    buf = self._get(self.free_buffers)
+                    if buf is None:
+                        return
+                    start = len(carry)
+                    buf[:start] = carry
+                    n = trace_file.readinto(memoryview(buf)[start:])
+                    end = start + n
+                    if n == 0:
+                        # end of file; the last line may have no newline
+                        if end:
+                            self._put(self.raw, (buf, end))
+                        break
+                    cut = buf.rfind(b'\n', 0, end) + 1
+                    if cut == 0:
+                        if end == len(buf):
+                            raise ValueError(f"Trace line longer than {len(buf)} bytes")
+                        cut = end
+                    carry = bytes(buf[cut:end])
+                    if not self._put(self.raw, (buf, cut)):
+                        return
+            self._put(self.raw, None)
+        except Exception as e:
+            self._put(self.raw, _Failure(e))
+
+    def _decode(self):
+        line_no = 0
+        while True:
+            item = self._get(self.raw)
+            if item is None and self.stopped.is_set():
+                return
+            if item is None or isinstance(item, _Failure):
+                self._put(self.ready, item)
+                return
+            buf, length = item
+            try:
+                # one copy straight out of the buffer (slicing the bytearray
+                # first would copy twice); bytes.split needs a bytes object
+                data = memoryview(buf)[:length].tobytes()
+                self.free_buffers.put(buf)
+                chunk = self._decode_chunk(data, line_no)
+            except ValueError as e:
+                self._put(self.ready, _Failure(e))
+                return
+            line_no += data.count(b'\n')
+            if not self._put(self.ready, chunk):
+                return
+
+    def _decode_chunk(self, data, line_no):
+        shift = self.page_offset
+        tokens = data.split()
+        addresses = tokens[0::2]
+        flags = tokens[1::2]
+        lines = data.count(b'\n') + (not data.endswith(b'\n'))
+        # fast path: exactly "address flag" on every line, no blank lines
+        if (len(addresses) == len(flags) == lines
+                and flags.count(b'W') + flags.count(b'R') == lines):
+            pages = array('Q', [int(address, 16) >> shift for address in addresses])
+            writes = bytearray(flag == b'W' for flag in flags)
+            return pages, writes
+        pages = array('Q')
+        writes = bytearray()
+        for offset, trace_line in enumerate(data.splitlines(), line_no + 1):
+            trace_cmd = trace_line.split()
+            if not trace_cmd:
+                continue
+            if len(trace_cmd) < 2 or trace_cmd[1] not in (b"R", b"W"):
+                raise ValueError(f"Badly formatted file. Error on line {offset}")
+            pages.append(int(trace_cmd[0], 16) >> shift)
+            writes.append(trace_cmd[1] == b"W")
+        return pages, writes
+
+    def __iter__(self):
+        # yields (pages, writes) chunks in trace order
+        for thread in self.threads:
+            thread.start()
+        try:
+            while True:
+                item = self.ready.get()
+                if item is None:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            self.stopped.set()
+
+
+def events(input_file, skip=0, page_offset=PAGE_OFFSET, buffer_size=BUFFER_SIZE):
+    # (pages, writes) chunks with the first `skip` events dropped
+    return skip_events(TracePipeline(input_file, page_offset, buffer_size), skip)
@@ -0,0 +1,129 @@
+'''
+* Sequential readahead on top of an MMU that implements prefetch()
+* (LruMMU, ClockMMU).
+*
+* Streams are tracked by the last page they touched. An access to page p
+* continues the stream ending at p-1, and repeated accesses to p leave the
+* stream as it is; once a stream is seen, pages are read
+* ahead so that roughly `window` pages beyond p are resident. The window
+* doubles (up to max_window) every time a prefetched page is used, and
+* halves whenever one of its prefetched pages is evicted without ever being
+* used. New streams start from a window that adapts the same way.
+*
+* Usage: python prefetch.py inputfile numberframes [lru|clock] [window] [max_window]
+*   (max_window defaults to min(64, frames/16))
+*   compares on-demand loading against readahead on the same trace.
+'''
+from collections import OrderedDict
+import sys
+
+from mmu import MMUWrapper
+
+
+class ReadaheadMMU(MMUWrapper):
+    def __init__(self, mmu, window=4, max_window=64, streams=16):
+        MMUWrapper.__init__(self, mmu)
+        self.start_window = window
+        self.max_window = max_window
+        self.max_streams = streams
+        self.streams = OrderedDict()  # last page -> [window, highest page read ahead]
+        self.prefetched = {}          # prefetched page not used yet -> its stream
+        self.issued = 0
+        self.used = 0
+        self.wasted = 0
+        self.chain_evict_listener(self._on_evict)
+
+    def _on_evict(self, page_number, dirty):
+        stream = self.prefetched.pop(page_number, None)
+        if stream is not None:
+            self.wasted += 1
+            stream[0] = max(1, stream[0] // 2)
+            self.start_window = max(1, self.start_window // 2)
+
+    def _track(self, page_number):
+        owner = self.prefetched.pop(page_number, None)
+        if owner is not None:
+            self.used += 1
+            owner[0] = min(self.max_window, owner[0] * 2)
+            self.start_window = min(self.max_window, self.start_window * 2)
+        if page_number in self.streams:
+            # the stream's last page again: keep its window and position
+            self.streams.move_to_end(page_number)
+            return
+        stream = self.streams.pop(page_number - 1, None)
+        if stream is None:
+            # a new candidate stream; read ahead only once it continues
+            self.streams[page_number] = [self.start_window, page_number]
+            if len(self.streams) > self.max_streams:
+                self.streams.popitem(last=False)
+            return
+        window, ahead = stream
+        if ahead - page_number < (window + 1) // 2:
+            for next_page in range(max(ahead, page_number) + 1, page_number + window + 1):
+                if self.mmu.prefetch(next_page):
+                    self.issued += 1
+                    self.prefetched[next_page] = stream
+            ahead = max(ahead, page_number + window)
+        stream[1] = ahead
+        self.streams[page_number] = stream
+
+    def read_memory(self, page_number):
+        self.mmu.read_memory(page_number)
+        self._track(page_number)
+
+    def write_memory(self, page_number):
+        self.mmu.write_memory(page_number)
+        self._track(page_number)
+
+    def report(self):
+        return [f"prefetched pages: {self.issued}",
+                f"prefetched pages used: {self.used}",
+                f"prefetched pages evicted unused: {self.wasted}",
+                f"prefetched pages resident unused: {len(self.prefetched)}"]
+
+
+def main():
+    from tracefile import read_trace, replay
+
+    if len(sys.argv) < 3:
+        print("Usage: python prefetch.py inputfile numberframes [lru|clock] [window] [max_window]")
+        return
+
+    input_file = sys.argv[1]
+    frames = int(sys.argv[2])
+    algorithm = sys.argv[3] if len(sys.argv) > 3 else "lru"
+    window = int(sys.argv[4]) if len(sys.argv) > 4 else 4
+    # by default keep read-ahead pages to a small share of memory
+    max_window = int(sys.argv[5]) if len(sys.argv) > 5 else max(1, min(64, frames // 16))
+    if algorithm == "lru":
+        from lrummu import LruMMU as policy
+    elif algorithm == "clock":
+        from clockmmu import ClockMMU as policy
+    else:
+        print("Readahead needs a policy with prefetch support: [lru, clock]")
+        return
+
+    try:
+        pages, writes = read_trace(input_file)
+    except FileNotFoundError:
+        print(f"Input '{input_file}' could not be found")
+        return
+
+    demand = policy(frames)
+    replay(demand, pages, writes)
+    readahead = ReadaheadMMU(policy(frames), window, max_window)
+    replay(readahead, pages, writes)
+
+    print(f"{'':<12} {'faults':>10} {'disk reads':>12} {'disk writes':>12}")
+    for label, mmu in (("on-demand", demand), ("readahead", readahead)):
+        print(f"{label:<12} {mmu.get_total_page_faults():>10} "
+              f"{mmu.get_total_disk_reads():>12} {mmu.get_total_disk_writes():>12}")
+    for line in readahead.report():
+        print(line)
+    saved = demand.get_total_page_faults() - readahead.get_total_page_faults()
+    extra = readahead.get_total_disk_reads() - demand.get_total_disk_reads()
+    print(f"net fault reduction: {saved} faults ({extra:+d} disk reads)")
+
+
+if __name__ == "__main__":
+    main()
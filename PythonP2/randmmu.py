@@ -1,15 +1,22 @@
 from mmu import MMU
 import random
+from pagetable import new_page_map
 
 class RandMMU(MMU):
-    def __init__(self, frames):
+    can_snapshot = True
+    can_resize = True
+    reports_faults = True
+
+    def __init__(self, frames, compact=False):
         self.page_fault_count = 0
         self.write_disk_count = 0
         self.read_disk_count = 0
         self.is_debug_mode = False
         self.table_size = frames
         self.table = []
-        random.seed(999)
+        self.compact = compact
+        self.page_map = new_page_map(frames, compact)  # page_number -> index in table
+        self.rng = random.Random(999)
 
     def set_debug(self):
         self.is_debug_mode = True
@@ -18,7 +25,7 @@ class RandMMU(MMU):
         self.is_debug_mode = False
 
     def read_memory(self, page_number):
-        if page_number in self.table:
+        if page_number in self.page_map:
             if self.is_debug_mode:
                 print(f"{page_number} already in table, current table is:")
                 print(self.table)
@@ -34,11 +41,12 @@ class RandMMU(MMU):
             if self.is_debug_mode:
                 print(f"{page_number} after read from disk, current table is:")
                 print(self.table)
+            return True
 
 
     def write_memory(self, page_number):
 
-        if page_number not in self.table:
+        if page_number not in self.page_map:
             self.page_fault_count += 1
             self.read_disk_count += 1
             if self.is_debug_mode:
@@ -46,14 +54,21 @@ class RandMMU(MMU):
                 print(self.table)
                 print(f"writing {page_number} to table")
             if len(self.table) == self.table_size:
-                random_index = random.randint(0, self.table_size-1)
+                random_index = self.rng.randint(0, self.table_size-1)
+                del self.page_map[self.table[random_index]]
+                if self.evict_listener is not None:
+                    # this MMU counts every eviction as a disk write
+                    self.evict_listener(self.table[random_index], True)
                 self.table[random_index] = page_number
+                self.page_map[page_number] = random_index
                 self.write_disk_count += 1
             else:
+                self.page_map[page_number] = len(self.table)
                 self.table.append(page_number)
             if self.is_debug_mode:
                 print("table after writing:")
                 print(self.table)
+            return True
         else:
             
             if self.is_debug_mode:
@@ -61,6 +76,28 @@ class RandMMU(MMU):
 
 
 
+    def resize(self, frames):
+        # Shrinking evicts random pages; the last table entry fills each
+        # hole so the table stays dense.
+        while len(self.table) > frames:
+            random_index = self.rng.randint(0, len(self.table) - 1)
+            victim = self.table[random_index]
+            del self.page_map[victim]
+            if self.evict_listener is not None:
+                # this MMU counts every eviction as a disk write
+                self.evict_listener(victim, True)
+            self.write_disk_count += 1
+            last = self.table.pop()
+            if random_index < len(self.table):
+                self.table[random_index] = last
+                self.page_map[last] = random_index
+        if self.compact:
+            self.page_map.reserve(frames)
+        self.table_size = frames
+        if self.is_debug_mode:
+            print(f"Resized to {frames} frames, current table is:")
+            print(self.table)
+
     def get_total_disk_reads(self):
         return self.read_disk_count
 
@@ -69,3 +106,34 @@ class RandMMU(MMU):
 
     def get_total_page_faults(self):
         return self.page_fault_count
+
+    def resident_pages(self):
+        return len(self.page_map)
+
+    def seed(self, value):
+        # Reseed the victim selection, e.g. to fork variants of one warm state
+        self.rng.seed(value)
+
+    def snapshot(self):
+        from array import array
+        import snapshot
+        version, state, gauss_next = self.rng.getstate()
+        return snapshot.dump("RandMMU",
+                             [self.table_size, self.page_fault_count, self.write_disk_count,
+                              self.read_disk_count, self.compact, version],
+                             [array('q', self.table), array('Q', state)])
+
+    def restore(self, data):
+        import snapshot
+        _, ints, (table, state) = snapshot.load(data, "RandMMU")
+        (self.table_size, self.page_fault_count, self.write_disk_count,
+         self.read_disk_count, compact, version) = ints
+        self.table = list(table)
+        self.page_map = new_page_map(self.table_size, compact)
+        self.compact = bool(compact)
+        for i, page_number in enumerate(self.table):
+            self.page_map[page_number] = i
+        self.rng = random.Random()
+        self.rng.setstate((version, tuple(state), None))
+        self.is_debug_mode = False
+
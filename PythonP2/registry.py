@@ -0,0 +1,78 @@
+'''
+* Registry of page replacement policies.
+* Policies are declared by name with the module and class that implement
+* them; the module is only imported when the policy is actually used, so
+* selecting one policy never pays for importing the others. Modules that
+* need heavy optional packages (e.g. NumPy) must import them inside the
+* functions that use them, not at module level.
+*
+* To add a policy, add a line to POLICIES (or call register()).
+'''
+from importlib import import_module
+
+# name -> (module, class, accepts compact=, description)
+POLICIES = {
+    "lru": ("lrummu", "LruMMU", False, "least recently used"),
+    "clock": ("clockmmu", "ClockMMU", True, "second chance (clock)"),
+    "rand": ("randmmu", "RandMMU", True, "random victim"),
+    "lfu": ("lfummu", "LfuMMU", False, "least frequently used"),
+    "aging": ("agingmmu", "AgingMMU", False, "aging counters (8 bits, tick every 1000 events)"),
+    "nfu": ("agingmmu", "NfuMMU", False, "not frequently used (tick every 1000 events)"),
+}
+
+# older names still accepted on the command line
+ALIASES = {
+    "esc": "clock",
+}
+
+
+def register(name, module, class_name, compact=False, description=""):
+    POLICIES[name] = (module, class_name, compact, description)
+
+
+def names():
+    return list(POLICIES)
+
+
+def resolve(name):
+    name = ALIASES.get(name, name)
+    if name not in POLICIES:
+        raise KeyError(name)
+    return name
+
+
+def get_policy(name):
+    module, class_name, _, _ = POLICIES[resolve(name)]
+    return getattr(import_module(module), class_name)
+
+
+def supports_compact(name):
+    return POLICIES[resolve(name)][2]
+
+
+def create(name, frames, compact=False):
+    name = resolve(name)
+    policy = get_policy(name)
+    if compact:
+        if not POLICIES[name][2]:
+            raise ValueError(compact_message())
+        return policy(frames, compact=True)
+    return policy(frames)
+
+
+def invalid_message():
+    return f"Invalid replacement mode. Valid options are [{', '.join(names())}]"
+
+
+def compact_message():
+    compact = [name for name, policy in POLICIES.items() if policy[2]]
+    return f"Compact page tables need a policy with compact support: [{', '.join(compact)}]"
+
+
+def listing():
+    lines = []
+    for name, (module, class_name, compact, description) in POLICIES.items():
+        aliases = [alias for alias, target in ALIASES.items() if target == name]
+        alias_text = f" (alias: {', '.join(aliases)})" if aliases else ""
+        lines.append(f"{name:<8} {class_name:<10} {description}{alias_text}")
+    return lines
@@ -0,0 +1,106 @@
+'''
+* Warm-up exclusion and windowed counters for memsim.py.
+* The simulation loop only compares the event count against `next_mark`;
+* everything here runs at those marks, so a run with no warm-up and no
+* windows pays nothing beyond that comparison.
+*
+* Fill detection compares the MMU's resident pages with `frames`, which the
+* caller updates when memory is resized. state()/restore() carry the warm-up
+* progress across checkpoints, so a resumed run excludes the same prefix as
+* an uninterrupted one.
+*
+* Window file: CSV, one line per window
+*   end_event,page_faults,disk_reads,disk_writes
+* with counts for that window only.
+'''
+import sys
+
+NO_MARK = sys.maxsize
+
+
+class RunStats:
+    def __init__(self, mmu, frames, warmup=0, fill=False, window=0, window_file=None, start=0):
+        self.mmu = mmu
+        self.frames = frames
+        self.warmup = warmup
+        self.fill = fill
+        self.window = window
+        self.window_file = window_file
+        self.warm = not (warmup or fill)
+        self.loads_per_event = 1  # pages an event can load (more with readahead)
+        self.warmup_events = 0
+        self.baseline = (0, 0, 0)
+        # a resumed run starts mid-trace with the counters already restored
+        self.last_window = (start,) + self.counters()  # end_event, faults, reads, writes
+        self.next_window = (start // window + 1) * window if window else NO_MARK
+        if window_file is not None:
+            window_file.write("end_event,page_faults,disk_reads,disk_writes\n")
+
+    def counters(self):
+        mmu = self.mmu
+        return (mmu.get_total_page_faults(), mmu.get_total_disk_reads(),
+                mmu.get_total_disk_writes())
+
+    def resident(self):
+        # pages in frames; the fault count bounds it for MMUs that cannot tell
+        resident = self.mmu.resident_pages()
+        return resident if resident >= 0 else self.mmu.get_total_page_faults()
+
+    def state(self):
+        # (warmed up, warm-up end event, faults, reads, writes at that event)
+        return (self.warm, self.warmup_events) + self.baseline
+
+    def restore(self, state):
+        warm, warmup_events, *baseline = state
+        if warm:
+            self.warm = True
+            self.warmup_events = warmup_events
+            self.baseline = tuple(baseline)
+
+    def next_mark(self, no_events):
+        mark = self.next_window
+        if not self.warm:
+            if self.fill:
+                # the frames cannot be full before this many more events
+                mark = min(mark, no_events + max(1, (self.frames - self.resident())
+                                                 // self.loads_per_event))
+            else:
+                mark = min(mark, max(self.warmup, no_events + 1))
+        return mark
+
+    def at(self, no_events):
+        if not self.warm:
+            if self.fill:
+                done = self.resident() >= self.frames
+            else:
+                done = no_events >= self.warmup
+            if done:
+                self.warm = True
+                self.warmup_events = no_events
+                self.baseline = self.counters()
+        if no_events == self.next_window:
+            self._write_window(no_events)
+            self.next_window += self.window
+        return self.next_mark(no_events)
+
+    def _write_window(self, no_events):
+        faults, reads, writes = self.counters()
+        _, last_faults, last_reads, last_writes = self.last_window
+        if self.window_file is not None:
+            self.window_file.write(f"{no_events},{faults - last_faults},"
+                                   f"{reads - last_reads},{writes - last_writes}\n")
+        self.last_window = (no_events, faults, reads, writes)
+
+    def finish(self, no_events):
+        # flush a final partial window
+        if self.window and no_events > self.last_window[0]:
+            self._write_window(no_events)
+
+    def measured(self, no_events):
+        # (events, page_faults, disk_reads, disk_writes) after warm-up
+        if not self.warm:
+            return 0, 0, 0, 0
+        faults, reads, writes = self.counters()
+        base_faults, base_reads, base_writes = self.baseline
+        return (no_events - self.warmup_events, faults - base_faults,
+                reads - base_reads, writes - base_writes)
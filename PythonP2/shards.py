@@ -0,0 +1,259 @@
+'''
+* Approximate LRU miss-ratio curves by spatial sampling (SHARDS).
+* Pages are selected by a hash of the page number, so every access to a
+* sampled page is tracked and reuse behaviour is preserved. Stack distances
+* measured among the sampled pages are scaled back up by the sampling rate.
+*
+* Two variants are provided:
+*   shards_fixed_rate  - sample a fixed fraction of the pages
+*   shards_fixed_size  - track at most `max_pages` pages, lowering the
+*                        sampling rate as new pages arrive (constant memory)
+*
+* The sampled pages' latest accesses are slots in a Fenwick tree
+* (RecencyIndex), so each sampled access costs O(log n); the tree is
+* renumbered when its slots run out and stays within twice the number of
+* tracked pages. The fixed-size variant keeps its histogram in buckets of
+* 2**BUCKET_BITS per power of two, since its scaled distances change with
+* the rate. With NumPy installed pages are hashed a chunk at a time and only
+* the sampled ones reach Python.
+*
+* Usage: python shards.py inputfile rate|max_pages [frames ...]
+'''
+import heapq
+import sys
+import time
+
+from mrc import Fenwick, StackDistanceHistogram
+
+HASH_BITS = 24
+HASH_MODULUS = 1 << HASH_BITS
+_HASH_MULT = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+BUCKET_BITS = 6  # scaled distances keep 6 bits below the leading one (buckets under 1.6% wide)
+MIN_SLOTS = 1024
+CHUNK = 1 << 16  # events hashed per step
+
+
+def page_hash(page_number):
+    # Fibonacci hashing, top HASH_BITS bits of a 64-bit product
+    return ((page_number * _HASH_MULT) & _MASK64) >> (64 - HASH_BITS)
+
+
+def bucket(distance):
+    # distance rounded down to its histogram bucket; 2**BUCKET_BITS buckets
+    # per power of two keep a histogram of scaled distances small
+    drop = distance.bit_length() - BUCKET_BITS - 1
+    return distance >> drop << drop if drop > 0 else distance
+
+
+class RecencyIndex:
+    # The latest access of every tracked page as a slot in a Fenwick tree,
+    # so the pages touched since a page's last access are counted in
+    # O(log n). Slots are handed out in access order; when they run out the
+    # live ones are renumbered into a tree twice the number of pages.
+    def __init__(self):
+        self.slots = {}  # page -> slot of its latest access
+        self._renumber()
+
+    def __len__(self):
+        return len(self.slots)
+
+    def touch(self, page_number):
+        # the stack distance of this access among the tracked pages, or
+        # None for a new page; page_number becomes the most recent
+        # (Fenwick.prefix and add inlined: this runs for every sample)
+        if self.next_slot == self.size:
+            self._renumber()
+        slots = self.slots
+        tree = self.tree.tree
+        size = self.size
+        slot = slots.get(page_number)
+        if slot is None:
+            distance = None
+        else:
+            pos = slot + 1
+            distance = len(slots) + 1
+            while pos > 0:
+                distance -= tree[pos]
+                pos &= pos - 1
+            pos = slot + 1
+            while pos <= size:
+                tree[pos] -= 1
+                pos += pos & -pos
+        slot = slots[page_number] = self.next_slot
+        self.next_slot += 1
+        pos = slot + 1
+        while pos <= size:
+            tree[pos] += 1
+            pos += pos & -pos
+        return distance
+
+    def remove(self, page_number):
+        self.tree.add(self.slots.pop(page_number), -1)
+
+    def _renumber(self):
+        order = sorted(self.slots, key=self.slots.get)
+        self.size = max(MIN_SLOTS, 2 * len(order))
+        self.tree = Fenwick(self.size)
+        for slot, page_number in enumerate(order):
+            self.slots[page_number] = slot
+            self.tree.add(slot, 1)
+        self.next_slot = len(order)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _candidates(pages, start, threshold, np=None):
+    # (page, hash) for the pages of pages[start:start + CHUNK] that hash
+    # below threshold; with NumPy the whole chunk is hashed at once
+    chunk = pages[start:start + CHUNK]
+    shift = 64 - HASH_BITS
+    if np is None:
+        return [(page_number, h) for page_number in chunk
+                for h in (((page_number * _HASH_MULT) & _MASK64) >> shift,) if h < threshold]
+    values = np.asarray(chunk).astype(np.uint64)
+    hashes = values * np.uint64(_HASH_MULT) >> np.uint64(shift)
+    keep = hashes < threshold
+    return zip(values[keep].tolist(), hashes[keep].tolist())
+
+
+def shards_fixed_rate(pages, rate, vectorize=True):
+    threshold = int(rate * HASH_MODULUS)
+    if threshold < 1:
+        raise ValueError("Sampling rate too small")
+    rate = threshold / HASH_MODULUS
+    np = _numpy() if vectorize else None
+    histogram = StackDistanceHistogram()
+    hist = histogram.hist
+    recency = RecencyIndex()
+    sampled = 0
+    for start in range(0, len(pages), CHUNK):
+        for page_number, _ in _candidates(pages, start, threshold, np):
+            sampled += 1
+            distance = recency.touch(page_number)
+            if distance is None:
+                histogram.cold += 1
+            else:
+                distance = int(distance / rate)
+                hist[distance] = hist.get(distance, 0) + 1
+
+    histogram.events = len(pages)
+    # SHARDS_adj: correct for the sample holding more or fewer accesses than
+    # expected by crediting the difference to the smallest distance bucket.
+    expected = len(pages) * rate
+    if hist and expected != sampled:
+        smallest = min(hist)
+        hist[smallest] = hist[smallest] + (expected - sampled)
+    _rescale(histogram, 1 / rate)
+    return histogram
+
+
+def shards_fixed_size(pages, max_pages, vectorize=True):
+    threshold = HASH_MODULUS
+    np = _numpy() if vectorize else None
+    histogram = StackDistanceHistogram()
+    hist = histogram.hist
+    recency = RecencyIndex()
+    heap = []  # (-hash, page) for every tracked page, largest hash on top
+    # Counts are stored divided by `scale`; lowering the rate multiplies every
+    # existing count by new_rate/old_rate, which only needs to update `scale`.
+    scale = 1.0
+    cold = 0.0
+    for start in range(0, len(pages), CHUNK):
+        # candidates are picked with the threshold at the start of the chunk
+        for page_number, h in _candidates(pages, start, threshold, np):
+            if h >= threshold:
+                continue
+            distance = recency.touch(page_number)
+            if distance is None:
+                cold += 1 / scale
+                heapq.heappush(heap, (-h, page_number))
+            else:
+                distance = bucket(int(distance * HASH_MODULUS / threshold))
+                hist[distance] = hist.get(distance, 0) + 1 / scale
+
+            if len(recency) > max_pages:
+                # Lower the threshold to the largest tracked hash and drop
+                # every page that no longer falls under it.
+                new_threshold = -heap[0][0]
+                while heap and -heap[0][0] >= new_threshold:
+                    recency.remove(heapq.heappop(heap)[1])
+                scale *= new_threshold / threshold
+                threshold = new_threshold
+
+    histogram.cold = cold
+    histogram.events = len(pages)
+    for distance in hist:
+        hist[distance] *= scale
+    histogram.cold *= scale
+    # Normalise so the total matches the number of events in the trace.
+    total = histogram.total()
+    if total:
+        _rescale(histogram, len(pages) / total)
+    return histogram
+
+
+def _rescale(histogram, factor):
+    for distance in histogram.hist:
+        histogram.hist[distance] *= factor
+    histogram.cold *= factor
+
+
+def error_report(histogram, pages, writes, frame_counts):
+    # Compare the approximate curve against exact LruMMU simulations.
+    from lrummu import LruMMU
+    from tracefile import replay
+
+    estimated = histogram.miss_ratio_curve(frame_counts)
+    rows = []
+    for frames in frame_counts:
+        mmu = LruMMU(frames)
+        replay(mmu, pages, writes)
+        exact = mmu.get_total_page_faults() / len(pages)
+        rows.append((frames, exact, estimated[frames], abs(estimated[frames] - exact)))
+    return rows
+
+
+def main():
+    from tracefile import read_trace
+
+    if len(sys.argv) < 3:
+        print("Usage: python shards.py inputfile rate|max_pages [frames ...]")
+        return
+
+    input_file = sys.argv[1]
+    try:
+        pages, writes = read_trace(input_file)
+    except FileNotFoundError:
+        print(f"Input '{input_file}' could not be found")
+        return
+
+    start = time.perf_counter()
+    if "." in sys.argv[2]:
+        histogram = shards_fixed_rate(pages, float(sys.argv[2]))
+        mode = f"fixed rate {sys.argv[2]}"
+    else:
+        histogram = shards_fixed_size(pages, int(sys.argv[2]))
+        mode = f"fixed size {sys.argv[2]} pages"
+    elapsed = time.perf_counter() - start
+
+    frame_counts = [int(f) for f in sys.argv[3:]] or [10, 25, 50, 100, 200, 400, 800]
+    rows = error_report(histogram, pages, writes, frame_counts)
+
+    print(f"SHARDS {mode}: {elapsed:.3f}s for {len(pages)} events")
+    print(f"{'frames':>8} {'exact':>8} {'shards':>8} {'abs err':>8}")
+    for frames, exact, estimated, err in rows:
+        print(f"{frames:>8} {exact:>8.4f} {estimated:>8.4f} {err:>8.4f}")
+    errors = [row[3] for row in rows]
+    print(f"mean abs error: {sum(errors) / len(errors):.4f}")
+    print(f"max abs error: {max(errors):.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+'''
+* A decoded trace placed in a multiprocessing.shared_memory segment.
+* The parent creates the segment once; worker processes attach to it by name
+* and read the page and write-flag arrays without copying or pickling them.
+*
+* Every segment created here is unlinked by its creating process when it is
+* closed, at interpreter exit, or on SIGTERM/SIGINT. Segments left behind by
+* a hard kill are reclaimed by multiprocessing's resource tracker.
+*
+* Segment layout: [pages: events * uint64][writes: events * uint8]
+'''
+import atexit
+from multiprocessing import shared_memory
+import os
+import signal
+
+_owned = {}  # segment name -> SharedTrace created by this process
+
+
+class SharedTrace:
+    def __init__(self, shm, events, owner):
+        self.shm = shm
+        self.name = shm.name
+        self.events = events
+        self.owner = owner
+        self.creator_pid = os.getpid() if owner else None
+        self.pages = shm.buf[:8 * events].cast('Q')
+        self.writes = shm.buf[8 * events:9 * events]
+
+    @classmethod
+    def create(cls, pages, writes):
+        events = len(pages)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, 9 * events))
+        trace = cls(shm, events, owner=True)
+        _install_cleanup()
+        _owned[trace.name] = trace
+        trace.pages[:] = memoryview(pages)
+        trace.writes[:] = bytes(writes)
+        return trace
+
+    @classmethod
+    def attach(cls, name, events):
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, events, owner=False)
+
+    def handle(self):
+        # What a worker needs to attach: small and cheap to pickle.
+        return (self.name, self.events)
+
+    def close(self):
+        if self.shm is None:
+            return
+        self.pages.release()
+        self.writes.release()
+        self.shm.close()
+        # forked children inherit owned handles but must not unlink them
+        if self.owner and self.creator_pid == os.getpid():
+            self.shm.unlink()
+            _owned.pop(self.name, None)
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+
+_attached = {}  # per-process cache of segments attached by name
+
+
+def attach_cached(name, events):
+    # Pool workers run many tasks against the same trace; attach only once.
+    trace = _attached.get(name)
+    if trace is None:
+        trace = _attached[name] = SharedTrace.attach(name, events)
+    return trace
+
+
+def cleanup():
+    for trace in list(_owned.values()):
+        trace.close()
+
+
+_cleanup_installed = False
+
+
+def _install_cleanup():
+    global _cleanup_installed
+    if _cleanup_installed:
+        return
+    _cleanup_installed = True
+    atexit.register(cleanup)
+    # Turn SIGTERM into a normal exit so `with` blocks and atexit run.
+    if signal.getsignal(signal.SIGTERM) is signal.SIG_DFL:
+        try:
+            signal.signal(signal.SIGTERM, _terminate)
+        except ValueError:
+            pass  # not the main thread
+
+
+def _terminate(signum, frame):
+    raise SystemExit(128 + signum)
@@ -0,0 +1,264 @@
+'''
+* Local simulation daemon: keeps decoded traces resident between runs.
+*
+* The daemon listens on a Unix socket and speaks JSON Lines. Each request
+*   {"trace": PATH, "frames": N, "algorithm": NAME}
+* gets one response line with the exact counters
+*   {"trace", "frames", "algorithm", "events", "disk_reads", "disk_writes",
+*    "page_faults", "page_fault_rate"}   or   {"error": MESSAGE}
+* in request order. {"op": "status"} lists the resident traces and
+* {"op": "shutdown"} stops the daemon.
+*
+* Traces are decoded once into shared memory segments (sharedtrace.py) and
+* kept under a memory budget, evicting the least recently used trace that
+* no running simulation needs. A trace is reloaded when its file changes.
+* Simulations run in a process pool whose workers attach to the segments
+* by name; finished results are kept in an LRU result cache.
+*
+* Usage: python simdaemon.py [--socket PATH] [--budget MB] [--workers N]
+*        python memsim.py inputfile frames mode quiet --daemon [PATH]
+'''
+import json
+import os
+import socket
+
+RESULT_CACHE_SIZE = 4096
+
+
+def default_socket():
+    return os.environ.get("MEMSIM_SOCKET", f"/tmp/memsim-{os.getuid()}.sock")
+
+
+def _simulate(name, events, frames, algorithm):
+    # runs in a pool worker
+    from sharedtrace import SharedTrace
+    from sweep import make_mmu
+    from tracefile import replay
+
+    with SharedTrace.attach(name, events) as trace:
+        mmu = make_mmu(algorithm, frames)
+        replay(mmu, trace.pages, trace.writes)
+        return mmu.get_total_disk_reads(), mmu.get_total_disk_writes(), mmu.get_total_page_faults()
+
+
+class TraceCache:
+    def __init__(self, budget):
+        from collections import OrderedDict
+        self.budget = budget
+        self.traces = OrderedDict()  # (path, mtime, size) -> SharedTrace, LRU first
+        self.loading = {}            # key -> future of a load in progress
+        self.in_use = {}             # key -> running simulations
+        self.stale = set()           # keys of changed files, dropped on last release
+        self.bytes = 0
+
+    async def get(self, path):
+        import asyncio
+        from sharedtrace import SharedTrace
+        from tracefile import read_trace
+
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        trace = self.traces.get(key)
+        if trace is not None:
+            self.traces.move_to_end(key)
+            self.stale.discard(key)
+            return key, trace
+        if key not in self.loading:
+            # decode in a thread so other requests keep being served
+            loop = asyncio.get_running_loop()
+            self.loading[key] = loop.run_in_executor(None, read_trace, path)
+        try:
+            pages, writes = await asyncio.shield(self.loading[key])
+        finally:
+            self.loading.pop(key, None)
+        if key not in self.traces:
+            for old_key in [k for k in self.traces if k[0] == path]:
+                # the file has changed; running simulations keep their copy
+                if self.in_use.get(old_key):
+                    self.stale.add(old_key)
+                else:
+                    self._drop(old_key)
+            size = 9 * len(pages)
+            self._make_room(size)
+            self.traces[key] = SharedTrace.create(pages, writes)
+            self.bytes += size
+        return key, self.traces[key]
+
+    def _make_room(self, size):
+        for key in list(self.traces):
+            if self.bytes + size <= self.budget:
+                break
+            if not self.in_use.get(key):
+                self._drop(key)
+
+    def _drop(self, key):
+        self.stale.discard(key)
+        trace = self.traces.pop(key)
+        self.bytes -= 9 * trace.events
+        trace.close()
+
+    def acquire(self, key):
+        self.in_use[key] = self.in_use.get(key, 0) + 1
+
+    def release(self, key):
+        self.in_use[key] -= 1
+        if not self.in_use[key]:
+            del self.in_use[key]
+            if key in self.stale:
+                self._drop(key)
+
+    def status(self):
+        return {"budget": self.budget, "bytes": self.bytes,
+                "traces": [{"trace": key[0], "events": trace.events}
+                           for key, trace in self.traces.items()]}
+
+    def close(self):
+        for key in list(self.traces):
+            self._drop(key)
+
+
+class SimulationDaemon:
+    def __init__(self, budget, workers=None):
+        from collections import OrderedDict
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+        self.cache = TraceCache(budget)
+        # forked workers would inherit client connections and keep them
+        # open after the daemon closes them, so start them from a server
+        self.pool = ProcessPoolExecutor(workers, multiprocessing.get_context("forkserver"))
+        self.results = OrderedDict()  # (trace key, frames, algorithm) -> counters
+        self.clients = set()          # connection handler tasks
+        self.stopping = None
+
+    async def run(self, request):
+        import asyncio
+        import registry
+
+        path = request["trace"]
+        frames = int(request["frames"])
+        if frames < 1:
+            raise ValueError("Frame number must be at least 1")
+        try:
+            algorithm = registry.resolve(request["algorithm"])
+        except KeyError:
+            raise ValueError(registry.invalid_message()) from None
+        key, trace = await self.cache.get(path)
+        result_key = (key, frames, algorithm)
+        counters = self.results.get(result_key)
+        if counters is not None:
+            self.results.move_to_end(result_key)
+        else:
+            self.cache.acquire(key)
+            try:
+                loop = asyncio.get_running_loop()
+                counters = await loop.run_in_executor(
+                    self.pool, _simulate, trace.name, trace.events, frames, algorithm)
+            finally:
+                self.cache.release(key)
+            self.results[result_key] = counters
+            if len(self.results) > RESULT_CACHE_SIZE:
+                self.results.popitem(last=False)
+        disk_reads, disk_writes, page_faults = counters
+        events = trace.events
+        return {"trace": path, "frames": frames, "algorithm": request["algorithm"],
+                "events": events, "disk_reads": disk_reads, "disk_writes": disk_writes,
+                "page_faults": page_faults,
+                "page_fault_rate": page_faults / events if events else 0.0}
+
+    async def answer(self, line):
+        try:
+            request = json.loads(line)
+            op = request.get("op", "run")
+            if op == "status":
+                return self.cache.status()
+            if op == "shutdown":
+                self.stopping.set()
+                return {"ok": True}
+            return await self.run(request)
+        except Exception as e:
+            # keep serving; the client gets the message instead of a result
+            return {"error": str(e)}
+
+    async def handle(self, reader, writer):
+        import asyncio
+
+        pending = asyncio.Queue()
+
+        async def respond():
+            # answers go back in request order, while later ones keep running
+            while True:
+                task = await pending.get()
+                if task is None:
+                    break
+                writer.write(json.dumps(await task).encode() + b"\n")
+                await writer.drain()
+
+        self.clients.add(asyncio.current_task())
+        responder = asyncio.create_task(respond())
+        try:
+            async for line in reader:
+                if line.strip():
+                    pending.put_nowait(asyncio.create_task(self.answer(line)))
+        finally:
+            pending.put_nowait(None)
+            await responder
+            writer.close()
+            self.clients.discard(asyncio.current_task())
+
+    async def serve(self, path):
+        import asyncio
+
+        self.stopping = asyncio.Event()
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self.handle, path=path)
+        try:
+            await self.stopping.wait()
+        finally:
+            # stop accepting, then let open connections send their answers
+            server.close()
+            if self.clients:
+                await asyncio.wait(self.clients, timeout=5)
+            if os.path.exists(path):
+                os.unlink(path)
+            self.cache.close()
+            self.pool.shutdown()
+
+
+def query(requests, path=None):
+    # Send requests to a running daemon and yield its responses in order.
+    # Raises OSError when no daemon is listening.
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(path or default_socket())
+        connection.sendall(b"".join(json.dumps(request).encode() + b"\n" for request in requests))
+        connection.shutdown(socket.SHUT_WR)
+        with connection.makefile('rb') as responses:
+            for line in responses:
+                yield json.loads(line)
+    finally:
+        connection.close()
+
+
+def main():
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Keep traces in memory and serve memsim runs")
+    parser.add_argument("--socket", default=default_socket(),
+                        help="Unix socket path (default $MEMSIM_SOCKET or /tmp/memsim-UID.sock)")
+    parser.add_argument("--budget", type=int, default=1024,
+                        help="memory for resident traces in MB (default 1024)")
+    parser.add_argument("--workers", type=int, help="simulation processes (default: CPU count)")
+    args = parser.parse_args()
+
+    daemon = SimulationDaemon(args.budget << 20, args.workers)
+    print(f"listening on {args.socket}")
+    try:
+        asyncio.run(daemon.serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+'''
+* Compact binary encoding used by MMU.snapshot()/restore().
+*
+* Layout (little endian):
+*   b'MMUS' | u8 version | u8 len(kind) | kind
+*   u32 n_ints | n_ints * i64
+*   u32 n_arrays | per array: u8 typecode | u64 count | raw items
+'''
+from array import array
+import struct
+
+MAGIC = b'MMUS'
+VERSION = 1
+
+
+def dump(kind, ints, arrays=()):
+    kind = kind.encode('ascii')
+    parts = [MAGIC, struct.pack('<BB', VERSION, len(kind)), kind,
+             struct.pack(f'<I{len(ints)}q', len(ints), *ints),
+             struct.pack('<I', len(arrays))]
+    for values in arrays:
+        parts.append(struct.pack('<cQ', values.typecode.encode('ascii'), len(values)))
+        parts.append(values.tobytes())
+    return b''.join(parts)
+
+
+def load(data, expected_kind=None):
+    data = memoryview(data)
+    if bytes(data[:4]) != MAGIC:
+        raise ValueError("Not an MMU snapshot")
+    version, kind_len = struct.unpack_from('<BB', data, 4)
+    if version != VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    offset = 6
+    kind = bytes(data[offset:offset + kind_len]).decode('ascii')
+    offset += kind_len
+    if expected_kind is not None and kind != expected_kind:
+        raise ValueError(f"Snapshot is for {kind}, not {expected_kind}")
+    (n_ints,) = struct.unpack_from('<I', data, offset)
+    ints = list(struct.unpack_from(f'<{n_ints}q', data, offset + 4))
+    offset += 4 + 8 * n_ints
+    (n_arrays,) = struct.unpack_from('<I', data, offset)
+    offset += 4
+    arrays = []
+    for _ in range(n_arrays):
+        typecode, count = struct.unpack_from('<cQ', data, offset)
+        offset += 9
+        values = array(typecode.decode('ascii'))
+        size = values.itemsize * count
+        values.frombytes(data[offset:offset + size])
+        offset += size
+        arrays.append(values)
+    return kind, ints, arrays
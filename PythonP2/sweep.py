@@ -0,0 +1,166 @@
+'''
+* Parallel (trace, frames, algorithm) sweeps over shared-memory traces.
+* Each trace file is parsed once in the parent and placed in a shared memory
+* segment; pool workers attach to it by name, so a sweep with many workers
+* keeps roughly one copy of each trace in memory.
+*
+* run_forked() replays a shared warm-up prefix once, snapshots the MMU and
+* forks every variant from that snapshot instead of replaying the prefix.
+* With --fork-after N the command line does this per trace and algorithm:
+* the first N events run once with the largest frame count, and each frame
+* count is a variant that resizes the warmed MMU (policies with resize
+* support). Counters include the shared prefix at the largest size.
+*
+* Usage: python sweep.py outputcsv frames algorithms [workers] tracefile ... [--fork-after N]
+*   e.g. python sweep.py results.csv 10,50,100 lru,clock,rand 16 trace/*.trace
+'''
+import csv
+from functools import partial
+from multiprocessing import Pool
+import sys
+
+from sharedtrace import SharedTrace, attach_cached
+
+FIELDNAMES = ['trace', 'frames', 'algorithm', 'total_frames', 'events',
+              'disk_reads', 'disk_writes', 'page_fault_rate', 'page_faults']
+
+
+def make_mmu(algorithm, frames):
+    import registry
+    try:
+        return registry.create(algorithm, frames)
+    except KeyError:
+        raise ValueError(registry.invalid_message()) from None
+
+
+def _run_task(task):
+    trace_file, name, events, frames, algorithm = task
+    from tracefile import replay
+    trace = attach_cached(name, events)
+    mmu = make_mmu(algorithm, frames)
+    replay(mmu, trace.pages, trace.writes)
+    return result_row(trace_file, frames, algorithm, events, mmu)
+
+
+def result_row(trace_file, frames, algorithm, events, mmu):
+    page_faults = mmu.get_total_page_faults()
+    return {
+        'trace': trace_file,
+        'frames': frames,
+        'algorithm': algorithm,
+        'total_frames': frames,
+        'events': events,
+        'disk_reads': mmu.get_total_disk_reads(),
+        'disk_writes': mmu.get_total_disk_writes(),
+        'page_fault_rate': round(page_faults / events, 4) if events else 0.0,
+        'page_faults': page_faults,
+    }
+
+
+def _run_forked_task(task):
+    name, events, state, algorithm, warmup, label, frames, configure = task
+    from tracefile import replay
+    trace = attach_cached(name, events)
+    mmu = make_mmu(algorithm, frames)
+    mmu.restore(state)
+    if configure is not None:
+        configure(mmu)
+    replay(mmu, trace.pages[warmup:], trace.writes[warmup:])
+    return result_row(label, frames, algorithm, events, mmu)
+
+
+def run_forked(pages, writes, algorithm, frames, warmup, variants, workers=None):
+    # variants: list of (label, frames, configure) where configure is a
+    # picklable callable applied to each forked MMU before it replays the
+    # remainder; label and frames are what the variant's row reports.
+    from tracefile import replay
+
+    mmu = make_mmu(algorithm, frames)
+    if not mmu.can_snapshot:
+        raise ValueError(f"Forked sweeps need a policy with snapshot support, not '{algorithm}'")
+    replay(mmu, pages[:warmup], writes[:warmup])
+    state = mmu.snapshot()
+    with SharedTrace.create(pages, writes) as trace:
+        name, events = trace.handle()
+        tasks = [(name, events, state, algorithm, warmup, label, variant_frames, configure)
+                 for label, variant_frames, configure in variants]
+        with Pool(workers) as pool:
+            return pool.map(_run_forked_task, tasks, chunksize=1)
+
+
+def _resize(frames, mmu):
+    mmu.resize(frames)
+
+
+def run_forked_sweep(trace_files, frame_counts, algorithms, warmup, workers=None):
+    # run_forked per trace and algorithm, one resize variant per frame count
+    from tracefile import read_trace
+
+    for algorithm in algorithms:
+        if not make_mmu(algorithm, 1).can_resize:
+            raise ValueError(f"Forked sweeps resize the warmed MMU; '{algorithm}' has no resize support")
+    results = []
+    for trace_file in trace_files:
+        pages, writes = read_trace(trace_file)
+        for algorithm in algorithms:
+            variants = [(trace_file, frames, partial(_resize, frames)) for frames in frame_counts]
+            results += run_forked(pages, writes, algorithm, max(frame_counts), warmup, variants, workers)
+    return results
+
+
+def run_sweep(trace_files, frame_counts, algorithms, workers=None):
+    from tracefile import read_trace
+
+    shared = []
+    try:
+        tasks = []
+        for trace_file in trace_files:
+            trace = SharedTrace.create(*read_trace(trace_file))
+            shared.append(trace)
+            name, events = trace.handle()
+            for frames in frame_counts:
+                for algorithm in algorithms:
+                    tasks.append((trace_file, name, events, frames, algorithm))
+        with Pool(workers) as pool:
+            return pool.map(_run_task, tasks, chunksize=1)
+    finally:
+        for trace in shared:
+            trace.close()
+
+
+def main():
+    args = sys.argv[1:]
+    fork_after = None
+    if "--fork-after" in args:
+        at = args.index("--fork-after")
+        fork_after = int(args[at + 1]) if at + 1 < len(args) and args[at + 1].isdigit() else -1
+        del args[at:at + 2]
+    if len(args) < 4 or fork_after == -1:
+        print("Usage: python sweep.py outputcsv frames algorithms [workers] tracefile ... [--fork-after N]")
+        return
+
+    output_file = args[0]
+    frame_counts = [int(f) for f in args[1].split(",")]
+    algorithms = args[2].split(",")
+    rest = args[3:]
+    workers = None
+    if rest[0].isdigit():
+        workers = int(rest.pop(0))
+
+    try:
+        if fork_after is None:
+            results = run_sweep(rest, frame_counts, algorithms, workers)
+        else:
+            results = run_forked_sweep(rest, frame_counts, algorithms, fork_after, workers)
+    except ValueError as e:
+        print(e)
+        return
+    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"{len(results)} results written to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+'''
+* Synthetic traces fitted to a real one.
+*
+* fit reads a trace once and describes it per phase:
+*   distances   stack distance histogram of non-sequential accesses, in
+*               buckets (exact up to 15, then four per power of two)
+*   cold        non-sequential accesses to pages never seen before
+*   runs        lengths of sequential runs (each access is the page after
+*               the previous one), how often a run starts and how many of
+*               its accesses touch new pages
+*   writes      write probability for cold, reused and sequential accesses
+* The trace is cut into windows of `window` events; a window joins the
+* current phase while its access mix stays within `threshold` (L1 distance
+* between normalized distance/cold histograms), otherwise it starts a new
+* phase. The model is a small JSON file.
+*
+* generate streams a trace of any length from a model, phase lengths
+* scaled to the requested length. It keeps an LRU stack of at most
+* `max_stack` pages (_LruStack, blocks of pages by recency): a reuse at
+* distance d takes the d-th most recent page and moves it to the top, and
+* distances beyond the stack become new pages, so memory stays bounded
+* whatever the length. New pages are numbered up from the highest page used
+* so far, as a program's heap grows: a sequential run that continues from a
+* reused page then walks over pages used around the same time, as it does in
+* the original trace; a run that would touch new pages more often than in
+* the original ends early. A new page is never the one after the previous
+* access, which would make it sequential.
+*
+* LRU miss-ratio curves of the synthetic trace follow the original's for
+* memories smaller than `max_stack` pages; `compare` prints both.
+*
+* Usage: python synth.py fit input.trace model.json [--window N] [--threshold X]
+*        python synth.py generate model.json output.trace|.gz|.mtr EVENTS [--seed N] [--max-stack N]
+*        python synth.py compare input.trace model.json [frames ...] [--seed N]
+'''
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+import json
+import random
+
+from mrc import Fenwick
+
+VERSION = 1
+WINDOW = 100000
+THRESHOLD = 0.25
+MAX_STACK = 1 << 16
+CHUNK = 1 << 16
+FIRST_PAGE = 0x10000  # new pages are numbered up from here
+
+
+def _bucket(value):
+    # exact below 16, then four buckets per power of two
+    if value < 16:
+        return value
+    e = value.bit_length() - 1
+    return 16 + 4 * (e - 4) + ((value >> (e - 2)) & 3)
+
+
+def _bucket_range(bucket):
+    if bucket < 16:
+        return bucket, bucket
+    e, sub = divmod(bucket - 16, 4)
+    e += 4
+    low = (4 + sub) << (e - 2)
+    return low, low + (1 << (e - 2)) - 1
+
+
+class _Window:
+    def __init__(self):
+        self.distances = {}  # bucket -> accesses
+        self.cold = 0
+        self.runs = {}       # bucket of run length -> runs
+        self.other = 0       # non-sequential accesses (cold or reused)
+        self.sequential = 0
+        self.sequential_cold = 0
+        self.writes = [0, 0, 0]  # cold, reused, sequential
+
+    def merge(self, other):
+        for bucket, count in other.distances.items():
+            self.distances[bucket] = self.distances.get(bucket, 0) + count
+        for bucket, count in other.runs.items():
+            self.runs[bucket] = self.runs.get(bucket, 0) + count
+        self.cold += other.cold
+        self.other += other.other
+        self.sequential += other.sequential
+        self.sequential_cold += other.sequential_cold
+        self.writes = [a + b for a, b in zip(self.writes, other.writes)]
+
+    def mix(self):
+        total = self.cold + sum(self.distances.values())
+        shares = {bucket: count / total for bucket, count in self.distances.items()} if total else {}
+        shares["cold"] = self.cold / total if total else 0.0
+        return shares
+
+    def difference(self, other):
+        a, b = self.mix(), other.mix()
+        return sum(abs(a.get(key, 0.0) - b.get(key, 0.0)) for key in a.keys() | b.keys())
+
+    def to_json(self):
+        reused = self.other - self.cold
+        runs = sum(self.runs.values())
+        return {
+            "events": self.other + self.sequential,
+            "cold": self.cold,
+            "distances": [[*_bucket_range(bucket), count]
+                          for bucket, count in sorted(self.distances.items())],
+            "run_start": runs / (runs + self.other) if runs + self.other else 0.0,
+            "runs": [[*_bucket_range(bucket), count] for bucket, count in sorted(self.runs.items())],
+            "sequential_cold": self.sequential_cold / self.sequential if self.sequential else 0.0,
+            "write_cold": self.writes[0] / self.cold if self.cold else 0.0,
+            "write_reused": self.writes[1] / reused if reused else 0.0,
+            "write_sequential": self.writes[2] / self.sequential if self.sequential else 0.0,
+        }
+
+
+def fit(pages, writes, window=WINDOW, threshold=THRESHOLD):
+    # model dict for a decoded trace
+    last_access = {}
+    tree = Fenwick(len(pages))
+    windows = []
+    current = _Window()
+    previous = None
+    run = 0
+    for t, (page_number, is_write) in enumerate(zip(pages, writes)):
+        prev = last_access.get(page_number)
+        if previous is not None and page_number == previous + 1:
+            run += 1
+            current.sequential += 1
+            current.sequential_cold += prev is None
+            current.writes[2] += is_write
+        else:
+            if run:
+                bucket = _bucket(run)
+                current.runs[bucket] = current.runs.get(bucket, 0) + 1
+                run = 0
+            current.other += 1
+            if prev is None:
+                current.cold += 1
+                current.writes[0] += is_write
+            else:
+                bucket = _bucket(len(last_access) - tree.prefix(prev) + 1)
+                current.distances[bucket] = current.distances.get(bucket, 0) + 1
+                current.writes[1] += is_write
+        if prev is not None:
+            tree.add(prev, -1)
+        tree.add(t, 1)
+        last_access[page_number] = t
+        previous = page_number
+        if (t + 1) % window == 0:
+            windows.append(current)
+            current = _Window()
+    if run:
+        bucket = _bucket(run)
+        current.runs[bucket] = current.runs.get(bucket, 0) + 1
+    if current.other or current.sequential:
+        windows.append(current)
+
+    phases = []
+    for piece in windows:
+        if phases and phases[-1].difference(piece) <= threshold:
+            phases[-1].merge(piece)
+        else:
+            phases.append(piece)
+    return {"version": VERSION, "events": len(pages), "unique_pages": len(last_access),
+            "phases": [phase.to_json() for phase in phases]}
+
+
+class _Sampler:
+    # draws values from [[low, high, count], ...] buckets
+    def __init__(self, buckets, rng):
+        self.buckets = buckets
+        self.cumulative = list(accumulate(count for _, _, count in buckets))
+        self.rng = rng
+
+    def draw(self):
+        rng = self.rng
+        i = bisect_right(self.cumulative, rng.random() * self.cumulative[-1])
+        low, high, _ = self.buckets[min(i, len(self.buckets) - 1)]
+        return low if low == high else rng.randint(low, high)
+
+
+class _LruStack:
+    # pages by recency in blocks of BLOCK, least recent first, and the block
+    # holding each page: moving a page costs O(BLOCK), finding the page at
+    # distance d walks d / BLOCK blocks. Pages beyond `limit` are dropped.
+    BLOCK = 1024
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.blocks = [[]]
+        self.owner = {}  # page -> block
+        self.size = 0
+
+    def _push(self, page_number):
+        top = self.blocks[-1]
+        if len(top) >= self.BLOCK:
+            top = []
+            self.blocks.append(top)
+        top.append(page_number)
+        self.owner[page_number] = top
+
+    def __contains__(self, page_number):
+        return page_number in self.owner
+
+    def touch(self, page_number):
+        # move page_number to the top, adding it if new
+        block = self.owner.get(page_number)
+        if block is not None:
+            block.remove(page_number)
+        else:
+            self.size += 1
+        self._push(page_number)
+        self._trim()
+
+    def reuse(self, distance):
+        # the page at stack distance `distance` (1 = most recent), moved to
+        # the top; None if the stack holds fewer pages
+        if distance > min(self.size, self.limit):
+            return None
+        for block in reversed(self.blocks):
+            if distance <= len(block):
+                page_number = block.pop(-distance)
+                self._push(page_number)
+                self._repack()
+                return page_number
+            distance -= len(block)
+
+    def _trim(self):
+        blocks = self.blocks
+        while self.size - len(blocks[0]) >= self.limit:
+            for page_number in blocks[0]:
+                del self.owner[page_number]
+            self.size -= len(blocks.pop(0))
+        self._repack()
+
+    def _repack(self):
+        # moves leave blocks part empty; repack them once there are twice
+        # as many as the pages need
+        blocks = self.blocks
+        if len(blocks) > 2 * self.size // self.BLOCK + 2:
+            pages = [page_number for block in blocks for page_number in block]
+            self.blocks = [pages[i:i + self.BLOCK] for i in range(0, len(pages), self.BLOCK)] or [[]]
+            for block in self.blocks:
+                for page_number in block:
+                    self.owner[page_number] = block
+
+
+def generate(model, events, seed=0, max_stack=MAX_STACK):
+    # (pages, writes) chunks of a synthetic trace with `events` events
+    rng = random.Random(seed)
+    total = model["events"]
+    stack = _LruStack(max_stack)
+    frontier = FIRST_PAGE  # every page from here up is unused
+    previous = 0
+    pages = array('Q')
+    flags = bytearray()
+
+    done = 0
+    for number, phase in enumerate(model["phases"]):
+        # phase lengths scaled to the requested length; the last takes the rest
+        length = (events - done if number == len(model["phases"]) - 1
+                  else round(events * phase["events"] / total))
+        done += length
+        reused = sum(count for _, _, count in phase["distances"])
+        cold_share = phase["cold"] / (phase["cold"] + reused) if phase["cold"] + reused else 1.0
+        distances = _Sampler(phase["distances"], rng) if reused else None
+        runs = _Sampler(phase["runs"], rng) if phase["runs"] else None
+        run_start = phase["run_start"] if runs else 0.0
+        write_cold, write_reused = phase["write_cold"], phase["write_reused"]
+        write_sequential = phase["write_sequential"]
+        sequential_cold = phase["sequential_cold"]
+        remaining_run = 0
+        steps = new_steps = 0  # sequential accesses in this phase, and those to new pages
+        for _ in range(length):
+            if remaining_run == 0 and run_start and rng.random() < run_start:
+                remaining_run = runs.draw()
+            if remaining_run and previous + 1 not in stack:
+                if new_steps > sequential_cold * steps:
+                    remaining_run = 0  # a run into new pages; ahead of the fitted share
+                else:
+                    new_steps += 1
+            if remaining_run:
+                remaining_run -= 1
+                steps += 1
+                page_number = previous + 1
+                is_write = rng.random() < write_sequential
+                stack.touch(page_number)
+                frontier = max(frontier, page_number + 1)
+            else:
+                distance = 0 if rng.random() < cold_share else distances.draw()
+                page_number = stack.reuse(distance) if distance else None
+                if page_number is not None:
+                    is_write = rng.random() < write_reused
+                else:
+                    if frontier == previous + 1:
+                        frontier += 1  # would read as a sequential access
+                    page_number = frontier
+                    frontier += 1
+                    is_write = rng.random() < write_cold
+                    stack.touch(page_number)
+            previous = page_number
+            pages.append(page_number)
+            flags.append(is_write)
+            if len(pages) == CHUNK:
+                yield pages, flags
+                pages = array('Q')
+                flags = bytearray()
+    if pages:
+        yield pages, flags
+
+
+def write_trace(chunks, output_file, page_offset=12):
+    # text (.gz compressed if named so) or packed (.mtr) output
+    from tracefile import is_packed, open_trace
+    if is_packed(output_file):
+        from tracepack import TracePacker
+        with TracePacker(output_file, page_offset) as packer:
+            for pages, writes in chunks:
+                packer.add(pages, writes)
+        return
+    with open_trace(output_file, 'wb') as out:
+        for pages, writes in chunks:
+            out.write("".join(f"{page_number << page_offset:08x} {'W' if is_write else 'R'}\n"
+                              for page_number, is_write in zip(pages, writes)).encode())
+
+
+def main():
+    import argparse
+    from tracefile import read_trace
+
+    parser = argparse.ArgumentParser(description="Fit a model to a trace and generate synthetic traces")
+    commands = parser.add_subparsers(dest="command", required=True)
+    fit_parser = commands.add_parser("fit", help="fit a model to a trace")
+    fit_parser.add_argument("trace")
+    fit_parser.add_argument("model")
+    fit_parser.add_argument("--window", type=int, default=WINDOW,
+                            help=f"events per phase detection window (default {WINDOW})")
+    fit_parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                            help=f"largest access-mix change within a phase (default {THRESHOLD})")
+    generate_parser = commands.add_parser("generate", help="write a synthetic trace")
+    generate_parser.add_argument("model")
+    generate_parser.add_argument("output", help="text trace, .gz or packed .mtr")
+    generate_parser.add_argument("events", type=int)
+    generate_parser.add_argument("--seed", type=int, default=0)
+    generate_parser.add_argument("--max-stack", type=int, default=MAX_STACK,
+                                 help=f"pages kept for reuse (default {MAX_STACK})")
+    compare_parser = commands.add_parser("compare", help="LRU miss ratios of a trace and its model")
+    compare_parser.add_argument("trace")
+    compare_parser.add_argument("model")
+    compare_parser.add_argument("frames", type=int, nargs="*")
+    compare_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        if args.command == "fit":
+            pages, writes = read_trace(args.trace)
+            model = fit(pages, writes, args.window, args.threshold)
+            model["source"] = args.trace
+            with open(args.model, 'w') as out:
+                json.dump(model, out, indent=1)
+                out.write("\n")
+            print(f"{len(model['phases'])} phases, {model['unique_pages']} unique pages "
+                  f"in {model['events']} events")
+        elif args.command == "generate":
+            with open(args.model) as model_file:
+                model = json.load(model_file)
+            write_trace(generate(model, args.events, args.seed, args.max_stack), args.output)
+        else:
+            from mrc import stack_distances
+            with open(args.model) as model_file:
+                model = json.load(model_file)
+            pages, _ = read_trace(args.trace)
+            synthetic = array('Q')
+            for chunk, _ in generate(model, len(pages), args.seed):
+                synthetic.extend(chunk)
+            frame_counts = args.frames or [10, 25, 50, 100, 200, 400, 800]
+            real = stack_distances(pages).miss_ratio_curve(frame_counts)
+            fake = stack_distances(synthetic).miss_ratio_curve(frame_counts)
+            print(f"{'frames':>8} {'trace':>8} {'model':>8} {'abs err':>8}")
+            for frames in frame_counts:
+                print(f"{frames:>8} {real[frames]:>8.4f} {fake[frames]:>8.4f} "
+                      f"{abs(real[frames] - fake[frames]):>8.4f}")
+    except (OSError, ValueError, KeyError) as e:
+        print(e)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from distinct import HyperLogLog, PageSet, _combine, count_distinct, count_segment, segments
+from tracefile import read_trace
+from tracepack import pack
+
+
+def _page_batches(seed=8):
+    rng = random.Random(seed)
+    batches = []
+    for _ in range(40):
+        base = rng.choice([0, 1 << 16, 5 << 16, 1 << 40])
+        spread = rng.choice([100, 3000, 1 << 16])  # wide batches fill buckets past DENSE
+        batches.append([base + rng.randrange(spread) for _ in range(rng.randrange(1, 2000))])
+    return batches
+
+
+def test_page_set_matches_set():
+    pages = PageSet()
+    expected = set()
+    for batch in _page_batches():
+        pages.update(batch)
+        expected.update(batch)
+        assert len(pages) == len(expected)
+    assert pages.bitmaps  # some buckets went dense
+    assert list(pages) == sorted(expected)
+
+
+def test_page_set_union():
+    batches = _page_batches(seed=9)
+    left, right = PageSet(), PageSet()
+    for i, batch in enumerate(batches):
+        (left if i % 2 else right).update(batch)
+    left.union(right)
+    assert list(left) == sorted(set().union(*batches))
+
+
+def test_hyperloglog_error():
+    sketch = HyperLogLog(vectorize=False)
+    sketch.update(range(200000))
+    # 4 standard errors at precision 14
+    assert abs(len(sketch) - 200000) < 200000 * 4 * 1.04 / 128
+    small = HyperLogLog(vectorize=False)
+    small.update([3, 3, 5, 1 << 63])
+    assert len(small) == 3  # linear counting is exact this far from collisions
+
+
+def test_hyperloglog_union_matches_single_sketch():
+    whole = HyperLogLog(10, vectorize=False)
+    whole.update(range(0, 30000, 3))
+    left, right = HyperLogLog(10, vectorize=False), HyperLogLog(10, vectorize=False)
+    left.update(range(0, 15000, 3))
+    right.update(range(15000, 30000, 3))
+    left.union(right)
+    assert left.registers == whole.registers
+    with pytest.raises(ValueError):
+        left.union(HyperLogLog(11, vectorize=False))
+
+
+def test_hyperloglog_numpy_matches_python():
+    pytest.importorskip("numpy")
+    pages = [random.Random(10).randrange(1 << 64) for _ in range(5000)]
+    python, vectorized = HyperLogLog(vectorize=False), HyperLogLog()
+    python.update(pages)
+    vectorized.update(pages)
+    assert vectorized.np is not None
+    assert python.registers == vectorized.registers
+
+
+def _text_trace(tmp_path):
+    rng = random.Random(11)
+    path = tmp_path / "t.trace"
+    path.write_text("".join(f"{rng.randrange(1 << 26):x} {'W' if rng.random() < 0.3 else 'R'}\n"
+                            for _ in range(3000)))
+    return str(path)
+
+
+def _expected(trace_file, offsets):
+    return ({offset: len(set(read_trace(trace_file, offset)[0])) for offset in offsets},
+            len(read_trace(trace_file)[0]))
+
+
+def test_text_segments_count_every_line_once(tmp_path):
+    trace_file = _text_trace(tmp_path)
+    jobs = segments(trace_file, segment_bytes=97)
+    assert len(jobs) > 100
+    results = [count_segment(job, [12, 16]) for job in jobs]
+    assert _combine(jobs, results) == {trace_file: _expected(trace_file, [12, 16])}
+
+
+def test_packed_segments(tmp_path):
+    text_file = _text_trace(tmp_path)
+    trace_file = str(tmp_path / "t.mtr")
+    pack(text_file, trace_file, block_events=256)
+    jobs = segments(trace_file, segment_events=700)
+    results = [count_segment(job, [12, 14]) for job in jobs]
+    assert _combine(jobs, results) == {trace_file: _expected(text_file, [12, 14])}
+    with pytest.raises(ValueError):
+        count_segment(jobs[0], [10])
+
+
+def test_count_distinct(tmp_path):
+    trace_file = _text_trace(tmp_path)
+    assert count_distinct([trace_file], [12], workers=2) == {trace_file: _expected(trace_file, [12])}
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from clockmmu import ClockMMU
+from pagetable import PageTable, new_page_map
+from randmmu import RandMMU
+from tracefile import replay
+
+
+def test_matches_dict_under_churn():
+    rng = random.Random(3)
+    table = PageTable(500)
+    reference = {}
+    for step in range(50000):
+        page = rng.randrange(2000)
+        if page in reference and rng.random() < 0.5:
+            del table[page]
+            del reference[page]
+        elif page in reference or len(reference) < 500:
+            table[page] = step
+            reference[page] = step
+        assert (page in table) == (page in reference)
+        assert table.get(page) == reference.get(page)
+    assert len(table) == len(reference)
+    assert dict(table.items()) == reference
+
+
+def test_missing_keys_and_full_table():
+    table = PageTable(2)
+    assert table.capacity == 8
+    with pytest.raises(KeyError):
+        table[5]
+    with pytest.raises(KeyError):
+        del table[5]
+    for page in range(4):
+        table[page] = page
+    with pytest.raises(OverflowError):
+        table[4] = 4
+    table[3] = 30  # updating a key never needs a new slot
+    assert table[3] == 30
+
+
+def test_reserve_keeps_entries():
+    table = PageTable(4)
+    for page in range(0, 40, 10):
+        table[page] = page + 1
+    table.reserve(100)
+    assert table.capacity >= 200
+    assert dict(table.items()) == {page: page + 1 for page in range(0, 40, 10)}
+
+
+def test_new_page_map():
+    assert isinstance(new_page_map(10, True), PageTable)
+    assert new_page_map(10, False) == {}
+
+
+@pytest.mark.parametrize("policy", [ClockMMU, RandMMU])
+def test_compact_mmu_matches_dict_mmu(policy):
+    rng = random.Random(4)
+    pages = [rng.randrange(300) for _ in range(20000)]
+    writes = bytearray(rng.random() < 0.3 for _ in pages)
+    results = []
+    for compact in (False, True):
+        mmu = policy(64, compact=compact)
+        replay(mmu, pages, writes)
+        mmu.resize(100)
+        replay(mmu, pages, writes)
+        results.append((mmu.get_total_page_faults(), mmu.get_total_disk_writes()))
+    assert results[0] == results[1]
@@ -0,0 +1,47 @@
+from array import array
+import random
+
+from lrummu import LruMMU
+from mrc import stack_distances
+from parmrc import parallel_stack_distances
+from tracefile import replay
+
+
+def _trace(events, seed=1):
+    rng = random.Random(seed)
+    pages = array('Q')
+    for _ in range(events):
+        if rng.random() < 0.3:
+            pages.append(rng.randrange(5000))       # scattered
+        else:
+            pages.append(rng.randrange(60))         # hot set
+    writes = bytearray(rng.random() < 0.25 for _ in range(events))
+    return pages, writes
+
+
+def test_matches_sequential_histogram():
+    pages, writes = _trace(20000)
+    expected = stack_distances(pages)
+    for chunks in (1, 3, 7):
+        histogram = parallel_stack_distances(pages, writes, workers=2, chunks=chunks)
+        assert histogram.hist == expected.hist
+        assert histogram.cold == expected.cold
+        assert histogram.events == len(pages)
+
+
+def test_fault_curve_matches_lru_simulator():
+    pages, writes = _trace(8000, seed=2)
+    frame_counts = [1, 2, 10, 50, 200, 1000]
+    curve = parallel_stack_distances(pages, writes, workers=2, chunks=4).fault_curve(frame_counts)
+    for frames in frame_counts:
+        mmu = LruMMU(frames)
+        replay(mmu, pages, writes)
+        assert curve[frames] == mmu.get_total_page_faults()
+
+
+def test_chunks_without_repeats():
+    # every chunk is all first references, so the merge resolves everything
+    pages = array('Q', list(range(100)) * 3)
+    histogram = parallel_stack_distances(pages, bytearray(300), workers=2, chunks=6)
+    assert histogram.cold == 100
+    assert histogram.hist == {100: 200}
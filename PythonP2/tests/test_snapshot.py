@@ -0,0 +1,71 @@
+from array import array
+import random
+
+import pytest
+
+import registry
+import snapshot
+from tracefile import replay
+
+
+def test_round_trip():
+    arrays = [array('q', [-1, 0, 1 << 62]), array('b', [0, 1, 1]), array('d')]
+    data = snapshot.dump("Example", [3, -7, 1 << 40], arrays)
+    kind, ints, loaded = snapshot.load(data, "Example")
+    assert kind == "Example"
+    assert ints == [3, -7, 1 << 40]
+    assert [a.typecode for a in loaded] == ['q', 'b', 'd']
+    assert loaded == arrays
+
+
+def test_rejects_foreign_data():
+    data = snapshot.dump("Example", [1])
+    with pytest.raises(ValueError):
+        snapshot.load(b'XXXX' + data[4:])
+    with pytest.raises(ValueError):
+        snapshot.load(data[:4] + bytes([snapshot.VERSION + 1]) + data[5:])
+    with pytest.raises(ValueError):
+        snapshot.load(data, "Other")
+
+
+def _trace(events=12000):
+    rng = random.Random(5)
+    pages = [rng.randrange(400) if rng.random() < 0.4 else rng.randrange(40) for _ in range(events)]
+    writes = bytearray(rng.random() < 0.3 for _ in range(events))
+    return pages, writes
+
+
+def _counters(mmu):
+    return (mmu.get_total_page_faults(), mmu.get_total_disk_reads(),
+            mmu.get_total_disk_writes(), mmu.resident_pages())
+
+
+@pytest.mark.parametrize("name", registry.names())
+def test_restored_mmu_continues_identically(name):
+    pages, writes = _trace()
+    half = len(pages) // 2
+    mmu = registry.create(name, 50)
+    if not mmu.can_snapshot:
+        pytest.skip(f"{name} has no snapshot support")
+    replay(mmu, pages[:half], writes[:half])
+    clone = mmu.fork()
+    assert _counters(clone) == _counters(mmu)
+    replay(mmu, pages[half:], writes[half:])
+    replay(clone, pages[half:], writes[half:])
+    assert _counters(clone) == _counters(mmu)
+
+
+@pytest.mark.parametrize("name", ["clock", "rand"])
+def test_compact_state_survives_restore(name):
+    pages, writes = _trace()
+    mmu = registry.create(name, 50, compact=True)
+    replay(mmu, pages, writes)
+    clone = registry.create(name, 1)
+    clone.restore(mmu.snapshot())
+    assert clone.compact
+    assert dict(clone.page_map.items()) == dict(mmu.page_map.items())
+
+
+def test_restore_checks_kind():
+    with pytest.raises(ValueError):
+        registry.create("clock", 4).restore(registry.create("lru", 4).snapshot())
@@ -0,0 +1,92 @@
+from array import array
+import random
+
+import pytest
+
+from tracefile import read_trace
+from tracepack import PackedTrace, TracePacker, decode_block, encode_block, pack, parse_page_range
+
+
+def _events(count, seed=6):
+    rng = random.Random(seed)
+    pages = array('Q')
+    page = 1 << 20
+    for _ in range(count):
+        r = rng.random()
+        if r < 0.6:
+            page += 1                        # sequential
+        elif r < 0.9:
+            page = rng.randrange(1 << 24)    # nearby jump
+        else:
+            page = rng.randrange(1 << 62)    # needs 8-byte deltas
+        pages.append(page)
+    writes = bytearray(rng.random() < 0.3 for _ in range(count))
+    return pages, writes
+
+
+@pytest.mark.parametrize("pages", [[7], [5, 6, 7, 9, 8], [0, 255, 0, 70000, 1 << 40, 3]])
+def test_block_round_trip(pages):
+    pages = array('Q', pages)
+    writes = bytearray(i % 3 == 0 for i in range(len(pages)))
+    decoded_pages, decoded_writes = decode_block(encode_block(pages, writes), len(pages))
+    assert decoded_pages == pages
+    assert decoded_writes == writes
+
+
+def _packed(tmp_path, pages, writes, block_events=1000):
+    path = str(tmp_path / "t.mtr")
+    with TracePacker(path, page_offset=12, block_events=block_events) as packer:
+        for start in range(0, len(pages), 777):  # chunks that straddle blocks
+            packer.add(pages[start:start + 777], writes[start:start + 777])
+    return path
+
+
+def test_file_round_trip(tmp_path):
+    pages, writes = _events(10500)
+    trace = PackedTrace(_packed(tmp_path, pages, writes))
+    assert len(trace) == len(pages)
+    assert len(trace.blocks) == 11
+    assert trace.read() == (pages, writes)
+
+
+def test_ranges_and_filters(tmp_path):
+    pages, writes = _events(10500)
+    trace = PackedTrace(_packed(tmp_path, pages, writes))
+    assert trace.read(1999, 4001) == (pages[1999:4001], writes[1999:4001])
+    assert trace.read(10000, 20000) == (pages[10000:], writes[10000:])
+
+    low, high = 1 << 20, 1 << 23
+    keep = [i for i, page in enumerate(pages) if low <= page <= high]
+    assert trace.read(page_range=(low, high)) == (
+        array('Q', [pages[i] for i in keep]), bytearray(writes[i] for i in keep))
+
+    shifted, _ = trace.read(page_offset=16)
+    assert shifted == array('Q', [page >> 4 for page in pages])
+    with pytest.raises(ValueError):
+        trace.read(page_offset=11)
+
+
+def test_pack_matches_text_trace(tmp_path):
+    rng = random.Random(7)
+    text = tmp_path / "t.trace"
+    text.write_text("".join(f"{rng.randrange(1 << 48):x} {'W' if rng.random() < 0.3 else 'R'}\n"
+                            for _ in range(5000)))
+    packed = str(tmp_path / "t.mtr")
+    assert pack(str(text), packed, block_events=512) == 5000
+    assert read_trace(packed) == read_trace(str(text))
+    assert read_trace(packed, page_offset=14) == read_trace(str(text), page_offset=14)
+
+
+def test_rejects_unpackable_pages(tmp_path):
+    path = tmp_path / "t.mtr"
+    with pytest.raises(ValueError):
+        with TracePacker(str(path)) as packer:
+            packer.add(array('Q', [1 << 63]), bytearray(1))
+    assert not path.exists()
+
+
+def test_parse_page_range():
+    assert parse_page_range("0x10:20") == (16, 20)
+    assert parse_page_range(":5") == (None, 5)
+    with pytest.raises(ValueError):
+        parse_page_range("5")
@@ -0,0 +1,146 @@
+'''
+* Address-translation model placed in front of an MMU.
+*
+* TLB: set-associative, array-backed. Entry i of set s lives at s*ways + i;
+* `tags` holds the cached page number (-1 = invalid) and `stamps` the last
+* use time for LRU replacement within the set.
+*
+* PageWalker: a radix page table with `levels` levels of `level_bits` bits.
+* A TLB miss costs one memory reference per level walked. An optional
+* page-walk cache remembers upper-level entries, so a walk can start below
+* the deepest cached level.
+*
+* TranslatingMMU forwards every access to the wrapped MMU after translating
+* it, and invalidates TLB entries for pages the MMU evicts. When translation
+* is disabled memsim.py never creates it, so the main loop is unchanged.
+'''
+from array import array
+from collections import OrderedDict
+import random
+
+from mmu import MMUWrapper
+
+
+class TLB:
+    def __init__(self, entries, ways, policy="lru", seed=999):
+        if entries < 1 or ways < 1:
+            raise ValueError("TLB entries and associativity must be at least 1")
+        if entries % ways:
+            raise ValueError("TLB entries must be a multiple of the associativity")
+        if policy not in ("lru", "rand"):
+            raise ValueError("TLB policy must be lru or rand")
+        self.ways = ways
+        self.sets = entries // ways
+        self.policy = policy
+        self.rng = random.Random(seed)
+        self.tags = array('q', [-1]) * entries
+        self.stamps = array('q', [0]) * entries
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, page_number):
+        # True on hit; on a miss the translation is installed.
+        self.clock += 1
+        base = (page_number % self.sets) * self.ways
+        tags = self.tags
+        for i in range(base, base + self.ways):
+            if tags[i] == page_number:
+                self.stamps[i] = self.clock
+                self.hits += 1
+                return True
+        self.misses += 1
+        self._insert(page_number, base)
+        return False
+
+    def _insert(self, page_number, base):
+        tags = self.tags
+        victim = -1
+        for i in range(base, base + self.ways):
+            if tags[i] == -1:
+                victim = i
+                break
+        if victim < 0:
+            if self.policy == "lru":
+                stamps = self.stamps
+                victim = min(range(base, base + self.ways), key=stamps.__getitem__)
+            else:
+                victim = base + self.rng.randrange(self.ways)
+        tags[victim] = page_number
+        self.stamps[victim] = self.clock
+
+    def invalidate(self, page_number):
+        base = (page_number % self.sets) * self.ways
+        for i in range(base, base + self.ways):
+            if self.tags[i] == page_number:
+                self.tags[i] = -1
+                return
+
+
+class PageWalker:
+    def __init__(self, levels=4, level_bits=9, walk_cache=0):
+        self.levels = levels
+        self.level_bits = level_bits
+        self.walk_cache = walk_cache
+        # one small LRU cache of table prefixes per upper level
+        self.caches = [OrderedDict() for _ in range(levels - 1)]
+        self.walks = 0
+        self.memory_refs = 0
+
+    def walk(self, page_number):
+        self.walks += 1
+        start = 0
+        if self.walk_cache:
+            # find the deepest upper level whose entry is cached
+            for level in range(self.levels - 2, -1, -1):
+                prefix = page_number >> (self.level_bits * (self.levels - 1 - level))
+                if prefix in self.caches[level]:
+                    self.caches[level].move_to_end(prefix)
+                    start = level + 1
+                    break
+            for level in range(start, self.levels - 1):
+                cache = self.caches[level]
+                cache[page_number >> (self.level_bits * (self.levels - 1 - level))] = True
+                if len(cache) > self.walk_cache:
+                    cache.popitem(last=False)
+        self.memory_refs += self.levels - start
+
+
+class TranslatingMMU(MMUWrapper):
+    def __init__(self, mmu, tlb, walker):
+        MMUWrapper.__init__(self, mmu)
+        self.tlb = tlb
+        self.walker = walker
+        self.chain_evict_listener(self._on_evict)
+
+    def _on_evict(self, page_number, dirty):
+        self.tlb.invalidate(page_number)
+
+    def _translate(self, page_number):
+        if not self.tlb.lookup(page_number):
+            self.walker.walk(page_number)
+
+    def read_memory(self, page_number):
+        self._translate(page_number)
+        self.mmu.read_memory(page_number)
+
+    def write_memory(self, page_number):
+        self._translate(page_number)
+        self.mmu.write_memory(page_number)
+
+    def tlb_hit_rate(self):
+        lookups = self.tlb.hits + self.tlb.misses
+        return self.tlb.hits / lookups if lookups else 0.0
+
+
+def parse_tlb(text):
+    # "entries[:ways[:policy]]", e.g. "64:4:lru"; ways defaults to fully associative
+    parts = text.split(":")
+    entries = int(parts[0])
+    ways = int(parts[1]) if len(parts) > 1 else entries
+    policy = parts[2] if len(parts) > 2 else "lru"
+    if entries < 1 or ways < 1:
+        raise ValueError("TLB entries and associativity must be at least 1")
+    if entries % ways:
+        raise ValueError("TLB entries must be a multiple of the associativity")
+    return entries, ways, policy
@@ -0,0 +1,71 @@
+'''
+* Helpers for loading a trace file into compact arrays.
+* Each event becomes one entry in `pages` (page number) and one entry in
+* `writes` (1 for W, 0 for R), so a trace can be parsed once and replayed
+* into as many MMUs as needed. Traces ending in .gz are decompressed on
+* the fly; packed traces (.mtr, see tracepack.py) are read block by block.
+'''
+from array import array
+
+PAGE_OFFSET = 12  # page is 2^12 = 4KB
+
+
+def open_trace(input_file, mode='r'):
+    if input_file.endswith('.gz'):
+        import gzip
+        return gzip.open(input_file, mode + 't' if mode == 'r' else mode)
+    return open(input_file, mode)
+
+
+def is_packed(input_file):
+    return input_file.endswith('.mtr')
+
+
+def read_trace(input_file, page_offset=PAGE_OFFSET):
+    if is_packed(input_file):
+        from tracepack import PackedTrace
+        return PackedTrace(input_file).read(page_offset=page_offset)
+    pages = array('Q')
+    writes = bytearray()
+    with open_trace(input_file) as trace_file:
+        for line_no, trace_line in enumerate(trace_file, 1):
+            trace_cmd = trace_line.split()
+            if not trace_cmd:
+                continue
+            if len(trace_cmd) < 2 or trace_cmd[1] not in ("R", "W"):
+                raise ValueError(f"Badly formatted file. Error on line {line_no}")
+            pages.append(int(trace_cmd[0], 16) >> page_offset)
+            writes.append(trace_cmd[1] == "W")
+    return pages, writes
+
+
+def trace_chunks(input_file, page_offset=PAGE_OFFSET, buffer_size=None):
+    # (pages, writes) chunks streamed from any trace: packed traces block by
+    # block, text and .gz traces through the pipeline (see pipeline.py)
+    if is_packed(input_file):
+        from tracepack import PackedTrace
+        return PackedTrace(input_file).chunks(page_offset=page_offset)
+    from pipeline import BUFFER_SIZE, events
+    return events(input_file, page_offset=page_offset, buffer_size=buffer_size or BUFFER_SIZE)
+
+
+def skip_events(chunks, skip):
+    # (pages, writes) chunks with the first `skip` events dropped
+    for pages, writes in chunks:
+        if skip:
+            if skip >= len(pages):
+                skip -= len(pages)
+                continue
+            pages, writes = pages[skip:], writes[skip:]
+            skip = 0
+        yield pages, writes
+
+
+def replay(mmu, pages, writes):
+    read_memory = mmu.read_memory
+    write_memory = mmu.write_memory
+    for page_number, is_write in zip(pages, writes):
+        if is_write:
+            write_memory(page_number)
+        else:
+            read_memory(page_number)
@@ -0,0 +1,314 @@
+'''
+* Packed traces: a compressed, block-indexed trace container (.mtr).
+*
+* Events are stored as page numbers (at a fixed page size chosen when
+* packing) in blocks of `block_events` events. Each block is compressed
+* with zlib on its own and holds
+*   width, first page        struct '<Bq'
+*   page deltas              zigzag encoded, events - 1 integers of `width` bytes
+*   write flags              one bit per event, least significant bit first
+* The width is the smallest of 1, 2, 4 or 8 bytes that fits every delta in
+* the block, so sequential and looping traces cost about a byte per event
+* before compression. Fixed-width deltas decode with array.frombytes and
+* itertools.accumulate instead of a Python loop per varint.
+*
+* File layout:
+*   header   MAGIC, version, page_offset, block_events       struct '<4sBBI'
+*   blocks   compressed, back to back
+*   index    per block: file offset, compressed size, events,
+*            lowest page, highest page                       struct '<QIIqq'
+*   trailer  index offset, blocks, events, MAGIC              struct '<QIQ4s'
+*
+* The index lets a reader start at any event offset and skip blocks whose
+* page range misses a filter without decompressing them. Blocks are
+* decompressed on a thread pool (zlib releases the interpreter lock), a
+* bounded number ahead of the consumer.
+*
+* Addresses below the packed page size are not kept: unpacking gives the
+* first address of each page, and a packed trace can only be simulated at
+* its own page size or a larger one.
+*
+* Usage: python tracepack.py pack input.trace output.mtr [--block-events N] [--page-offset N]
+*        python tracepack.py unpack input.mtr output.trace [--start N] [--stop N] [--page-range LO:HI]
+*        python tracepack.py info input.mtr
+'''
+from array import array
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+import struct
+import zlib
+
+from tracefile import PAGE_OFFSET
+
+MAGIC = b'MTR1'
+VERSION = 1
+BLOCK_EVENTS = 1 << 16
+HEADER = struct.Struct('<4sBBI')
+INDEX_ENTRY = struct.Struct('<QIIqq')
+TRAILER = struct.Struct('<QIQ4s')
+BLOCK_HEADER = struct.Struct('<Bq')
+WIDTHS = ((1, 'B'), (2, 'H'), (4, 'I'), (8, 'Q'))  # unsigned, for zigzag values
+
+_BITS = bytes.maketrans(b'\x00\x01', b'01')
+_FLAGS = bytes.maketrans(b'01', b'\x00\x01')
+
+
+def parse_page_range(text):
+    # "LO:HI" page numbers (decimal or 0x...), both inclusive; either may be empty
+    low, sep, high = text.partition(":")
+    if not sep:
+        raise ValueError(f"page range '{text}' is not LO:HI")
+    return (int(low, 0) if low else None, int(high, 0) if high else None)
+
+
+def _pack_flags(writes):
+    if not writes:
+        return b''
+    bits = bytes(writes).translate(_BITS)[::-1]
+    return int(bits, 2).to_bytes((len(writes) + 7) // 8, 'little')
+
+
+def _unpack_flags(data, events):
+    if not events:
+        return bytearray()
+    bits = format(int.from_bytes(data, 'little'), f'0{events}b')[::-1]
+    return bytearray(bits.encode().translate(_FLAGS))
+
+
+def encode_block(pages, writes, level=6):
+    first = pages[0]
+    zigzag = [(d << 1) ^ (d >> 63) for d in map(int.__sub__, pages[1:], pages[:-1])]
+    top = max(zigzag, default=0)
+    for width, code in WIDTHS:
+        if top < 1 << (8 * width):
+            break
+    raw = BLOCK_HEADER.pack(width, first) + array(code, zigzag).tobytes() + _pack_flags(writes)
+    return zlib.compress(raw, level)
+
+
+def decode_block(data, events):
+    raw = zlib.decompress(data)
+    width, first = BLOCK_HEADER.unpack_from(raw)
+    code = dict(WIDTHS)[width]
+    start = BLOCK_HEADER.size
+    end = start + width * (events - 1)
+    zigzag = array(code)
+    zigzag.frombytes(raw[start:end])
+    pages = array('Q', accumulate([(z >> 1) ^ -(z & 1) for z in zigzag], initial=first))
+    return pages, _unpack_flags(raw[end:], events)
+
+
+class TracePacker:
+    # Writes a packed trace from (pages, writes) chunks of any size
+    def __init__(self, output_file, page_offset=PAGE_OFFSET, block_events=BLOCK_EVENTS, level=6):
+        if block_events < 1:
+            raise ValueError("Blocks must hold at least one event")
+        self.out = open(output_file, 'wb')
+        self.out.write(HEADER.pack(MAGIC, VERSION, page_offset, block_events))
+        self.block_events = block_events
+        self.level = level
+        self.pages = array('Q')
+        self.writes = bytearray()
+        self.index = []
+        self.events = 0
+
+    def add(self, pages, writes):
+        self.pages.extend(pages)
+        self.writes.extend(writes)
+        size = self.block_events
+        if len(self.pages) >= size:
+            full = len(self.pages) // size * size
+            for start in range(0, full, size):
+                self._flush(self.pages[start:start + size], self.writes[start:start + size])
+            del self.pages[:full]
+            del self.writes[:full]
+
+    def _flush(self, pages, writes):
+        low, high = min(pages), max(pages)
+        if high >= 1 << 63:
+            # the block header and index keep pages as signed 64-bit numbers
+            raise ValueError(f"Page {high:#x} is too large to pack; use a larger page offset")
+        data = encode_block(pages, writes, self.level)
+        self.index.append((self.out.tell(), len(data), len(pages), low, high))
+        self.out.write(data)
+        self.events += len(pages)
+
+    def close(self):
+        if self.pages:
+            self._flush(self.pages, self.writes)
+        index_offset = self.out.tell()
+        for entry in self.index:
+            self.out.write(INDEX_ENTRY.pack(*entry))
+        self.out.write(TRAILER.pack(index_offset, len(self.index), self.events, MAGIC))
+        self.out.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            try:
+                self.close()
+            except Exception:
+                self._discard()
+                raise
+        else:
+            self._discard()
+
+    def _discard(self):
+        # do not leave a packed trace that looks complete
+        import os
+        self.out.close()
+        os.remove(self.out.name)
+
+
+def pack(input_file, output_file, page_offset=PAGE_OFFSET, block_events=BLOCK_EVENTS, level=6):
+    # text (or .gz) trace -> packed trace; returns the number of events
+    from pipeline import events
+    with TracePacker(output_file, page_offset, block_events, level) as packer:
+        for pages, writes in events(input_file, 0, page_offset):
+            packer.add(pages, writes)
+    return packer.events
+
+
+class PackedTrace:
+    def __init__(self, input_file):
+        self.input_file = input_file
+        with open(input_file, 'rb') as trace_file:
+            header = trace_file.read(HEADER.size)
+            if len(header) < HEADER.size or header[:4] != MAGIC:
+                raise ValueError(f"'{input_file}' is not a packed trace")
+            _, version, self.page_offset, self.block_events = HEADER.unpack(header)
+            if version != VERSION:
+                raise ValueError(f"'{input_file}' has packed trace version {version}, not {VERSION}")
+            trace_file.seek(-TRAILER.size, 2)
+            index_offset, blocks, self.events, magic = TRAILER.unpack(trace_file.read(TRAILER.size))
+            if magic != MAGIC:
+                raise ValueError(f"'{input_file}' is truncated")
+            trace_file.seek(index_offset)
+            data = trace_file.read(blocks * INDEX_ENTRY.size)
+        self.blocks = list(INDEX_ENTRY.iter_unpack(data))
+        self.starts = list(accumulate((entry[2] for entry in self.blocks), initial=0))
+
+    def __len__(self):
+        return self.events
+
+    def _shift(self, page_offset):
+        if page_offset is None:
+            return 0
+        if page_offset < self.page_offset:
+            raise ValueError(f"'{self.input_file}' was packed with {1 << self.page_offset}-byte "
+                             f"pages and cannot be read with smaller ones")
+        return page_offset - self.page_offset
+
+    def chunks(self, start=0, stop=None, page_range=None, page_offset=None, workers=4):
+        # (pages, writes) per block for events [start, stop), optionally only
+        # pages in page_range = (low, high) (inclusive, None for open ends),
+        # with page numbers converted to 2**page_offset-byte pages
+        stop = self.events if stop is None else min(stop, self.events)
+        shift = self._shift(page_offset)
+        low, high = page_range or (None, None)
+        # the filter applies to the page numbers as stored
+        if low is not None:
+            low <<= shift
+        if high is not None:
+            high = ((high + 1) << shift) - 1
+        wanted = []
+        for i in range(max(0, bisect_right(self.starts, start) - 1), len(self.blocks)):
+            if self.starts[i] >= stop:
+                break
+            _, _, _, block_low, block_high = self.blocks[i]
+            if (low is None or block_high >= low) and (high is None or block_low <= high):
+                wanted.append(i)
+
+        with open(self.input_file, 'rb') as trace_file, ThreadPoolExecutor(workers) as pool:
+            def read(i):
+                offset, size, events = self.blocks[i][:3]
+                trace_file.seek(offset)
+                return pool.submit(decode_block, trace_file.read(size), events)
+
+            ahead = deque(read(i) for i in wanted[:2 * workers])
+            for n, i in enumerate(wanted):
+                pages, writes = ahead.popleft().result()
+                if n + 2 * workers < len(wanted):
+                    ahead.append(read(wanted[n + 2 * workers]))
+                first = self.starts[i]
+                if first < start or first + len(pages) > stop:
+                    begin = max(0, start - first)
+                    end = min(len(pages), stop - first)
+                    pages, writes = pages[begin:end], writes[begin:end]
+                if low is not None or high is not None:
+                    keep = [j for j, page in enumerate(pages)
+                            if (low is None or page >= low) and (high is None or page <= high)]
+                    if len(keep) != len(pages):
+                        pages = array('Q', [pages[j] for j in keep])
+                        writes = bytearray(writes[j] for j in keep)
+                if shift:
+                    pages = array('Q', [page >> shift for page in pages])
+                if pages:
+                    yield pages, writes
+
+    def read(self, start=0, stop=None, page_range=None, page_offset=None, workers=4):
+        # the selected events as one (pages, writes) pair
+        pages = array('Q')
+        writes = bytearray()
+        for chunk_pages, chunk_writes in self.chunks(start, stop, page_range, page_offset, workers):
+            pages.extend(chunk_pages)
+            writes.extend(chunk_writes)
+        return pages, writes
+
+
+def main():
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Pack, unpack and inspect block-indexed traces")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack_parser = commands.add_parser("pack", help="pack a text trace")
+    pack_parser.add_argument("input")
+    pack_parser.add_argument("output")
+    pack_parser.add_argument("--block-events", type=int, default=BLOCK_EVENTS,
+                             help=f"events per block (default {BLOCK_EVENTS})")
+    pack_parser.add_argument("--page-offset", type=int, default=PAGE_OFFSET,
+                             help=f"page size as a power of two (default {PAGE_OFFSET})")
+    pack_parser.add_argument("--level", type=int, default=6, help="zlib level (default 6)")
+    unpack_parser = commands.add_parser("unpack", help="write (part of) a packed trace as text")
+    unpack_parser.add_argument("input")
+    unpack_parser.add_argument("output")
+    unpack_parser.add_argument("--start", type=int, default=0, help="first event (default 0)")
+    unpack_parser.add_argument("--stop", type=int, help="event to stop before (default: end)")
+    unpack_parser.add_argument("--page-range", type=parse_page_range, metavar="LO:HI",
+                               help="only pages LO to HI (inclusive)")
+    info_parser = commands.add_parser("info", help="describe a packed trace")
+    info_parser.add_argument("input")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "pack":
+            events = pack(args.input, args.output, args.page_offset, args.block_events, args.level)
+            size = os.path.getsize(args.output)
+            print(f"{events} events, {size} bytes ({size / max(events, 1):.2f} bytes/event)")
+        elif args.command == "unpack":
+            trace = PackedTrace(args.input)
+            with open(args.output, 'w') as out:
+                for pages, writes in trace.chunks(args.start, args.stop, args.page_range):
+                    offset = trace.page_offset
+                    out.write("".join(f"{page << offset:08x} {'W' if is_write else 'R'}\n"
+                                      for page, is_write in zip(pages, writes)))
+        else:
+            trace = PackedTrace(args.input)
+            size = os.path.getsize(args.input)
+            print(f"page size: {1 << trace.page_offset} bytes")
+            print(f"events: {trace.events}")
+            print(f"blocks: {len(trace.blocks)} of up to {trace.block_events} events")
+            print(f"file size: {size} bytes ({size / max(trace.events, 1):.2f} bytes/event)")
+            if trace.blocks:
+                print(f"pages: {min(b[3] for b in trace.blocks):#x}-{max(b[4] for b in trace.blocks):#x}")
+    except (OSError, ValueError) as e:
+        print(e)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,155 +4,188 @@
 修復matplotlib問題並生成高品質圖表
 """
 
+import argparse
 import pandas as pd
 import matplotlib
 matplotlib.use('Agg')  # 使用非GUI後端
 import matplotlib.pyplot as plt
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
 
-def create_performance_plots_enhanced(df):
-    """為每個trace創建增強版性能比較圖"""
+PNG_DIR = 'performance_png'
+# 記錄每張圖輸入數據的雜湊值，數據未變則不重畫
+HASH_FILE = os.path.join(PNG_DIR, 'plot_hashes.json')
+# 修改繪圖程式時遞增，使所有圖重新生成
+PLOT_VERSION = 1
+
+COLORS = {'lru': '#1f77b4', 'clock': '#ff7f0e', 'rand': '#2ca02c'}
+MARKERS = {'lru': 'o', 'clock': 's', 'rand': '^'}
+
+def trace_label(trace):
+    return trace.split('/')[-1].replace('.trace', '')
+
+def precompute_series(df):
+    """一次groupby得到每個(trace, algorithm)按frames排序的數據"""
+    series = {}
+    for (trace, alg), alg_data in df.sort_values('frames', kind='stable').groupby(['trace', 'algorithm'], sort=False):
+        series.setdefault(trace, {})[alg] = alg_data
+    return series
+
+def data_hash(trace_data):
+    """圖表輸入數據的雜湊值"""
+    digest = hashlib.sha256(f'{PLOT_VERSION}\n'.encode())
+    digest.update(trace_data.sort_values(['algorithm', 'frames']).to_csv(index=False).encode())
+    return digest.hexdigest()
+
+def load_hashes():
+    try:
+        with open(HASH_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_hashes(hashes):
+    with open(HASH_FILE, 'w', encoding='utf-8') as f:
+        json.dump(hashes, f, indent=2, sort_keys=True)
+
+def plot_series(ax, alg_series, column, ylabel, title, frame_values):
+    """畫一個子圖：每個算法一條曲線"""
+    for alg, alg_data in alg_series.items():
+        ax.plot(alg_data['frames'], alg_data[column], 
+                marker=MARKERS.get(alg, 'o'), linewidth=2, markersize=6,
+                label=alg.upper(), color=COLORS.get(alg))
+    
+    ax.set_xlabel('Memory Frames')
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    
+    # 設定詳細的x軸刻度
+    ax.set_xticks(frame_values[::max(1, len(frame_values)//10)])  # 顯示約10個刻度
+    ax.tick_params(axis='x', rotation=45)
+    
+    # y軸用對數
+    ax.set_yscale('log')
+
+def render_trace(job):
+    """繪製一個trace的2x2圖 (在子進程中執行)"""
+    trace, alg_series, filename = job
+    trace_name = trace_label(trace)
+    trace_data = pd.concat(alg_series.values())
     
     # 設定matplotlib樣式
     plt.style.use('default')
     plt.rcParams['figure.figsize'] = (15, 10)
     plt.rcParams['font.size'] = 10
     
-    traces = df['trace'].unique()
-    algorithms = df['algorithm'].unique()
-    colors = {'lru': '#1f77b4', 'clock': '#ff7f0e', 'rand': '#2ca02c'}
-    markers = {'lru': 'o', 'clock': 's', 'rand': '^'}
+    # 創建2x2子圖
+    fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 10))
+    fig.suptitle(f'{trace_name.upper()} - Page Replacement Algorithm Performance', fontsize=16, fontweight='bold')
     
-    for trace in traces:
-        trace_name = trace.split('/')[-1].replace('.trace', '')
-        trace_data = df[df['trace'] == trace]
-        
-        # 創建2x2子圖
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(15, 10))
-        fig.suptitle(f'{trace_name.upper()} - Page Replacement Algorithm Performance', fontsize=16, fontweight='bold')
-        
-        # 子圖1: Page Fault Rate vs Frames
-        for alg in algorithms:
-            alg_data = trace_data[trace_data['algorithm'] == alg].sort_values('frames')
-            if not alg_data.empty:
-                ax1.plot(alg_data['frames'], alg_data['page_fault_rate'], 
-                        marker=markers[alg], linewidth=2, markersize=6,
-                        label=alg.upper(), color=colors[alg])
-        
-        ax1.set_xlabel('Memory Frames')
-        ax1.set_ylabel('Page Fault Rate')
-        ax1.set_title('Page Fault Performance')
-        ax1.legend()
-        ax1.grid(True, alpha=0.3)
-        
-        # 設定詳細的x軸刻度
-        frame_values = sorted(trace_data['frames'].unique())
-        ax1.set_xticks(frame_values[::max(1, len(frame_values)//10)])  # 顯示約10個刻度
-        ax1.tick_params(axis='x', rotation=45)
-        
-        # y軸用對數但設定詳細刻度
-        ax1.set_yscale('log')
-        y_values = trace_data['page_fault_rate'].values
-        y_min, y_max = y_values.min(), y_values.max()
-        ax1.set_ylim(y_min*0.5, y_max*2)
-        
-        # 子圖2: Disk Reads vs Frames
-        for alg in algorithms:
-            alg_data = trace_data[trace_data['algorithm'] == alg].sort_values('frames')
-            if not alg_data.empty:
-                ax2.plot(alg_data['frames'], alg_data['disk_reads'], 
-                        marker=markers[alg], linewidth=2, markersize=6,
-                        label=alg.upper(), color=colors[alg])
-        
-        ax2.set_xlabel('Memory Frames')
-        ax2.set_ylabel('Disk Reads')
-        ax2.set_title('Disk Reads Performance')
-        ax2.legend()
-        ax2.grid(True, alpha=0.3)
-        
-        # 設定詳細的x軸刻度
-        ax2.set_xticks(frame_values[::max(1, len(frame_values)//10)])
-        ax2.tick_params(axis='x', rotation=45)
-        
-        # y軸用對數但設定詳細刻度
-        ax2.set_yscale('log')
-        y_reads = trace_data['disk_reads'].values
-        y_min, y_max = y_reads.min(), y_reads.max()
-        ax2.set_ylim(y_min*0.5, y_max*2)
-        
-        # 子圖3: Disk Writes vs Frames
-        for alg in algorithms:
-            alg_data = trace_data[trace_data['algorithm'] == alg].sort_values('frames')
-            if not alg_data.empty:
-                ax3.plot(alg_data['frames'], alg_data['disk_writes'], 
-                        marker=markers[alg], linewidth=2, markersize=6,
-                        label=alg.upper(), color=colors[alg])
-        
-        ax3.set_xlabel('Memory Frames')
-        ax3.set_ylabel('Disk Writes')
-        ax3.set_title('Disk Writes Performance')
-        ax3.legend()
-        ax3.grid(True, alpha=0.3)
-        
-        # 設定詳細的x軸刻度
-        ax3.set_xticks(frame_values[::max(1, len(frame_values)//10)])  
-        ax3.tick_params(axis='x', rotation=45)
-        
-        # y軸用對數但設定詳細刻度
-        ax3.set_yscale('log')
-        y_writes = trace_data['disk_writes'].values
-        y_writes = y_writes[y_writes > 0]  # 排除0值避免log錯誤
-        if len(y_writes) > 0:
-            y_min, y_max = y_writes.min(), y_writes.max()
-            ax3.set_ylim(max(1, y_min*0.5), y_max*2)
-        
-        # 子圖4: 演算法效能排名熱圖
-        frame_counts = sorted(trace_data['frames'].unique())
-        ranking_data = []
-        
-        for frames in frame_counts:
-            frame_data = trace_data[trace_data['frames'] == frames].copy()
-            if len(frame_data) >= 3:
-                frame_data = frame_data.sort_values('page_fault_rate')
-                for i, (_, row) in enumerate(frame_data.iterrows()):
-                    ranking_data.append({
-                        'frames': frames,
-                        'algorithm': row['algorithm'],
-                        'rank': i + 1,
-                        'page_fault_rate': row['page_fault_rate']
-                    })
-        
-        if ranking_data:
-            rank_df = pd.DataFrame(ranking_data)
-            pivot_table = rank_df.pivot(index='algorithm', columns='frames', values='rank')
-            
-            im = ax4.imshow(pivot_table.values, cmap='RdYlGn_r', aspect='auto', vmin=1, vmax=3)
-            ax4.set_xticks(range(len(pivot_table.columns)))
-            ax4.set_xticklabels(pivot_table.columns, rotation=45)
-            ax4.set_yticks(range(len(pivot_table.index)))
-            ax4.set_yticklabels([alg.upper() for alg in pivot_table.index])
-            ax4.set_title('Algorithm Ranking Heatmap\\n(1=Best, 3=Worst)')
-            ax4.set_xlabel('Memory Frames')
-            
-            # 添加數值標註
-            for i in range(len(pivot_table.index)):
-                for j in range(len(pivot_table.columns)):
-                    if not pd.isna(pivot_table.iloc[i, j]):
-                        ax4.text(j, i, f'{int(pivot_table.iloc[i, j])}', 
-                                ha='center', va='center', fontweight='bold')
-            
-            # 添加顏色條
-            cbar = plt.colorbar(im, ax=ax4, shrink=0.8)
-            cbar.set_label('Ranking')
-        
-        plt.tight_layout()
-        filename = f'performance_png/{trace_name}_detailed_performance.png'
-        plt.savefig(filename, dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        print(f"已保存 {filename}")
+    frame_values = sorted(trace_data['frames'].unique())
+    
+    # 子圖1: Page Fault Rate vs Frames
+    plot_series(ax1, alg_series, 'page_fault_rate', 'Page Fault Rate', 'Page Fault Performance', frame_values)
+    y_values = trace_data['page_fault_rate'].values
+    y_min, y_max = y_values.min(), y_values.max()
+    ax1.set_ylim(y_min*0.5, y_max*2)
+    
+    # 子圖2: Disk Reads vs Frames
+    plot_series(ax2, alg_series, 'disk_reads', 'Disk Reads', 'Disk Reads Performance', frame_values)
+    y_reads = trace_data['disk_reads'].values
+    y_min, y_max = y_reads.min(), y_reads.max()
+    ax2.set_ylim(y_min*0.5, y_max*2)
+    
+    # 子圖3: Disk Writes vs Frames
+    plot_series(ax3, alg_series, 'disk_writes', 'Disk Writes', 'Disk Writes Performance', frame_values)
+    y_writes = trace_data['disk_writes'].values
+    y_writes = y_writes[y_writes > 0]  # 排除0值避免log錯誤
+    if len(y_writes) > 0:
+        y_min, y_max = y_writes.min(), y_writes.max()
+        ax3.set_ylim(max(1, y_min*0.5), y_max*2)
+    
+    # 子圖4: 演算法效能排名熱圖
+    ranking_data = []
+    
+    for frames, frame_data in trace_data.groupby('frames'):
+        if len(frame_data) >= 3:
+            frame_data = frame_data.sort_values('page_fault_rate')
+            for i, alg in enumerate(frame_data['algorithm']):
+                ranking_data.append({
+                    'frames': frames,
+                    'algorithm': alg,
+                    'rank': i + 1
+                })
+    
+    if ranking_data:
+        rank_df = pd.DataFrame(ranking_data)
+        pivot_table = rank_df.pivot(index='algorithm', columns='frames', values='rank')
+        
+        im = ax4.imshow(pivot_table.values, cmap='RdYlGn_r', aspect='auto', vmin=1, vmax=3)
+        ax4.set_xticks(range(len(pivot_table.columns)))
+        ax4.set_xticklabels(pivot_table.columns, rotation=45)
+        ax4.set_yticks(range(len(pivot_table.index)))
+        ax4.set_yticklabels([alg.upper() for alg in pivot_table.index])
+        ax4.set_title('Algorithm Ranking Heatmap\\n(1=Best, 3=Worst)')
+        ax4.set_xlabel('Memory Frames')
+        
+        # 添加數值標註
+        for i in range(len(pivot_table.index)):
+            for j in range(len(pivot_table.columns)):
+                if not pd.isna(pivot_table.iloc[i, j]):
+                    ax4.text(j, i, f'{int(pivot_table.iloc[i, j])}', 
+                            ha='center', va='center', fontweight='bold')
+        
+        # 添加顏色條
+        cbar = plt.colorbar(im, ax=ax4, shrink=0.8)
+        cbar.set_label('Ranking')
+    
+    plt.tight_layout()
+    plt.savefig(filename, dpi=300, bbox_inches='tight')
+    plt.close(fig)
+    return filename
 
-def analyze_data_detailed():
+def create_performance_plots_enhanced(df, workers=None, force=False):
+    """為每個trace創建增強版性能比較圖；只重畫數據有變化的trace"""
+    
+    os.makedirs(PNG_DIR, exist_ok=True)
+    hashes = {} if force else load_hashes()
+    
+    jobs = []
+    new_hashes = {}
+    for trace, alg_series in precompute_series(df).items():
+        filename = os.path.join(PNG_DIR, f'{trace_label(trace)}_detailed_performance.png')
+        digest = data_hash(pd.concat(alg_series.values()))
+        new_hashes[filename] = digest
+        if hashes.get(filename) == digest and os.path.exists(filename):
+            print(f"未變更，跳過 {filename}")
+            continue
+        jobs.append((trace, alg_series, filename))
+    
+    if not jobs:
+        return
+    
+    # 多個trace時以進程池並行繪圖
+    if len(jobs) == 1 or workers == 1:
+        done = map(render_trace, jobs)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=min(len(jobs), workers or os.cpu_count() or 1))
+        done = pool.map(render_trace, jobs)
+    try:
+        for filename in done:
+            hashes[filename] = new_hashes[filename]
+            save_hashes(hashes)
+            print(f"已保存 {filename}")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+def analyze_data_detailed(workers=None, force=False):
     """詳細分析實驗數據"""
     
     try:
@@ -164,10 +197,8 @@ def analyze_data_detailed():
     
     print("\\n=== 測試範圍統計 ===")
     
-    traces = df['trace'].unique()
-    for trace in traces:
-        trace_name = trace.split('/')[-1].replace('.trace', '')
-        trace_data = df[df['trace'] == trace]
+    for trace, trace_data in df.groupby('trace', sort=False):
+        trace_name = trace_label(trace)
         frame_counts = sorted(trace_data['frames'].unique())
         
         print(f"\\n{trace_name.upper()}:")
@@ -176,15 +207,24 @@ def analyze_data_detailed():
         print(f"  測試點: {frame_counts}")
     
     # 生成增強圖表
-    create_performance_plots_enhanced(df)
+    create_performance_plots_enhanced(df, workers, force)
     
     return df
 
 def main():
-    """主函數"""
+    """主函數
+    用法: python analyze_results.py [--force] [--workers N]
+      --force      忽略雜湊記錄，重畫所有圖
+      --workers N  繪圖進程數 (預設為CPU核心數)
+    """
+    parser = argparse.ArgumentParser(description="分析實驗數據並生成圖表")
+    parser.add_argument("--force", action="store_true", help="忽略雜湊記錄，重畫所有圖")
+    parser.add_argument("--workers", type=int, help="繪圖進程數 (預設為CPU核心數)")
+    args = parser.parse_args()
+    
     print("開始詳細分析實驗數據...")
     
-    df = analyze_data_detailed()
+    df = analyze_data_detailed(args.workers, args.force)
     if df is not None:
         print("\\n數據分析和圖表生成完成！")
         print("\\n生成的圖表文件:")
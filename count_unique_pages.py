@@ -1,46 +1,84 @@
 #!/usr/bin/env python3
 """
 計算各trace檔中的unique page數量
+用法: python count_unique_pages.py [page_offset,...] [trace檔 ...] [--hll [--precision P]] [--workers N]
+      page_offset 預設 12 = 4KB page
+      trace檔可為文字檔、.gz 或 .mtr 壓縮檔 (見 PythonP2/tracepack.py)
+      --hll: 以HyperLogLog估計 (固定記憶體, 誤差約 1.04/sqrt(2^P)), 適合數十億筆的trace
+      預設為精確計數 (PythonP2/distinct.py 的 PageSet, 每個page約2 bytes或1 bit)
+      trace檔切成多段, 由多個process平行計算後合併
 """
 
-def analyze_unique_pages(trace_file):
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'PythonP2'))
+
+from distinct import DEFAULT_PRECISION, count_distinct
+
+PAGE_OFFSET = 12  # page is 2^12 = 4KB
+
+TRACE_FILES = [
+    'trace/bzip.trace',
+    'trace/swim.trace',
+    'trace/gcc.trace',
+    'trace/sixpack.trace'
+]
+
+def analyze_unique_pages(trace_file, page_offset=PAGE_OFFSET):
     """分析trace檔中的unique page數量"""
-    unique_pages = set()
-    total_accesses = 0
-    
-    with open(trace_file, 'r') as f:
-        for line in f:
-            parts = line.strip().split()
-            if len(parts) >= 2:
-                addr = parts[0]
-                page_num = int(addr, 16) >> 12  # PAGE_OFFSET = 12
-                unique_pages.add(page_num)
-                total_accesses += 1
-    
-    return len(unique_pages), total_accesses
+    counts, total_accesses = analyze_unique_pages_multi(trace_file, [page_offset])
+    return counts[page_offset], total_accesses
 
-def main():
-    trace_files = [
-        'trace/bzip.trace',
-        'trace/swim.trace', 
-        'trace/gcc.trace',
-        'trace/sixpack.trace'
-    ]
-    
-    print("=== Trace檔案 Unique Pages 分析 ===")
-    print(f"{'程式':<10} {'Unique Pages':<12} {'總存取次數':<12} {'記憶體需求':<12}")
-    print("-" * 50)
-    
+def analyze_unique_pages_multi(trace_file, page_offsets, precision=None, workers=None):
+    """一次讀檔同時計算多種page大小的unique page數量 (precision: HyperLogLog估計)"""
+    return count_distinct([trace_file], page_offsets, precision, workers)[trace_file]
+
+def analyze_traces(trace_files, page_offsets, precision=None, workers=None):
+    """多個trace檔一起平行計算: {trace檔: ({page_offset: unique pages}, 總存取次數)}
+    找不到的檔案會略過並印出訊息"""
+    found = []
     for trace_file in trace_files:
-        try:
-            unique_count, total_count = analyze_unique_pages(trace_file)
-            memory_mb = unique_count * 4 / 1024  # 4KB per page -> MB
-            
-            trace_name = trace_file.split('/')[-1].replace('.trace', '')
-            print(f"{trace_name.upper():<10} {unique_count:<12} {total_count:<12} {memory_mb:.1f}MB")
-            
-        except FileNotFoundError:
+        if os.path.exists(trace_file):
+            found.append(trace_file)
+        else:
             print(f"找不到檔案: {trace_file}")
+    return count_distinct(found, page_offsets, precision, workers) if found else {}
+
+def main():
+    parser = argparse.ArgumentParser(description="計算各trace檔中的unique page數量")
+    parser.add_argument("page_offsets", nargs="?", default=str(PAGE_OFFSET),
+                        help="逗號分隔的page offset, 例如 12,14 (預設 12)")
+    parser.add_argument("trace_files", nargs="*", default=TRACE_FILES, help="trace檔 (預設為四個課程trace)")
+    parser.add_argument("--hll", action="store_true", help="以HyperLogLog估計而非精確計數")
+    parser.add_argument("--precision", type=int, default=DEFAULT_PRECISION,
+                        help=f"HyperLogLog precision, 4-18 (預設 {DEFAULT_PRECISION})")
+    parser.add_argument("--workers", type=int, help="平行process數 (預設為CPU數)")
+    args = parser.parse_args()
+
+    page_offsets = [int(offset) for offset in args.page_offsets.split(',')]
+
+    print("=== Trace檔案 Unique Pages 分析 ===")
+    if args.hll:
+        print(f"(HyperLogLog估計, precision {args.precision}, 標準誤差約 {104 / (1 << args.precision) ** 0.5:.2f}%)")
+    print(f"{'程式':<10} {'Page大小':<10} {'Unique Pages':<12} {'總存取次數':<12} {'記憶體需求':<12}")
+    print("-" * 60)
+
+    try:
+        results = analyze_traces(args.trace_files, page_offsets,
+                                 args.precision if args.hll else None, args.workers)
+    except ValueError as e:
+        print(e)
+        return
+    for trace_file, (counts, total_count) in results.items():
+        trace_name = trace_file.split('/')[-1].replace('.gz', '').replace('.trace', '').replace('.mtr', '')
+
+        for offset in page_offsets:
+            unique_count = counts[offset]
+            memory_mb = unique_count * (1 << offset) / (1 << 20)  # page size -> MB
+            page_kb = (1 << offset) // 1024
+            print(f"{trace_name.upper():<10} {str(page_kb) + 'KB':<10} {unique_count:<12} {total_count:<12} {memory_mb:.1f}MB")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
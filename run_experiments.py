@@ -2,49 +2,61 @@
 """
 實驗腳本：批量執行page replacement算法測試
 自動收集所有trace檔在不同frame數下的性能數據
+用法: python run_experiments.py [--hll [--precision P]] [--workers N]
+      frame範圍依各trace的unique page數量 (由count_unique_pages計算) 產生
 """
 
+import argparse
 import subprocess
 import csv
+import json
 import os
+import sys
 
-def run_simulation(trace_file, frames, algorithm):
-    """執行單次模擬並返回結果"""
-    cmd = f"python PythonP2/memsim.py {trace_file} {frames} {algorithm} quiet"
+from count_unique_pages import DEFAULT_PRECISION, PAGE_OFFSET, analyze_traces
+
+# 專案根目錄 (本腳本所在位置)
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def run_simulations(trace_file, frame_counts, algorithms):
+    """對一個trace只讀取一次，執行所有frame數與算法組合，返回結果列表"""
+    cmd = [sys.executable, os.path.join('PythonP2', 'memsim.py'), trace_file,
+           ','.join(str(frames) for frames in frame_counts), ','.join(algorithms),
+           'quiet', '--format', 'jsonl']
     
     try:
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, cwd=r"c:\Users\user\Documents\Adelaide University\Semester 2\Operating System\Assignment 2")
+        result = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT_DIR)
         
-        if result.returncode == 0:
-            lines = result.stdout.strip().split('\n')
-            
-            # 解析輸出
-            total_frames = int(lines[0].split(': ')[1])
-            events = int(lines[1].split(': ')[1])
-            disk_reads = int(lines[2].split(': ')[1])
-            disk_writes = int(lines[3].split(': ')[1])
-            page_fault_rate = float(lines[4].split(': ')[1])
-            
-            return {
-                'trace': trace_file,
-                'frames': frames,
-                'algorithm': algorithm, 
-                'total_frames': total_frames,
-                'events': events,
-                'disk_reads': disk_reads,
-                'disk_writes': disk_writes,
-                'page_fault_rate': page_fault_rate,
-                'page_faults': int(page_fault_rate * events)
-            }
-        else:
-            print(f"Error running {cmd}: {result.stderr}")
-            return None
+        if result.returncode != 0:
+            print(f"Error running {' '.join(cmd)}: {result.stderr}")
+            return []
+        
+        results = []
+        for line in result.stdout.splitlines():
+            # 每行是一個JSON物件；其他行為錯誤訊息
+            if not line.startswith('{'):
+                print(f"{trace_file}: {line}")
+                continue
+            record = json.loads(line)
+            record['trace'] = trace_file
+            # page_faults 為精確計數，不再由 page_fault_rate * events 推算
+            record['total_frames'] = record['frames']
+            results.append(record)
+        return results
             
     except Exception as e:
-        print(f"Exception running {cmd}: {e}")
-        return None
+        print(f"Exception running {' '.join(cmd)}: {e}")
+        return []
 
 def main():
+    parser = argparse.ArgumentParser(description="批量執行page replacement算法測試")
+    parser.add_argument("--hll", action="store_true",
+                        help="以HyperLogLog估計unique page數量 (超大trace用)")
+    parser.add_argument("--precision", type=int, default=DEFAULT_PRECISION,
+                        help=f"HyperLogLog precision (預設 {DEFAULT_PRECISION})")
+    parser.add_argument("--workers", type=int, help="計算unique pages的平行process數 (預設為CPU數)")
+    args = parser.parse_args()
+
     # 定義測試參數
     trace_files = [
         'trace/bzip.trace',
@@ -55,13 +67,15 @@ def main():
     
     algorithms = ['lru', 'clock', 'rand']
     
-    # 各程式的unique page counts (從之前分析得出)
-    unique_pages = {
-        'trace/bzip.trace': 317,
-        'trace/swim.trace': 2543,
-        'trace/gcc.trace': 2852,
-        'trace/sixpack.trace': 3890
-    }
+    # 各程式的unique page counts (4KB page), 所有trace平行計算
+    print("計算各trace的unique pages...")
+    paths = {os.path.join(ROOT_DIR, trace): trace for trace in trace_files}
+    counts = analyze_traces(list(paths), [PAGE_OFFSET],
+                            args.precision if args.hll else None, args.workers)
+    unique_pages = {paths[path]: result[0][PAGE_OFFSET] for path, result in counts.items()}
+    trace_files = [trace for trace in trace_files if trace in unique_pages]
+    for trace in trace_files:
+        print(f"  {trace}: {unique_pages[trace]} unique pages")
     
     # 為每個trace生成基於unique pages百分比的frame範圍
     frame_sets = {}
@@ -77,29 +91,24 @@ def main():
     
     results = []
     total_experiments = sum(len(frame_sets[trace]) * len(algorithms) for trace in trace_files)
-    current = 0
     
     print(f"開始執行 {total_experiments} 個實驗...")
     
-    # 執行所有實驗
+    # 執行所有實驗：每個trace呼叫一次memsim
     for trace in trace_files:
-        for frames in frame_sets[trace]:
-            for algorithm in algorithms:
-                current += 1
-                print(f"進度 {current}/{total_experiments}: {trace} {frames} frames {algorithm}")
-                
-                result = run_simulation(trace, frames, algorithm)
-                if result:
-                    results.append(result)
-                else:
-                    print(f"實驗失敗: {trace} {frames} {algorithm}")
+        print(f"進度 {len(results)}/{total_experiments}: {trace} {len(frame_sets[trace])} frame數 x {len(algorithms)} 算法")
+        
+        trace_results = run_simulations(trace, frame_sets[trace], algorithms)
+        if len(trace_results) != len(frame_sets[trace]) * len(algorithms):
+            print(f"實驗失敗: {trace} 只完成 {len(trace_results)} 個組合")
+        results.extend(trace_results)
     
     # 儲存結果到CSV
     output_file = 'experiment_results.csv'
     with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
         fieldnames = ['trace', 'frames', 'algorithm', 'total_frames', 'events', 
                      'disk_reads', 'disk_writes', 'page_fault_rate', 'page_faults']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
         
         writer.writeheader()
         for result in results: